@@ -0,0 +1,289 @@
+"""Streaming alarm and anomaly detection on bioreactor telemetry
+
+`AlarmEngine` tails `algae_telemetry` once per tick (readings of every
+reactor that arrived since the previous tick, one statement) and feeds each
+reading through per-reactor detectors whose state is O(1) per metric:
+
+- limits: fixed thresholds (O2 inhibition, pH range, over-temperature)
+- rate: change per minute against the previous reading
+- zscore: deviation from an EWMA mean / variance of the reactor's own history
+
+Every alarm raises at one level and clears at a lower one (hysteresis), so
+a value hovering at the limit does not flap. Transitions are published to
+SSE subscribers of the reactor and, on the scheduler leader, written to
+`alarm_events`. Each worker runs its own engine over the same rows, so
+active alarms can be served from memory by any worker.
+
+Control actions (`POST /algae/control`) hold the alarms they are expected
+to trip (e.g. degassing moves DO quickly) for the action's duration. Holds
+are written to `alarm_holds` and every engine reloads them at the start of
+each tick; a hold suppresses raises for readings timestamped inside it, so
+all workers make the same decisions.
+"""
+import asyncio
+import json
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Tuple
+from .db.connection import acquire
+from .db import queries
+from .scheduler import scheduler
+from .streams import hub
+from . import metrics
+
+TICK_S = 1.0
+ERROR_BACKOFF_S = 5.0
+
+# Readings replayed on start to prime the rolling statistics; no events are emitted for them
+WARMUP = timedelta(hours=1)
+
+METRICS = ("ph", "do_mg_l", "temp_c", "co2_uptake_kg_h", "biomass_g_l")
+_COLUMN = {m: i for i, m in enumerate(METRICS)}
+
+# name -> (metric, direction, raise at, clear at, severity); same limits as the console badges
+LIMITS = {
+    "o2_inhibition": ("do_mg_l", "high", 10.0, 9.5, "warning"),
+    "ph_low": ("ph", "low", 6.8, 6.85, "critical"),
+    "ph_high": ("ph", "high", 7.6, 7.55, "critical"),
+    "overtemp": ("temp_c", "high", 28.0, 27.5, "warning"),
+}
+
+# metric -> largest plausible change per minute; clears below half of it
+RATE_LIMITS = {"ph": 0.1, "do_mg_l": 1.5, "temp_c": 0.5}
+RATE_CLEAR_FRACTION = 0.5
+# Readings further apart than this are a telemetry gap, not a step change
+RATE_MAX_GAP_S = 600.0
+
+# EWMA over roughly the last hour of minute readings
+EWMA_SPAN = 60
+EWMA_ALPHA = 2.0 / (EWMA_SPAN + 1)
+ZSCORE_MIN_SAMPLES = 30
+ZSCORE_RAISE = 4.0
+ZSCORE_CLEAR = 3.0
+
+# Control action -> alarms it is expected to trip
+CONTROL_HOLDS = {
+    "degas": ("o2_inhibition", "do_mg_l_rate", "do_mg_l_zscore"),
+    "aerate": ("do_mg_l_rate", "do_mg_l_zscore"),
+    "night_mode": ("co2_uptake_kg_h_zscore",),
+}
+
+INSERT_SQL = """INSERT INTO alarm_events (time, site_id, reactor_id, alarm, state, severity, metric, value, detail)
+                VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9)
+                ON CONFLICT (reactor_id, alarm, time, state) DO NOTHING"""
+
+def alarm_names() -> List[str]:
+    """Every alarm the engine can raise, in a stable order"""
+    return (list(LIMITS) + [f"{m}_rate" for m in RATE_LIMITS]
+            + [f"{m}_zscore" for m in METRICS])
+
+samples_seen = metrics.counter("alarm_samples_total", "Telemetry readings evaluated by the alarm engine")
+alarm_events = metrics.counter("alarm_events_total", "Alarm transitions", labelnames=("alarm", "state"))
+
+class ReactorState:
+    __slots__ = ("site_id", "last_time", "last_values", "mean", "var", "samples", "active")
+
+    def __init__(self, site_id: str):
+        self.site_id = site_id
+        self.last_time: Optional[datetime] = None
+        self.last_values: Optional[Tuple[float, ...]] = None
+        self.mean = [0.0] * len(METRICS)
+        self.var = [0.0] * len(METRICS)
+        self.samples = 0
+        # alarm -> raised event
+        self.active: Dict[str, dict] = {}
+
+class AlarmEngine:
+    def __init__(self, tick_s: float = TICK_S):
+        self.tick_s = tick_s
+        self.reactors: Dict[str, ReactorState] = {}
+        # reactor -> alarm -> (since, until) of readings whose raises are suppressed
+        self.holds: Dict[str, Dict[str, Tuple[datetime, datetime]]] = {}
+        self.cursor: Optional[datetime] = None
+        # Whether the alarms active at the last tick are in alarm_events
+        self._persisted = False
+        self._task: Optional[asyncio.Task] = None
+
+    def observe(self, row) -> List[dict]:
+        """Evaluate one reading; returns raise/clear events"""
+        reactor_id = row["reactor_id"]
+        st = self.reactors.get(reactor_id)
+        if st is None:
+            st = self.reactors[reactor_id] = ReactorState(row["site_id"])
+        t = row["time"]
+        if st.last_time is not None and t <= st.last_time:
+            return []
+        samples_seen.inc()
+
+        values = tuple(float(row[m]) for m in METRICS)
+        events: List[dict] = []
+
+        for name, (metric, direction, raise_at, clear_at, severity) in LIMITS.items():
+            v = values[_COLUMN[metric]]
+            if direction == "high":
+                raising, clearing = v > raise_at, v < clear_at
+            else:
+                raising, clearing = v < raise_at, v > clear_at
+            self._transition(st, reactor_id, t, name, raising, clearing, severity, metric, v,
+                             f"{metric} {v:.2f} beyond {raise_at}", events)
+
+        if st.last_values is not None:
+            dt_min = (t - st.last_time).total_seconds() / 60.0
+            if 0 < dt_min * 60.0 <= RATE_MAX_GAP_S:
+                for metric, limit in RATE_LIMITS.items():
+                    i = _COLUMN[metric]
+                    rate = abs(values[i] - st.last_values[i]) / dt_min
+                    self._transition(st, reactor_id, t, f"{metric}_rate", rate > limit,
+                                     rate < limit * RATE_CLEAR_FRACTION, "warning", metric, values[i],
+                                     f"{metric} changing {rate:.2f}/min (limit {limit})", events)
+
+        for i, metric in enumerate(METRICS):
+            v = values[i]
+            if st.samples >= ZSCORE_MIN_SAMPLES:
+                sd = math.sqrt(st.var[i])
+                z = (v - st.mean[i]) / sd if sd > 1e-9 else 0.0
+                self._transition(st, reactor_id, t, f"{metric}_zscore", abs(z) >= ZSCORE_RAISE,
+                                 abs(z) < ZSCORE_CLEAR, "info", metric, v,
+                                 f"{metric} {v:.2f} is {z:+.1f} sd from its rolling mean", events)
+            # Incremental EWMA mean and variance
+            if st.samples == 0:
+                st.mean[i] = v
+            else:
+                diff = v - st.mean[i]
+                incr = EWMA_ALPHA * diff
+                st.mean[i] += incr
+                st.var[i] = (1.0 - EWMA_ALPHA) * (st.var[i] + diff * incr)
+
+        st.samples += 1
+        st.last_time = t
+        st.last_values = values
+        return events
+
+    def _transition(self, st: ReactorState, reactor_id: str, t: datetime, name: str,
+                    raising: bool, clearing: bool, severity: str, metric: str, value: float,
+                    detail: str, events: List[dict]):
+        active = name in st.active
+        if not active and raising:
+            held = self.holds.get(reactor_id, {}).get(name)
+            if held is not None and held[0] <= t < held[1]:
+                return
+            state = "raised"
+        elif active and clearing:
+            state = "cleared"
+        else:
+            return
+
+        event = {
+            "time": t, "site_id": st.site_id, "reactor_id": reactor_id, "alarm": name,
+            "state": state, "severity": severity, "metric": metric, "value": value, "detail": detail
+        }
+        if state == "raised":
+            st.active[name] = event
+        else:
+            del st.active[name]
+        events.append(event)
+
+    async def hold(self, reactor_id: str, action: str, seconds: float):
+        """Suppress new raises of the alarms a control action is expected to trip
+
+        Persisted for every worker's engine; applied here right away.
+        """
+        names = CONTROL_HOLDS.get(action, ())
+        if not names:
+            return
+        since = datetime.now(timezone.utc)
+        until = since + timedelta(seconds=seconds)
+        await queries.execute("alarms.hold", reactor_id, list(names), since, until)
+        held = self.holds.setdefault(reactor_id, {})
+        for name in names:
+            previous = held.get(name)
+            if previous is not None and previous[1] >= since:
+                held[name] = (previous[0], max(previous[1], until))
+            else:
+                held[name] = (since, until)
+
+    def held(self, reactor_id: str) -> List[str]:
+        now = datetime.now(timezone.utc)
+        return sorted(name for name, (_, until) in self.holds.get(reactor_id, {}).items() if until > now)
+
+    async def load_holds(self, after: datetime):
+        """Replace the in-memory holds with those in alarm_holds ending after `after`"""
+        holds: Dict[str, Dict[str, Tuple[datetime, datetime]]] = {}
+        for row in await queries.fetch("alarms.holds", after):
+            holds.setdefault(row["reactor_id"], {})[row["alarm"]] = (row["since"], row["until"])
+        self.holds = holds
+
+    def active(self, reactor_ids: Optional[Sequence[str]] = None) -> List[dict]:
+        """Raise events of the alarms currently active, optionally for some reactors"""
+        ids = list(self.reactors) if reactor_ids is None else reactor_ids
+        return [event for rid in ids if rid in self.reactors for event in self.reactors[rid].active.values()]
+
+    async def tick(self, now: Optional[datetime] = None) -> List[dict]:
+        """Evaluate readings that arrived since the last tick; returns their events"""
+        now = now or datetime.now(timezone.utc)
+        priming = self.cursor is None
+        start = max(self.cursor or now - WARMUP, now - WARMUP)
+        await self.load_holds(start)
+        rows = await queries.fetch("algae.tail", start, now)
+
+        # Alarms raised while nothing was written (priming, or before this
+        # worker led) are persisted once it writes, so their clears have a raise
+        leader = scheduler.is_leader
+        carried = self.active() if leader and not priming and not self._persisted else []
+
+        events: List[dict] = []
+        for row in rows:
+            events.extend(self.observe(row))
+        if rows:
+            self.cursor = rows[-1]["time"]
+        elif self.cursor is None:
+            self.cursor = start
+
+        if priming:
+            return []
+        for event in events:
+            alarm_events.inc(alarm=event["alarm"], state=event["state"])
+            hub.publish(event["reactor_id"], sse_event(event))
+        if leader and (carried or events):
+            async with acquire() as conn:
+                await conn.executemany(INSERT_SQL, [
+                    (e["time"], e["site_id"], e["reactor_id"], e["alarm"], e["state"],
+                     e["severity"], e["metric"], e["value"], e["detail"])
+                    for e in carried + events
+                ])
+        self._persisted = leader
+        return events
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+                await asyncio.sleep(self.tick_s)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠ Alarm engine tick failed: {e}")
+                await asyncio.sleep(ERROR_BACKOFF_S)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="alarm-engine")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+def sse_event(event: dict) -> str:
+    """Named SSE event for an alarm transition"""
+    return f"event: alarm\ndata: {json.dumps(event, default=_iso)}\n\n"
+
+def _iso(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+engine = AlarmEngine()
+
+metrics.gauge("alarms_active", "Alarms currently raised across reactors", func=lambda: len(engine.active()))
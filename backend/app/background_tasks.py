@@ -1,44 +1,45 @@
 """Background tasks for CarbonFlux"""
-import asyncio
 from .db.connection import get_pool
-
-_refresh_task = None
+from .db.partitions import maintain_partitions
+from .db.downsample import compact_all
+from .ledger import update_latest_ledger
+from .scheduler import scheduler
+from .alarms import engine as alarm_engine
 
 async def refresh_materialized_views():
-    """Background task to refresh materialized views every 60 seconds"""
-    while True:
-        try:
-            await asyncio.sleep(60)
-            pool = await get_pool()
+    """Fold new telemetry into the ledger and refresh materialized views"""
+    pool = await get_pool()
+
+    # Fold newly arrived telemetry into the carbon ledger first
+    await update_latest_ledger()
 
-            async with pool.acquire() as conn:
-                # Refresh hourly rollups
-                await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_hourly_rollups")
-                # Refresh daily ledger
-                await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_daily_ledger")
+    async with pool.acquire() as conn:
+        # Refresh hourly rollups
+        await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_hourly_rollups")
+        # Refresh daily ledger
+        await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_daily_ledger")
 
-            print("✓ Materialized views refreshed")
+    print("✓ Materialized views refreshed")
 
-        except asyncio.CancelledError:
-            print("Background task cancelled")
-            break
-        except Exception as e:
-            print(f"Error refreshing materialized views: {e}")
-            await asyncio.sleep(5)
+def register_jobs():
+    """Register periodic jobs with the scheduler (leader-only unless noted)"""
+    if "refresh_materialized_views" not in scheduler.jobs:
+        scheduler.add("refresh_materialized_views", refresh_materialized_views, interval_s=60, jitter_s=5)
+    if "maintain_partitions" not in scheduler.jobs:
+        scheduler.add("maintain_partitions", maintain_partitions, interval_s=3600, jitter_s=60)
+    if "compact_telemetry" not in scheduler.jobs:
+        scheduler.add("compact_telemetry", compact_all, interval_s=300, jitter_s=30)
 
 async def start_background_tasks():
     """Start all background tasks"""
-    global _refresh_task
-    _refresh_task = asyncio.create_task(refresh_materialized_views())
+    register_jobs()
+    await scheduler.start()
+    # Every worker evaluates alarms; only the leader persists them
+    alarm_engine.start()
     print("✓ Background tasks started")
 
 async def stop_background_tasks():
     """Stop all background tasks"""
-    global _refresh_task
-    if _refresh_task:
-        _refresh_task.cancel()
-        try:
-            await _refresh_task
-        except asyncio.CancelledError:
-            pass
+    await alarm_engine.stop()
+    await scheduler.stop()
     print("✓ Background tasks stopped")
@@ -1,16 +1,34 @@
 """Simple in-memory cache for API responses"""
 from typing import Any, Optional, Dict
 from datetime import datetime, timezone
+from . import metrics
 
 _cache: Dict[str, tuple[Any, datetime]] = {}
 
+lookups = metrics.counter("cache_lookups_total", "Response cache lookups by result", labelnames=("result",))
+metrics.gauge("cache_entries", "Cached items", func=lambda: len(_cache))
+
+def hit_ratio() -> float:
+    hits = lookups.series.get(("hit",), 0.0)
+    total = hits + lookups.series.get(("miss",), 0.0)
+    return hits / total if total else 0.0
+
+metrics.gauge("cache_hit_ratio", "Share of cache lookups that hit", func=hit_ratio)
+
 def get(key: str) -> Optional[Any]:
     """Get cached value if exists and not expired"""
     if key in _cache:
         value, timestamp = _cache[key]
+        lookups.inc(result="hit")
         return value
+    lookups.inc(result="miss")
     return None
 
+def peek(key: str) -> Optional[Any]:
+    """Get cached value without counting a lookup (for derived entries)"""
+    entry = _cache.get(key)
+    return entry[0] if entry is not None else None
+
 def set(key: str, value: Any):
     """Set cache value with timestamp"""
     _cache[key] = (value, datetime.now(timezone.utc))
@@ -0,0 +1,334 @@
+"""Multiplexed live topics for WebSocket clients
+
+A client subscribes to any number of topics over one socket:
+
+    algae:<reactor_id>   latest telemetry of a reactor
+    salt:<site_id>       latest storage state of a site
+    dispatch:<site_id>   dispatch plan entry in effect now
+    ledger               fleet-wide cumulative carbon totals
+    alarms:<reactor_id>  1/0 per alarm of the reactor (from the alarm engine)
+
+One `ChannelHub` per worker polls the subscribed keys of each topic kind with
+one statement per tick and keeps only the newest value of every topic. Each
+subscription has its own `max_hz`: the client's sender sends a topic at most
+once per 1/max_hz and always sends the newest value, so faster updates are
+coalesced instead of queued. A frame carries only the fields that changed
+since the previous frame sent to that client for that topic.
+
+Frames are JSON text by default. With binary framing each update is one
+little-endian binary message:
+
+    u16 topic id | u32 seq | f64 epoch seconds | u32 field mask | f64 per set bit
+
+Topic ids and the field order behind the mask bits are sent in the JSON
+`subscribed` reply.
+
+A replay (see replay.py) `claim`s the topics it feeds and `push`es values
+into the same per-topic state; polling leaves claimed topics alone.
+"""
+import asyncio
+import json
+import struct
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence, Set, Tuple, Union
+from .alarms import engine as alarm_engine, alarm_names
+from .db import queries
+from .ledger import get_prefix_index
+from .models.series import format_time
+from .sites import directory
+from . import metrics
+
+POLL_INTERVAL_S = 1.0
+ERROR_BACKOFF_S = 5.0
+
+DEFAULT_MAX_HZ = 1.0
+MAX_HZ = 10.0
+MAX_TOPICS_PER_CLIENT = 256
+
+FRAME_HEADER = struct.Struct("<HIdI")
+
+frames_sent = metrics.counter("ws_frames_total", "Topic update frames sent", labelnames=("format",))
+updates_coalesced = metrics.counter(
+    "ws_updates_coalesced_total", "Topic updates superseded before a throttled client could receive them"
+)
+
+# (epoch seconds, field values in TopicKind.fields order)
+Value = Tuple[float, Tuple[float, ...]]
+# (version, value, per-topic change count)
+Entry = Tuple[int, Value, int]
+
+class TopicKind:
+    __slots__ = ("fields", "keyed", "poll")
+
+    def __init__(self, fields: Sequence[str], keyed: bool,
+                 poll: Callable[[Set[str], datetime], Awaitable[Dict[str, Value]]]):
+        self.fields = tuple(fields)
+        self.keyed = keyed
+        self.poll = poll
+
+def _value(row, fields: Sequence[str]) -> Value:
+    return row["time"].timestamp(), tuple(float(row[f]) for f in fields)
+
+ALGAE_FIELDS = ("ph", "do_mg_l", "temp_c", "co2_uptake_kg_h", "biomass_g_l")
+SALT_FIELDS = ("soc_mwh", "temp_hot_c", "temp_cold_c", "heat_loss_kw")
+DISPATCH_FIELDS = ("charge_kw", "discharge_kw", "feasible")
+LEDGER_FIELDS = ("co2_in_kg", "co2_fixed_kg", "co2_net_kg")
+
+async def _poll_algae(keys: Set[str], now: datetime) -> Dict[str, Value]:
+    rows = await queries.fetch("algae.latest_many", list(keys), now)
+    return {r["reactor_id"]: _value(r, ALGAE_FIELDS) for r in rows}
+
+async def _poll_salt(keys: Set[str], now: datetime) -> Dict[str, Value]:
+    rows = await queries.fetch("salt.latest_many", list(keys), now)
+    return {r["site_id"]: _value(r, SALT_FIELDS) for r in rows}
+
+async def _poll_dispatch(keys: Set[str], now: datetime) -> Dict[str, Value]:
+    rows = await queries.fetch("dispatch.current_many", list(keys), now)
+    return {r["site_id"]: _value(r, DISPATCH_FIELDS) for r in rows}
+
+async def _poll_ledger(keys: Set[str], now: datetime) -> Dict[str, Value]:
+    index = await get_prefix_index()
+    if index.last_hour is None:
+        return {}
+    return {"": (index.last_hour, index.total())}
+
+ALARM_FIELDS = tuple(alarm_names())
+
+async def _poll_alarms(keys: Set[str], now: datetime) -> Dict[str, Value]:
+    # In-memory engine state, no query
+    states = {}
+    for key in keys:
+        st = alarm_engine.reactors.get(key)
+        if st is not None and st.last_time is not None:
+            states[key] = (st.last_time.timestamp(), tuple(float(a in st.active) for a in ALARM_FIELDS))
+    return states
+
+TOPIC_KINDS: Dict[str, TopicKind] = {
+    "algae": TopicKind(ALGAE_FIELDS, True, _poll_algae),
+    "salt": TopicKind(SALT_FIELDS, True, _poll_salt),
+    "dispatch": TopicKind(DISPATCH_FIELDS, True, _poll_dispatch),
+    "ledger": TopicKind(LEDGER_FIELDS, False, _poll_ledger),
+    "alarms": TopicKind(ALARM_FIELDS, True, _poll_alarms),
+}
+
+async def resolve(topic: str) -> Tuple[str, str]:
+    """Split and validate `kind:key`; raises ValueError with a client-facing message"""
+    kind, _, key = topic.partition(":")
+    spec = TOPIC_KINDS.get(kind)
+    if spec is None:
+        raise ValueError(f"Unknown topic kind: {kind} (one of: {', '.join(TOPIC_KINDS)})")
+    if not spec.keyed:
+        if key:
+            raise ValueError(f"Topic {kind} takes no key")
+        return kind, key
+    if not key:
+        raise ValueError(f"Topic {kind} needs a key ({kind}:<id>)")
+    by_reactor = kind in ("algae", "alarms")
+    found = await (directory.reactor(key) if by_reactor else directory.site(key))
+    if found is None:
+        raise ValueError(f"Unknown {'reactor' if by_reactor else 'site'}: {key}")
+    return kind, key
+
+class Subscription:
+    __slots__ = ("topic", "kind", "key", "topic_id", "min_interval_s",
+                 "sent_version", "sent_changes", "sent_values", "next_at", "seq")
+
+    def __init__(self, topic: str, kind: str, key: str, topic_id: int, max_hz: float):
+        self.topic = topic
+        self.kind = kind
+        self.key = key
+        self.topic_id = topic_id
+        self.min_interval_s = 1.0 / max_hz
+        self.sent_version = 0
+        self.sent_changes = 0
+        self.sent_values: Optional[Tuple[float, ...]] = None
+        self.next_at = 0.0
+        self.seq = 0
+
+class Client:
+    """One socket: its subscriptions plus control replies waiting to be sent"""
+
+    def __init__(self, binary: bool = False):
+        self.binary = binary
+        self.subscriptions: Dict[str, Subscription] = {}
+        self.replies: List[dict] = []
+        self.wake = asyncio.Event()
+        self._next_id = 1
+
+    def subscribe(self, topic: str, kind: str, key: str, max_hz: float) -> Subscription:
+        existing = self.subscriptions.get(topic)
+        if existing is not None:
+            existing.min_interval_s = 1.0 / max_hz
+            return existing
+        if len(self.subscriptions) >= MAX_TOPICS_PER_CLIENT:
+            raise ValueError(f"At most {MAX_TOPICS_PER_CLIENT} topics per connection")
+        sub = Subscription(topic, kind, key, self._next_id, max_hz)
+        self._next_id += 1
+        self.subscriptions[topic] = sub
+        self.wake.set()
+        return sub
+
+    def unsubscribe(self, topic: str) -> bool:
+        return self.subscriptions.pop(topic, None) is not None
+
+    def reply(self, message: dict):
+        self.replies.append(message)
+        self.wake.set()
+
+    def collect(self, latest: Dict[str, Entry], now: float) -> Tuple[list, Optional[float]]:
+        """Frames due now, and seconds until the next throttled topic is due (None: wait for data)"""
+        frames = [json.dumps(r, separators=(",", ":")) for r in self.replies]
+        self.replies.clear()
+        wait_s = None
+
+        for sub in self.subscriptions.values():
+            entry = latest.get(sub.topic)
+            if entry is None or entry[0] == sub.sent_version:
+                continue
+            if now < sub.next_at:
+                remaining = sub.next_at - now
+                wait_s = remaining if wait_s is None else min(wait_s, remaining)
+                continue
+
+            version, (ts, values), changes = entry
+            if sub.sent_version:
+                updates_coalesced.inc(max(0, changes - sub.sent_changes - 1))
+            frames.append(self._encode(sub, ts, values))
+            sub.sent_version = version
+            sub.sent_changes = changes
+            sub.sent_values = values
+            sub.next_at = now + sub.min_interval_s
+
+        return frames, wait_s
+
+    def _encode(self, sub: Subscription, ts: float, values: Tuple[float, ...]) -> Union[str, bytes]:
+        previous = sub.sent_values
+        # An empty delta still advances the client's clock to the new timestamp
+        changed = [i for i, v in enumerate(values) if previous is None or previous[i] != v]
+        sub.seq += 1
+        frames_sent.inc(format="binary" if self.binary else "json")
+
+        if self.binary:
+            mask = 0
+            for i in changed:
+                mask |= 1 << i
+            body = struct.pack(f"<{len(changed)}d", *(values[i] for i in changed))
+            return FRAME_HEADER.pack(sub.topic_id, sub.seq, ts, mask) + body
+
+        fields = TOPIC_KINDS[sub.kind].fields
+        message = {
+            "topic": sub.topic,
+            "seq": sub.seq,
+            "time": format_time(datetime.fromtimestamp(ts, tz=timezone.utc)),
+            "data": {fields[i]: values[i] for i in changed},
+        }
+        if previous is None:
+            message["full"] = True
+        return json.dumps(message, separators=(",", ":"))
+
+class ChannelHub:
+    def __init__(self, interval_s: float = POLL_INTERVAL_S):
+        self.interval_s = interval_s
+        self._clients: Set[Client] = set()
+        # topic -> (hub-wide version, newest value, topic change count). Versions
+        # never repeat, even for a topic that dropped out and came back, so a
+        # subscriber's sent_version can't match a value it has not seen
+        self.latest: Dict[str, Entry] = {}
+        self._version = 0
+        # topic -> replays currently feeding it
+        self.claimed: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def client_count(self) -> int:
+        return len(self._clients)
+
+    def topics(self) -> Dict[str, Set[str]]:
+        """Subscribed keys per topic kind across all clients"""
+        keys: Dict[str, Set[str]] = {}
+        for client in self._clients:
+            for sub in client.subscriptions.values():
+                keys.setdefault(sub.kind, set()).add(sub.key)
+        return keys
+
+    def connect(self, binary: bool = False) -> Client:
+        client = Client(binary)
+        self._clients.add(client)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="channel-hub")
+        return client
+
+    def disconnect(self, client: Client):
+        self._clients.discard(client)
+
+    def claim(self, topic: str):
+        self.claimed[topic] = self.claimed.get(topic, 0) + 1
+
+    def release(self, topic: str):
+        if self.claimed.get(topic, 0) > 1:
+            self.claimed[topic] -= 1
+        else:
+            self.claimed.pop(topic, None)
+
+    def push(self, values: Dict[str, Value]):
+        """Set the newest value of topics directly, then wake clients once"""
+        for topic, value in values.items():
+            self.latest[topic] = self._entry(self.latest.get(topic), value)
+        if values:
+            for client in list(self._clients):
+                client.wake.set()
+
+    def _entry(self, previous: Optional[Entry], value: Value) -> Entry:
+        self._version += 1
+        return self._version, value, (previous[2] if previous else 0) + 1
+
+    async def _run(self):
+        # Exits once the last client leaves; connect() restarts it
+        while self._clients:
+            try:
+                await self.poll_once()
+                await asyncio.sleep(self.interval_s)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                for client in list(self._clients):
+                    client.reply({"op": "error", "detail": str(e)})
+                await asyncio.sleep(ERROR_BACKOFF_S)
+
+    async def poll_once(self, now: Optional[datetime] = None):
+        now = now or datetime.now(timezone.utc)
+        subscribed = self.topics()
+        latest: Dict[str, Entry] = {}
+        changed = False
+
+        for kind, keys in subscribed.items():
+            for key, value in (await TOPIC_KINDS[kind].poll(keys, now)).items():
+                topic = f"{kind}:{key}" if key else kind
+                if topic in self.claimed:
+                    continue
+                previous = self.latest.get(topic)
+                if previous is not None and previous[1] == value:
+                    latest[topic] = previous
+                    continue
+                latest[topic] = self._entry(previous, value)
+                changed = True
+
+        for topic in self.claimed:
+            if topic in self.latest:
+                latest[topic] = self.latest[topic]
+
+        # Topics nobody subscribes to any more are dropped here
+        self.latest = latest
+        if changed:
+            for client in list(self._clients):
+                client.wake.set()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+hub = ChannelHub()
+
+metrics.gauge("ws_clients", "Open live WebSocket connections", func=lambda: hub.client_count)
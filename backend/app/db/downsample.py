@@ -0,0 +1,254 @@
+"""Tiered downsampling of aged minute data
+
+Raw `algae_telemetry` / `salt_state` rows are rolled into `<table>_15m`
+(from raw) and `<table>_1h` (from the 15m tier) with min/max/avg/count per
+column. A watermark per (source, tier) in `compaction_state` records how far
+each tier is complete. Once a tier covers them, raw rows older than the
+table's RETENTION_DAYS_* setting are removed (whole partitions for
+partitioned tables, see partitions.py; DELETE otherwise).
+
+`read_history()` routes a requested range of one series (a site, or a
+site + reactor) to the cheapest tier meeting the requested resolution and
+returns rows shaped like the raw table (avg values under the raw column
+names). Buckets are grouped per series key, so compaction cost grows
+linearly with the number of reactors. `read_since()` returns only the raw
+rows appended after a cursor, for clients that poll a sliding window.
+"""
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Sequence, Tuple
+from .connection import acquire
+from .partitions import PARTITIONED_TABLES
+from . import queries
+
+# table -> (query prefix, series key columns, value columns)
+SOURCES = {
+    "algae_telemetry": ("algae", ["site_id", "reactor_id"],
+                        ["ph", "do_mg_l", "temp_c", "co2_uptake_kg_h", "biomass_g_l"]),
+    "salt_state": ("salt", ["site_id"], ["soc_mwh", "temp_hot_c", "temp_cold_c", "heat_loss_kw"]),
+}
+
+RAW_RESOLUTION_S = 60
+
+# tier -> (bucket seconds, table the tier is built from)
+TIERS = {
+    "15m": (900, None),
+    "1h": (3600, "15m"),
+}
+
+# Buckets newer than this are left for the next run so late samples are included
+COMPACTION_LAG = timedelta(minutes=5)
+
+# Rows per compaction statement are bounded by this span
+COMPACTION_CHUNK = timedelta(days=1)
+
+def _interval(seconds: int) -> str:
+    return f"{seconds} seconds"
+
+def _register_queries():
+    for table, (prefix, keys, cols) in SOURCES.items():
+        avg_cols = ", ".join(f"{c}_avg AS {c}" for c in cols)
+        # History statements take the series key first: $1..$k, then start, end
+        n = len(keys)
+        key_match = " AND ".join(f"{k} = ${i + 1}" for i, k in enumerate(keys))
+        key_cols = ", ".join(keys)
+        # Delta reads: strictly after the cursor, an index range scan over new rows only
+        queries.register(
+            f"{prefix}.history_since",
+            f"""SELECT time, {", ".join(cols)}
+                FROM {table}
+                WHERE {key_match} AND time > ${n + 1} AND time <= ${n + 2}
+                ORDER BY time"""
+        )
+        queries.register(
+            f"{prefix}.history_binned",
+            f"""SELECT date_bin(${n + 3}::interval, time, TIMESTAMPTZ 'epoch') AS time,
+                       {", ".join(f"AVG({c})::real AS {c}" for c in cols)}
+                FROM {table}
+                WHERE {key_match} AND time >= ${n + 1} AND time <= ${n + 2}
+                GROUP BY 1
+                ORDER BY 1"""
+        )
+        for tier, (bucket_s, parent) in TIERS.items():
+            queries.register(
+                f"{prefix}.history_{tier}",
+                f"""SELECT time, {avg_cols}
+                    FROM {table}_{tier}
+                    WHERE {key_match} AND time >= ${n + 1} AND time < ${n + 2}
+                    ORDER BY time"""
+            )
+
+            stat_cols = ", ".join(f"{c}_min, {c}_max, {c}_avg" for c in cols)
+            updates = ", ".join(
+                f"{c}_{a} = EXCLUDED.{c}_{a}" for c in cols for a in ("min", "max", "avg")
+            )
+            if parent is None:
+                select = ", ".join(f"MIN({c}), MAX({c}), AVG({c})" for c in cols)
+                source_sql = f"""SELECT {key_cols}, date_bin('{_interval(bucket_s)}', time, TIMESTAMPTZ 'epoch'),
+                                        COUNT(*), {select}
+                                 FROM {table}
+                                 WHERE time >= $1 AND time < $2
+                                 GROUP BY {key_cols}, {n + 1}"""
+            else:
+                # Weighted by samples so the coarse average matches the raw average
+                select = ", ".join(
+                    f"MIN({c}_min), MAX({c}_max), SUM({c}_avg * samples) / SUM(samples)" for c in cols
+                )
+                source_sql = f"""SELECT {key_cols}, date_bin('{_interval(bucket_s)}', time, TIMESTAMPTZ 'epoch'),
+                                        SUM(samples), {select}
+                                 FROM {table}_{parent}
+                                 WHERE time >= $1 AND time < $2
+                                 GROUP BY {key_cols}, {n + 1}"""
+            queries.register(
+                f"{prefix}.compact_{tier}",
+                f"""INSERT INTO {table}_{tier} ({key_cols}, time, samples, {stat_cols})
+                    {source_sql}
+                    ON CONFLICT ({key_cols}, time) DO UPDATE SET samples = EXCLUDED.samples, {updates}"""
+            )
+
+        queries.register(f"{prefix}.earliest", f"SELECT MIN(time) FROM {table}")
+        queries.register(f"{prefix}.delete_before", f"DELETE FROM {table} WHERE time < $1")
+
+    queries.register(
+        "compaction.watermark",
+        "SELECT watermark FROM compaction_state WHERE source = $1 AND tier = $2"
+    )
+    queries.register(
+        "compaction.set_watermark",
+        """INSERT INTO compaction_state (source, tier, watermark) VALUES ($1, $2, $3)
+           ON CONFLICT (source, tier) DO UPDATE SET watermark = EXCLUDED.watermark"""
+    )
+
+_register_queries()
+
+def _floor(t: datetime, bucket_s: int) -> datetime:
+    ts = t.timestamp()
+    return datetime.fromtimestamp(ts - ts % bucket_s, tz=timezone.utc)
+
+def raw_retention(table: str) -> Optional[timedelta]:
+    retention = PARTITIONED_TABLES[table][1]
+    return timedelta(days=int(retention)) if retention else None
+
+async def compact_source(table: str, conn, now: Optional[datetime] = None) -> dict:
+    """Advance every tier of one source up to the last complete bucket"""
+    prefix = SOURCES[table][0]
+    now = now or datetime.now(timezone.utc)
+    advanced = {}
+
+    for tier, (bucket_s, parent) in TIERS.items():
+        watermark = await queries.fetchval("compaction.watermark", table, tier, conn=conn)
+        if parent is None:
+            limit = _floor(now - COMPACTION_LAG, bucket_s)
+            if watermark is None:
+                earliest = await queries.fetchval(f"{prefix}.earliest", conn=conn)
+                if earliest is None:
+                    continue
+                watermark = _floor(earliest, bucket_s)
+        else:
+            parent_mark = await queries.fetchval("compaction.watermark", table, parent, conn=conn)
+            if parent_mark is None:
+                continue
+            limit = _floor(parent_mark, bucket_s)
+            if watermark is None:
+                earliest = await queries.fetchval(f"{prefix}.earliest", conn=conn)
+                watermark = _floor(earliest or parent_mark, bucket_s)
+
+        start = watermark
+        while start < limit:
+            end = min(start + COMPACTION_CHUNK, limit)
+            async with conn.transaction():
+                await queries.execute(f"{prefix}.compact_{tier}", start, end, conn=conn)
+                await queries.execute("compaction.set_watermark", table, tier, end, conn=conn)
+            start = end
+        advanced[tier] = start
+
+    return advanced
+
+async def compact_all():
+    """Compaction job: advance tiers, then drop raw rows that are both compacted and expired"""
+    now = datetime.now(timezone.utc)
+    async with acquire() as conn:
+        for table, (prefix, _, _) in SOURCES.items():
+            advanced = await compact_source(table, conn, now)
+            retention = raw_retention(table)
+            if retention is None:
+                continue
+
+            is_partitioned = await conn.fetchval(
+                "SELECT relkind = 'p' FROM pg_class WHERE relname = $1", table
+            )
+            if is_partitioned:
+                # maintain_partitions() drops whole partitions, clamped to the watermark
+                continue
+
+            mark = await queries.fetchval("compaction.watermark", table, "15m", conn=conn)
+            if mark is None:
+                continue
+            cutoff = min(now - retention, mark)
+            status = await queries.execute(f"{prefix}.delete_before", cutoff, conn=conn)
+            print(f"✓ Compacted {table} {advanced}; {status} raw rows before {cutoff.isoformat()}")
+
+def choose_tier(table: str, start: datetime, end: datetime,
+                resolution_s: Optional[int] = None, max_points: Optional[int] = None,
+                now: Optional[datetime] = None) -> Tuple[str, int]:
+    """Pick the tier to serve [start, end] from.
+
+    With `resolution_s`, the coarsest tier no coarser than that spacing;
+    with `max_points`, the finest tier that stays within that many points.
+    Falls back to the finest tier when raw data for `start` has already
+    been removed. Returns (tier, bucket seconds); tier "raw" means minutes.
+    """
+    ladder = [("raw", RAW_RESOLUTION_S)] + sorted(
+        ((name, bucket_s) for name, (bucket_s, _) in TIERS.items()), key=lambda nb: nb[1]
+    )
+
+    tier, bucket = ladder[0]
+    if resolution_s is not None:
+        for name, bucket_s in ladder:
+            if bucket_s <= resolution_s:
+                tier, bucket = name, bucket_s
+    elif max_points:
+        needed = (end - start).total_seconds() / max_points
+        tier, bucket = next(((n, b) for n, b in ladder if b >= needed), ladder[-1])
+
+    retention = raw_retention(table)
+    now = now or datetime.now(timezone.utc)
+    if tier == "raw" and retention is not None and start < now - retention:
+        tier, bucket = min(((n, b) for n, (b, _) in TIERS.items()), key=lambda nb: nb[1])
+
+    return tier, bucket
+
+async def read_history(table: str, key: Sequence[str], start: datetime, end: datetime,
+                       resolution_s: Optional[int] = None, max_points: Optional[int] = None,
+                       conn=None) -> Tuple[List, int]:
+    """Rows of one series (`key` values for the table's key columns) for
+    [start, end] from the cheapest adequate tier, plus the resolution used"""
+    prefix, keys, _ = SOURCES[table]
+    if len(key) != len(keys):
+        raise ValueError(f"{table} history is keyed by ({', '.join(keys)})")
+    tier, bucket_s = choose_tier(table, start, end, resolution_s, max_points)
+
+    if tier == "raw":
+        return await queries.fetch(f"{prefix}.history", *key, start, end, conn=conn), RAW_RESOLUTION_S
+
+    watermark = await queries.fetchval("compaction.watermark", table, tier, conn=conn)
+    rows = []
+    if watermark is not None and watermark > start:
+        rows = list(await queries.fetch(
+            f"{prefix}.history_{tier}", *key, start, min(watermark, end), conn=conn
+        ))
+
+    # Anything newer than the tier's watermark is binned on the fly from raw rows
+    tail_start = max(start, watermark) if watermark is not None else start
+    if tail_start <= end:
+        rows.extend(await queries.fetch(
+            f"{prefix}.history_binned", *key, tail_start, end, timedelta(seconds=bucket_s), conn=conn
+        ))
+
+    return rows, bucket_s
+
+async def read_since(table: str, key: Sequence[str], since: datetime, end: datetime, conn=None) -> List:
+    """Raw rows of one series with `since < time <= end`"""
+    prefix, keys, _ = SOURCES[table]
+    if len(key) != len(keys):
+        raise ValueError(f"{table} history is keyed by ({', '.join(keys)})")
+    return await queries.fetch(f"{prefix}.history_since", *key, since, end, conn=conn)
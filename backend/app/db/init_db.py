@@ -1,15 +1,9 @@
-from pathlib import Path
 from .connection import get_pool
+from .migrate import run_migrations
 
 async def init_database():
-    """Initialize database schema"""
-    pool = await get_pool()
-    schema_path = Path(__file__).parent / "schema.sql"
-    schema_sql = schema_path.read_text()
-
-    async with pool.acquire() as conn:
-        await conn.execute(schema_sql)
-        print("✓ Database schema initialized")
+    """Initialize database schema (applies pending migrations)"""
+    await run_migrations()
 
 async def clear_database():
     """Clear all data from tables"""
@@ -20,7 +14,13 @@ async def clear_database():
         "salt_state",
         "dispatch_plan",
         "algae_telemetry",
-        "carbon_ledger"
+        "carbon_ledger",
+        "carbon_ledger_cumsum",
+        "algae_telemetry_15m",
+        "algae_telemetry_1h",
+        "salt_state_15m",
+        "salt_state_1h",
+        "compaction_state"
     ]
 
     async with pool.acquire() as conn:
@@ -0,0 +1,116 @@
+"""Versioned schema migrations
+
+Migrations are the `NNNN_name.sql` files in `migrations/`, applied in
+order and recorded in `schema_migrations` with a checksum of their SQL.
+When the database is already at the latest version, startup costs a single
+read of `schema_migrations`; an applied migration whose file has changed
+since fails startup instead of leaving the schema silently out of step.
+Otherwise workers serialize on an advisory lock, so only one of them runs
+the DDL while the others wait and then find nothing to do.
+"""
+import re
+import time
+import hashlib
+from pathlib import Path
+from typing import List, Tuple
+import asyncpg
+from .connection import acquire
+
+MIGRATIONS_DIR = Path(__file__).parent / "migrations"
+MIGRATION_LOCK_KEY = 0x43464d67  # "CFMg"
+
+_FILENAME = re.compile(r"^(\d+)_([\w-]+)\.sql$")
+
+# Outcome of the last run, reported by /healthz
+last_run = {
+    "version": None,
+    "applied": [],
+    "duration_ms": None,
+}
+
+def _checksum(sql: str) -> str:
+    return hashlib.sha256(sql.encode("utf-8")).hexdigest()
+
+def load_migrations() -> List[Tuple[int, str, str]]:
+    """(version, name, sql) for every migration file, in version order"""
+    migrations = []
+    for path in MIGRATIONS_DIR.glob("*.sql"):
+        match = _FILENAME.match(path.name)
+        if not match:
+            continue
+        migrations.append((int(match.group(1)), match.group(2), path.read_text()))
+    migrations.sort()
+
+    versions = [m[0] for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise RuntimeError("Duplicate migration version in " + str(MIGRATIONS_DIR))
+    return migrations
+
+async def _current_version(conn, migrations: List[Tuple[int, str, str]]) -> int:
+    """Latest applied version, after checking applied migrations against their files"""
+    try:
+        rows = await conn.fetch("SELECT version, name, checksum FROM schema_migrations")
+    except asyncpg.UndefinedTableError:
+        return 0
+
+    files = {number: (name, sql) for number, name, sql in migrations}
+    for row in rows:
+        if row["version"] not in files:
+            raise RuntimeError(
+                f"Migration {row['version']:04d}_{row['name']} is applied but its file is missing"
+            )
+        name, sql = files[row["version"]]
+        if row["checksum"] != _checksum(sql):
+            raise RuntimeError(
+                f"Migration {row['version']:04d}_{name}.sql was modified after it was applied; "
+                "add a new migration instead"
+            )
+    return max((row["version"] for row in rows), default=0)
+
+async def run_migrations() -> int:
+    """Bring the schema up to date; returns the resulting version"""
+    started = time.perf_counter()
+    migrations = load_migrations()
+    latest = migrations[-1][0] if migrations else 0
+    applied = []
+
+    async with acquire() as conn:
+        version = await _current_version(conn, migrations)
+
+        if version < latest:
+            await conn.execute("SELECT pg_advisory_lock($1)", MIGRATION_LOCK_KEY)
+            try:
+                await conn.execute(
+                    """CREATE TABLE IF NOT EXISTS schema_migrations (
+                           version INTEGER PRIMARY KEY,
+                           name TEXT NOT NULL,
+                           checksum TEXT NOT NULL,
+                           applied_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                       )"""
+                )
+                # Another worker may have migrated while we waited for the lock
+                version = await _current_version(conn, migrations)
+
+                for number, name, sql in migrations:
+                    if number <= version:
+                        continue
+                    checksum = _checksum(sql)
+                    async with conn.transaction():
+                        await conn.execute(sql)
+                        await conn.execute(
+                            "INSERT INTO schema_migrations (version, name, checksum) VALUES ($1, $2, $3)",
+                            number, name, checksum
+                        )
+                    applied.append(f"{number:04d}_{name}")
+                    version = number
+            finally:
+                await conn.execute("SELECT pg_advisory_unlock($1)", MIGRATION_LOCK_KEY)
+
+    duration_ms = (time.perf_counter() - started) * 1000
+    last_run.update(version=version, applied=applied, duration_ms=round(duration_ms, 2))
+
+    if applied:
+        print(f"✓ Applied migrations {', '.join(applied)} in {duration_ms:.0f} ms")
+    else:
+        print(f"✓ Schema at version {version} ({duration_ms:.1f} ms)")
+    return version
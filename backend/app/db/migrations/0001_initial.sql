@@ -0,0 +1,209 @@
+-- 0001: initial schema
+
+-- Core time-series tables
+--
+-- Minute-resolution tables are range-partitioned on time; partitions are
+-- created ahead of time and dropped for retention by app/db/partitions.py.
+-- Each table keeps its primary key (needed for ON CONFLICT) plus a BRIN
+-- index on time for cheap range scans.
+
+CREATE TABLE IF NOT EXISTS forecast_solar (
+    time TIMESTAMPTZ PRIMARY KEY,
+    value_kw REAL NOT NULL,
+    p5 REAL NOT NULL,
+    p50 REAL NOT NULL,
+    p95 REAL NOT NULL
+) PARTITION BY RANGE (time);
+
+DROP INDEX IF EXISTS idx_forecast_solar_time;
+CREATE INDEX IF NOT EXISTS brin_forecast_solar_time ON forecast_solar USING brin (time);
+
+CREATE TABLE IF NOT EXISTS forecast_green_windows (
+    id SERIAL PRIMARY KEY,
+    start_time TIMESTAMPTZ NOT NULL,
+    end_time TIMESTAMPTZ NOT NULL,
+    carbon_gco2_kwh REAL NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_green_windows_time ON forecast_green_windows(start_time, end_time);
+
+CREATE TABLE IF NOT EXISTS salt_state (
+    time TIMESTAMPTZ PRIMARY KEY,
+    soc_mwh REAL NOT NULL,
+    temp_hot_c REAL NOT NULL,
+    temp_cold_c REAL NOT NULL,
+    heat_loss_kw REAL NOT NULL
+) PARTITION BY RANGE (time);
+
+DROP INDEX IF EXISTS idx_salt_state_time;
+CREATE INDEX IF NOT EXISTS brin_salt_state_time ON salt_state USING brin (time);
+
+CREATE TABLE IF NOT EXISTS dispatch_plan (
+    time TIMESTAMPTZ PRIMARY KEY,
+    charge_kw REAL NOT NULL,
+    discharge_kw REAL NOT NULL,
+    feasible BOOLEAN NOT NULL
+) PARTITION BY RANGE (time);
+
+DROP INDEX IF EXISTS idx_dispatch_plan_time;
+CREATE INDEX IF NOT EXISTS brin_dispatch_plan_time ON dispatch_plan USING brin (time);
+
+CREATE TABLE IF NOT EXISTS algae_telemetry (
+    time TIMESTAMPTZ PRIMARY KEY,
+    ph REAL NOT NULL,
+    do_mg_l REAL NOT NULL,
+    temp_c REAL NOT NULL,
+    co2_uptake_kg_h REAL NOT NULL,
+    biomass_g_l REAL NOT NULL
+) PARTITION BY RANGE (time);
+
+DROP INDEX IF EXISTS idx_algae_telemetry_time;
+CREATE INDEX IF NOT EXISTS brin_algae_telemetry_time ON algae_telemetry USING brin (time);
+
+CREATE TABLE IF NOT EXISTS carbon_ledger (
+    time TIMESTAMPTZ PRIMARY KEY,
+    co2_in_kg REAL NOT NULL,
+    co2_fixed_kg REAL NOT NULL,
+    co2_net_kg REAL NOT NULL
+) PARTITION BY RANGE (time);
+
+DROP INDEX IF EXISTS idx_carbon_ledger_time;
+CREATE INDEX IF NOT EXISTS brin_carbon_ledger_time ON carbon_ledger USING brin (time);
+
+-- Running totals of carbon_ledger through each hour (inclusive), maintained on append
+CREATE TABLE IF NOT EXISTS carbon_ledger_cumsum (
+    time TIMESTAMPTZ PRIMARY KEY,
+    cum_co2_in_kg DOUBLE PRECISION NOT NULL,
+    cum_co2_fixed_kg DOUBLE PRECISION NOT NULL,
+    cum_co2_net_kg DOUBLE PRECISION NOT NULL
+);
+
+-- Downsampled tiers (min/max/avg/count per bucket), filled by app/db/downsample.py
+
+CREATE TABLE IF NOT EXISTS algae_telemetry_15m (
+    time TIMESTAMPTZ PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    ph_min REAL NOT NULL,
+    ph_max REAL NOT NULL,
+    ph_avg REAL NOT NULL,
+    do_mg_l_min REAL NOT NULL,
+    do_mg_l_max REAL NOT NULL,
+    do_mg_l_avg REAL NOT NULL,
+    temp_c_min REAL NOT NULL,
+    temp_c_max REAL NOT NULL,
+    temp_c_avg REAL NOT NULL,
+    co2_uptake_kg_h_min REAL NOT NULL,
+    co2_uptake_kg_h_max REAL NOT NULL,
+    co2_uptake_kg_h_avg REAL NOT NULL,
+    biomass_g_l_min REAL NOT NULL,
+    biomass_g_l_max REAL NOT NULL,
+    biomass_g_l_avg REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS algae_telemetry_1h (
+    time TIMESTAMPTZ PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    ph_min REAL NOT NULL,
+    ph_max REAL NOT NULL,
+    ph_avg REAL NOT NULL,
+    do_mg_l_min REAL NOT NULL,
+    do_mg_l_max REAL NOT NULL,
+    do_mg_l_avg REAL NOT NULL,
+    temp_c_min REAL NOT NULL,
+    temp_c_max REAL NOT NULL,
+    temp_c_avg REAL NOT NULL,
+    co2_uptake_kg_h_min REAL NOT NULL,
+    co2_uptake_kg_h_max REAL NOT NULL,
+    co2_uptake_kg_h_avg REAL NOT NULL,
+    biomass_g_l_min REAL NOT NULL,
+    biomass_g_l_max REAL NOT NULL,
+    biomass_g_l_avg REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS salt_state_15m (
+    time TIMESTAMPTZ PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    soc_mwh_min REAL NOT NULL,
+    soc_mwh_max REAL NOT NULL,
+    soc_mwh_avg REAL NOT NULL,
+    temp_hot_c_min REAL NOT NULL,
+    temp_hot_c_max REAL NOT NULL,
+    temp_hot_c_avg REAL NOT NULL,
+    temp_cold_c_min REAL NOT NULL,
+    temp_cold_c_max REAL NOT NULL,
+    temp_cold_c_avg REAL NOT NULL,
+    heat_loss_kw_min REAL NOT NULL,
+    heat_loss_kw_max REAL NOT NULL,
+    heat_loss_kw_avg REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS salt_state_1h (
+    time TIMESTAMPTZ PRIMARY KEY,
+    samples INTEGER NOT NULL,
+    soc_mwh_min REAL NOT NULL,
+    soc_mwh_max REAL NOT NULL,
+    soc_mwh_avg REAL NOT NULL,
+    temp_hot_c_min REAL NOT NULL,
+    temp_hot_c_max REAL NOT NULL,
+    temp_hot_c_avg REAL NOT NULL,
+    temp_cold_c_min REAL NOT NULL,
+    temp_cold_c_max REAL NOT NULL,
+    temp_cold_c_avg REAL NOT NULL,
+    heat_loss_kw_min REAL NOT NULL,
+    heat_loss_kw_max REAL NOT NULL,
+    heat_loss_kw_avg REAL NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS compaction_state (
+    source TEXT NOT NULL,
+    tier TEXT NOT NULL,
+    watermark TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (source, tier)
+);
+
+-- Materialized views
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_hourly_rollups AS
+SELECT
+    date_trunc('hour', time) as hour,
+    'solar' as source,
+    AVG(value_kw) as avg_value,
+    MIN(value_kw) as min_value,
+    MAX(value_kw) as max_value,
+    SUM(value_kw) as sum_value
+FROM forecast_solar
+GROUP BY date_trunc('hour', time)
+UNION ALL
+SELECT
+    date_trunc('hour', time) as hour,
+    'salt_soc' as source,
+    AVG(soc_mwh) as avg_value,
+    MIN(soc_mwh) as min_value,
+    MAX(soc_mwh) as max_value,
+    NULL as sum_value
+FROM salt_state
+GROUP BY date_trunc('hour', time)
+UNION ALL
+SELECT
+    date_trunc('hour', time) as hour,
+    'algae_co2' as source,
+    AVG(co2_uptake_kg_h) as avg_value,
+    MIN(co2_uptake_kg_h) as min_value,
+    MAX(co2_uptake_kg_h) as max_value,
+    SUM(co2_uptake_kg_h) as sum_value
+FROM algae_telemetry
+GROUP BY date_trunc('hour', time);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_hourly_rollups ON mv_hourly_rollups(hour, source);
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS mv_daily_ledger AS
+SELECT
+    date_trunc('day', time) as day,
+    SUM(co2_in_kg) as total_co2_in_kg,
+    SUM(co2_fixed_kg) as total_co2_fixed_kg,
+    SUM(co2_net_kg) as total_co2_net_kg,
+    COUNT(*) as records
+FROM carbon_ledger
+GROUP BY date_trunc('day', time);
+
+CREATE UNIQUE INDEX IF NOT EXISTS idx_mv_daily_ledger ON mv_daily_ledger(day);
@@ -0,0 +1,61 @@
+-- 0002: sites and reactors
+--
+-- Storage (salt_state, dispatch_plan) is keyed by site and bioreactor
+-- telemetry by site + reactor. Existing single-plant rows are assigned to
+-- the default site/reactor through the column defaults. Time partitions
+-- created from now on are hash-sharded by site_id (see partitions.py).
+-- forecast_solar, forecast_green_windows and the carbon ledger stay
+-- fleet-wide.
+
+CREATE TABLE IF NOT EXISTS sites (
+    site_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    capacity_mwh REAL NOT NULL DEFAULT 10.0,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE TABLE IF NOT EXISTS reactors (
+    reactor_id TEXT PRIMARY KEY,
+    site_id TEXT NOT NULL REFERENCES sites(site_id),
+    name TEXT NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_reactors_site ON reactors(site_id);
+
+INSERT INTO sites (site_id, name) VALUES ('site-1', 'Site 1') ON CONFLICT DO NOTHING;
+INSERT INTO reactors (reactor_id, site_id, name) VALUES ('pbr-01', 'site-1', 'Photobioreactor 1') ON CONFLICT DO NOTHING;
+
+-- Site-keyed storage tables
+ALTER TABLE salt_state ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE salt_state DROP CONSTRAINT IF EXISTS salt_state_pkey;
+ALTER TABLE salt_state ADD PRIMARY KEY (site_id, time);
+
+ALTER TABLE dispatch_plan ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE dispatch_plan DROP CONSTRAINT IF EXISTS dispatch_plan_pkey;
+ALTER TABLE dispatch_plan ADD PRIMARY KEY (site_id, time);
+
+-- Reactor-keyed telemetry
+ALTER TABLE algae_telemetry ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE algae_telemetry ADD COLUMN IF NOT EXISTS reactor_id TEXT NOT NULL DEFAULT 'pbr-01';
+ALTER TABLE algae_telemetry DROP CONSTRAINT IF EXISTS algae_telemetry_pkey;
+ALTER TABLE algae_telemetry ADD PRIMARY KEY (site_id, reactor_id, time);
+
+-- Downsampled tiers carry the same keys
+ALTER TABLE salt_state_15m ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE salt_state_15m DROP CONSTRAINT IF EXISTS salt_state_15m_pkey;
+ALTER TABLE salt_state_15m ADD PRIMARY KEY (site_id, time);
+
+ALTER TABLE salt_state_1h ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE salt_state_1h DROP CONSTRAINT IF EXISTS salt_state_1h_pkey;
+ALTER TABLE salt_state_1h ADD PRIMARY KEY (site_id, time);
+
+ALTER TABLE algae_telemetry_15m ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE algae_telemetry_15m ADD COLUMN IF NOT EXISTS reactor_id TEXT NOT NULL DEFAULT 'pbr-01';
+ALTER TABLE algae_telemetry_15m DROP CONSTRAINT IF EXISTS algae_telemetry_15m_pkey;
+ALTER TABLE algae_telemetry_15m ADD PRIMARY KEY (site_id, reactor_id, time);
+
+ALTER TABLE algae_telemetry_1h ADD COLUMN IF NOT EXISTS site_id TEXT NOT NULL DEFAULT 'site-1';
+ALTER TABLE algae_telemetry_1h ADD COLUMN IF NOT EXISTS reactor_id TEXT NOT NULL DEFAULT 'pbr-01';
+ALTER TABLE algae_telemetry_1h DROP CONSTRAINT IF EXISTS algae_telemetry_1h_pkey;
+ALTER TABLE algae_telemetry_1h ADD PRIMARY KEY (site_id, reactor_id, time);
@@ -0,0 +1,22 @@
+-- 0003: alarm events
+--
+-- Raise/clear transitions emitted by the streaming alarm engine
+-- (app/alarms.py). The unique key makes inserts idempotent when scheduler
+-- leadership moves between workers mid-event.
+
+CREATE TABLE IF NOT EXISTS alarm_events (
+    id BIGSERIAL PRIMARY KEY,
+    time TIMESTAMPTZ NOT NULL,
+    site_id TEXT NOT NULL,
+    reactor_id TEXT NOT NULL,
+    alarm TEXT NOT NULL,
+    state TEXT NOT NULL CHECK (state IN ('raised', 'cleared')),
+    severity TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL,
+    detail TEXT NOT NULL DEFAULT '',
+    UNIQUE (reactor_id, alarm, time, state)
+);
+
+CREATE INDEX IF NOT EXISTS idx_alarm_events_reactor_time ON alarm_events (reactor_id, time DESC);
+CREATE INDEX IF NOT EXISTS idx_alarm_events_site_time ON alarm_events (site_id, time DESC);
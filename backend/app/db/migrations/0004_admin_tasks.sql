@@ -0,0 +1,24 @@
+-- 0004: admin tasks
+--
+-- Shared state of queued admin work (app/tasks.py). The worker running a
+-- task keeps its row current (heartbeat in updated_at); any worker serves
+-- status from it and requests cancellation through cancel_requested.
+
+CREATE TABLE IF NOT EXISTS admin_tasks (
+    task_id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params JSONB NOT NULL DEFAULT '{}',
+    state TEXT NOT NULL CHECK (state IN ('queued', 'running', 'done', 'failed', 'cancelled')),
+    progress DOUBLE PRECISION NOT NULL DEFAULT 0,
+    message TEXT,
+    result JSONB,
+    error TEXT,
+    worker TEXT NOT NULL,
+    cancel_requested BOOLEAN NOT NULL DEFAULT FALSE,
+    submitted_at TIMESTAMPTZ NOT NULL,
+    started_at TIMESTAMPTZ,
+    finished_at TIMESTAMPTZ,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS idx_admin_tasks_submitted ON admin_tasks (submitted_at DESC);
@@ -0,0 +1,15 @@
+-- 0005: alarm holds
+--
+-- Alarms suppressed by control actions (POST /algae/control). Every
+-- worker's alarm engine loads the current holds on each tick, so readings
+-- are evaluated identically whichever worker served the control request.
+
+CREATE TABLE IF NOT EXISTS alarm_holds (
+    reactor_id TEXT NOT NULL,
+    alarm TEXT NOT NULL,
+    since TIMESTAMPTZ NOT NULL,
+    until TIMESTAMPTZ NOT NULL,
+    PRIMARY KEY (reactor_id, alarm)
+);
+
+CREATE INDEX IF NOT EXISTS idx_alarm_holds_until ON alarm_holds (until);
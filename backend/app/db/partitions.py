@@ -0,0 +1,238 @@
+"""Range-partition maintenance for the time-series tables
+
+Partitions are named `<table>_p<YYYYMMDD>` after their (UTC) lower bound.
+`maintain_partitions()` creates partitions PARTITION_PREMAKE_DAYS ahead
+and drops whole partitions older than each table's retention window,
+instead of DELETEing rows.
+
+Time partitions of site-keyed tables are themselves hash-partitioned on
+site_id into SITE_SHARDS children (`<partition>_s<N>`), so per-site queries
+prune to one shard and a site's rows stay together.
+
+Databases created before partitioning still have these as plain tables
+(`CREATE TABLE IF NOT EXISTS ... PARTITION BY` does not convert them).
+They are reported once per process and in /healthz, and skipped: no
+partitions are created and retention does not apply to them.
+"""
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set, Tuple
+from .connection import acquire
+
+# table -> (partition interval, retention in days or None to keep forever)
+PARTITIONED_TABLES = {
+    "forecast_solar": ("week", os.getenv("RETENTION_DAYS_FORECAST_SOLAR")),
+    "salt_state": ("week", os.getenv("RETENTION_DAYS_SALT_STATE")),
+    "dispatch_plan": ("week", os.getenv("RETENTION_DAYS_DISPATCH_PLAN")),
+    "algae_telemetry": ("week", os.getenv("RETENTION_DAYS_ALGAE_TELEMETRY")),
+    # Audit data: never dropped
+    "carbon_ledger": ("month", None),
+}
+
+PARTITION_PREMAKE_DAYS = int(os.getenv("PARTITION_PREMAKE_DAYS", "28"))
+
+# Tables whose time partitions are sub-partitioned by HASH (site_id)
+SITE_SHARDED_TABLES = {"salt_state", "dispatch_plan", "algae_telemetry"}
+SITE_SHARDS = int(os.getenv("SITE_SHARDS", "4"))
+
+# Serializes partition DDL across workers
+PARTITION_LOCK_KEY = 0x43465061  # "CFPa"
+
+# Tables of PARTITIONED_TABLES that exist as plain tables, reported by /healthz
+unpartitioned: Set[str] = set()
+
+def _floor(t: datetime, interval: str) -> datetime:
+    t = t.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "day":
+        return t
+    if interval == "week":
+        return t - timedelta(days=t.weekday())
+    if interval == "month":
+        return t.replace(day=1)
+    raise ValueError(f"Unknown partition interval: {interval}")
+
+def _next(t: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return t + timedelta(days=1)
+    if interval == "week":
+        return t + timedelta(weeks=1)
+    return (t + timedelta(days=32)).replace(day=1)
+
+def partition_bounds(interval: str, start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """Aligned [lower, upper) partition ranges covering [start, end]"""
+    bounds = []
+    lower = _floor(start, interval)
+    while lower <= end:
+        upper = _next(lower, interval)
+        bounds.append((lower, upper))
+        lower = upper
+    return bounds
+
+def partition_name(table: str, lower: datetime) -> str:
+    return f"{table}_p{lower:%Y%m%d}"
+
+def _note_unpartitioned(table: str):
+    if table not in unpartitioned:
+        unpartitioned.add(table)
+        print(f"⚠ {table} is not partitioned (created before partitioning); "
+              "skipping partition maintenance and retention for it")
+
+async def _is_partitioned(conn, table: str) -> bool:
+    kind = await conn.fetchval(
+        "SELECT relkind FROM pg_class WHERE relname = $1 AND relnamespace = 'public'::regnamespace",
+        table
+    )
+    if kind == "r":
+        _note_unpartitioned(table)
+    return kind == "p"
+
+async def _existing_partitions(conn, table: str) -> List[str]:
+    rows = await conn.fetch(
+        """SELECT c.relname
+           FROM pg_inherits i
+           JOIN pg_class c ON c.oid = i.inhrelid
+           JOIN pg_class p ON p.oid = i.inhparent
+           WHERE p.relname = $1""",
+        table
+    )
+    return [r["relname"] for r in rows]
+
+async def _has_column(conn, table: str, column: str) -> bool:
+    return await conn.fetchval(
+        """SELECT EXISTS (SELECT 1 FROM information_schema.columns
+                          WHERE table_schema = 'public' AND table_name = $1 AND column_name = $2)""",
+        table, column
+    )
+
+async def ensure_partitions(table: str, start: datetime, end: datetime, conn=None) -> int:
+    """Create any missing partitions of `table` covering [start, end]"""
+    if conn is None:
+        async with acquire() as conn:
+            return await ensure_partitions(table, start, end, conn=conn)
+
+    if not await _is_partitioned(conn, table):
+        return 0
+
+    interval, _ = PARTITIONED_TABLES[table]
+    bounds = partition_bounds(interval, start, end)
+
+    # Common case (everything already exists) takes no lock and runs no DDL
+    existing = set(await _existing_partitions(conn, table))
+    if all(partition_name(table, lower) in existing for lower, _ in bounds):
+        return 0
+
+    sharded = (table in SITE_SHARDED_TABLES and SITE_SHARDS > 1
+               and await _has_column(conn, table, "site_id"))
+
+    created = 0
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_LOCK_KEY)
+        existing = set(await _existing_partitions(conn, table))
+        for lower, upper in bounds:
+            name = partition_name(table, lower)
+            if name in existing:
+                continue
+            await conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{lower.isoformat()}') TO ('{upper.isoformat()}')"
+                + (" PARTITION BY HASH (site_id)" if sharded else "")
+            )
+            if sharded:
+                for shard in range(SITE_SHARDS):
+                    await conn.execute(
+                        f"CREATE TABLE IF NOT EXISTS {name}_s{shard} PARTITION OF {name} "
+                        f"FOR VALUES WITH (MODULUS {SITE_SHARDS}, REMAINDER {shard})"
+                    )
+            created += 1
+    return created
+
+async def drop_expired_partitions(table: str, retention_days: int, conn,
+                                  now: Optional[datetime] = None,
+                                  not_after: Optional[datetime] = None) -> List[str]:
+    """Drop partitions whose whole range is older than the retention window.
+
+    `not_after` additionally keeps any partition reaching past that time
+    (e.g. data not yet rolled into a downsampled tier).
+    """
+    interval, _ = PARTITIONED_TABLES[table]
+    cutoff = (now or datetime.now(timezone.utc)) - timedelta(days=retention_days)
+    if not_after is not None:
+        cutoff = min(cutoff, not_after)
+    prefix = f"{table}_p"
+    dropped = []
+
+    async with conn.transaction():
+        await conn.execute("SELECT pg_advisory_xact_lock($1)", PARTITION_LOCK_KEY)
+        for name in await _existing_partitions(conn, table):
+            if not name.startswith(prefix):
+                continue
+            try:
+                lower = datetime.strptime(name[len(prefix):], "%Y%m%d").replace(tzinfo=timezone.utc)
+            except ValueError:
+                continue
+            if _next(lower, interval) <= cutoff:
+                await conn.execute(f"DROP TABLE IF EXISTS {name}")
+                dropped.append(name)
+    return dropped
+
+async def ensure_current_partitions():
+    """Boot-time guarantee that the current and next partition of every table exist
+
+    One catalog query, no lock and no DDL when they already do (the usual
+    case); retention and premaking further ahead are left to the scheduled
+    `maintain_partitions` job.
+    """
+    now = datetime.now(timezone.utc)
+    tables, names = [], []
+    for table, (interval, _) in PARTITIONED_TABLES.items():
+        current = _floor(now, interval)
+        for lower in (current, _next(current, interval)):
+            tables.append(table)
+            names.append(partition_name(table, lower))
+
+    async with acquire() as conn:
+        rows = await conn.fetch(
+            """SELECT t.name, c.relkind, to_regclass('public.' || t.part) IS NULL AS missing
+               FROM unnest($1::text[], $2::text[]) AS t(name, part)
+               JOIN pg_class c ON c.relname = t.name AND c.relnamespace = 'public'::regnamespace""",
+            tables, names
+        )
+        missing = set()
+        for row in rows:
+            if row["relkind"] == "r":
+                _note_unpartitioned(row["name"])
+            elif row["relkind"] == "p" and row["missing"]:
+                missing.add(row["name"])
+        for table in missing:
+            interval, _ = PARTITIONED_TABLES[table]
+            created = await ensure_partitions(table, now, _next(_floor(now, interval), interval), conn=conn)
+            if created:
+                print(f"✓ Created {created} partition(s) for {table}")
+
+async def maintain_partitions():
+    """Create upcoming partitions and apply retention for every partitioned table"""
+    from .downsample import SOURCES
+
+    now = datetime.now(timezone.utc)
+    ahead = now + timedelta(days=PARTITION_PREMAKE_DAYS)
+
+    async with acquire() as conn:
+        for table, (interval, retention) in PARTITIONED_TABLES.items():
+            if not await _is_partitioned(conn, table):
+                continue
+            created = await ensure_partitions(table, now, ahead, conn=conn)
+            if created:
+                print(f"✓ Created {created} partition(s) for {table}")
+            if retention:
+                not_after = None
+                if table in SOURCES:
+                    # Never drop raw minutes that have not been compacted yet
+                    not_after = await conn.fetchval(
+                        "SELECT watermark FROM compaction_state WHERE source = $1 AND tier = '15m'",
+                        table
+                    )
+                    if not_after is None:
+                        continue
+                dropped = await drop_expired_partitions(table, int(retention), conn, now, not_after)
+                if dropped:
+                    print(f"✓ Dropped {len(dropped)} expired partition(s) from {table}")
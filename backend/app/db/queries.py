@@ -0,0 +1,180 @@
+"""Named, prepared SQL statements shared by the routers
+
+Routers call `fetch("salt.history", start, end)` instead of hand-writing
+SQL. Statements run through the connection's own fetch/execute methods,
+so asyncpg prepares each one once per connection and reuses it from its
+statement cache (sized by PG_STATEMENT_CACHE_SIZE); every execution is
+timed per statement name.
+Pass `conn=` to run several statements on one connection.
+"""
+import time
+from contextlib import asynccontextmanager
+from typing import Any, List, Optional
+import asyncpg
+from .connection import acquire
+from .. import metrics
+from ..timing import phase
+
+QUERIES = {
+    "forecast.solar_range": """SELECT time, value_kw, p5, p50, p95
+                               FROM forecast_solar
+                               WHERE time >= $1 AND time <= $2
+                               ORDER BY time""",
+    "forecast.green_windows": """SELECT id, start_time, end_time, carbon_gco2_kwh,
+                                 EXTRACT(EPOCH FROM (end_time - start_time)) / 3600.0 as duration_hours
+                                 FROM forecast_green_windows
+                                 WHERE start_time >= $1 AND end_time <= $2
+                                 ORDER BY carbon_gco2_kwh ASC""",
+    "salt.latest": """SELECT time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw
+                      FROM salt_state
+                      WHERE site_id = $1 AND time <= $2
+                      ORDER BY time DESC
+                      LIMIT 1""",
+    "salt.history": """SELECT time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw
+                       FROM salt_state
+                       WHERE site_id = $1 AND time >= $2 AND time <= $3
+                       ORDER BY time""",
+    "salt.latest_many": """SELECT s.site_id, t.time, t.soc_mwh, t.temp_hot_c, t.temp_cold_c, t.heat_loss_kw
+                           FROM sites s
+                           CROSS JOIN LATERAL (
+                               SELECT time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw
+                               FROM salt_state x
+                               WHERE x.site_id = s.site_id AND x.time <= $2
+                               ORDER BY x.time DESC
+                               LIMIT 1
+                           ) t
+                           WHERE s.site_id = ANY($1::text[])""",
+    # Plan entry in effect at $2 for each site
+    "dispatch.current_many": """SELECT s.site_id, t.time, t.charge_kw, t.discharge_kw, t.feasible
+                                FROM sites s
+                                CROSS JOIN LATERAL (
+                                    SELECT time, charge_kw, discharge_kw, feasible
+                                    FROM dispatch_plan d
+                                    WHERE d.site_id = s.site_id AND d.time <= $2
+                                    ORDER BY d.time DESC
+                                    LIMIT 1
+                                ) t
+                                WHERE s.site_id = ANY($1::text[])""",
+    "dispatch.plan": """SELECT time, charge_kw, discharge_kw, feasible
+                        FROM dispatch_plan
+                        WHERE site_id = $1 AND time >= $2 AND time < $3
+                        ORDER BY time""",
+    "algae.history": """SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+                        FROM algae_telemetry
+                        WHERE site_id = $1 AND reactor_id = $2 AND time >= $3 AND time <= $4
+                        ORDER BY time""",
+    "algae.latest": """SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+                       FROM algae_telemetry
+                       WHERE site_id = $1 AND reactor_id = $2 AND time <= $3
+                       ORDER BY time DESC
+                       LIMIT 1""",
+    # Readings of every reactor that arrived in ($1, $2] (BRIN range on time)
+    "algae.tail": """SELECT site_id, reactor_id, time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+                     FROM algae_telemetry
+                     WHERE time > $1 AND time <= $2
+                     ORDER BY time""",
+    # One primary-key probe per reactor, so cost grows linearly with the reactor count
+    "algae.latest_many": """SELECT r.site_id, r.reactor_id, t.time, t.ph, t.do_mg_l, t.temp_c,
+                                   t.co2_uptake_kg_h, t.biomass_g_l
+                            FROM reactors r
+                            CROSS JOIN LATERAL (
+                                SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+                                FROM algae_telemetry a
+                                WHERE a.site_id = r.site_id AND a.reactor_id = r.reactor_id AND a.time <= $2
+                                ORDER BY a.time DESC
+                                LIMIT 1
+                            ) t
+                            WHERE r.reactor_id = ANY($1::text[])""",
+    "algae.site_latest": """SELECT r.site_id, r.reactor_id, t.time, t.ph, t.do_mg_l, t.temp_c,
+                                   t.co2_uptake_kg_h, t.biomass_g_l
+                            FROM reactors r
+                            CROSS JOIN LATERAL (
+                                SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+                                FROM algae_telemetry a
+                                WHERE a.site_id = r.site_id AND a.reactor_id = r.reactor_id AND a.time <= $2
+                                ORDER BY a.time DESC
+                                LIMIT 1
+                            ) t
+                            WHERE r.site_id = $1
+                            ORDER BY r.reactor_id""",
+    "sites.list": """SELECT s.site_id, s.name, s.capacity_mwh, COUNT(r.reactor_id) AS reactors
+                     FROM sites s
+                     LEFT JOIN reactors r ON r.site_id = s.site_id
+                     GROUP BY s.site_id
+                     ORDER BY s.site_id""",
+    "sites.add": """INSERT INTO sites (site_id, name, capacity_mwh) VALUES ($1, $2, $3)
+                    ON CONFLICT (site_id) DO UPDATE SET name = EXCLUDED.name, capacity_mwh = EXCLUDED.capacity_mwh""",
+    "reactors.list": """SELECT reactor_id, site_id, name FROM reactors ORDER BY site_id, reactor_id""",
+    "reactors.add": """INSERT INTO reactors (reactor_id, site_id, name) VALUES ($1, $2, $3)
+                       ON CONFLICT (reactor_id) DO UPDATE SET site_id = EXCLUDED.site_id, name = EXCLUDED.name""",
+    "carbon.daily": """SELECT day, total_co2_in_kg, total_co2_fixed_kg, total_co2_net_kg, records
+                       FROM mv_daily_ledger
+                       ORDER BY day DESC""",
+    "alarms.history": """SELECT time, site_id, reactor_id, alarm, state, severity, metric, value, detail
+                         FROM alarm_events
+                         WHERE reactor_id = $1 AND time >= $2
+                         ORDER BY time DESC
+                         LIMIT $3""",
+    "alarms.site_history": """SELECT time, site_id, reactor_id, alarm, state, severity, metric, value, detail
+                              FROM alarm_events
+                              WHERE site_id = $1 AND time >= $2
+                              ORDER BY time DESC
+                              LIMIT $3""",
+    "alarms.holds": """SELECT reactor_id, alarm, since, until
+                       FROM alarm_holds
+                       WHERE until > $1""",
+    "alarms.hold": """INSERT INTO alarm_holds (reactor_id, alarm, since, until)
+                      SELECT $1, unnest($2::text[]), $3, $4
+                      ON CONFLICT (reactor_id, alarm) DO UPDATE SET
+                          since = CASE WHEN alarm_holds.until < EXCLUDED.since
+                                       THEN EXCLUDED.since ELSE alarm_holds.since END,
+                          until = GREATEST(alarm_holds.until, EXCLUDED.until)""",
+    "health.ping": "SELECT 1",
+}
+
+query_seconds = metrics.histogram(
+    "db_query_seconds", "Statement execution time by statement name", labelnames=("query",)
+)
+query_errors = metrics.counter(
+    "db_query_errors_total", "Failed statement executions by statement name", labelnames=("query",)
+)
+
+def register(name: str, sql: str):
+    """Add a named statement defined outside this module"""
+    if QUERIES.get(name, sql) != sql:
+        raise ValueError(f"Query already registered with different SQL: {name}")
+    QUERIES[name] = sql
+
+@asynccontextmanager
+async def _connection(conn: Optional[asyncpg.Connection]):
+    if conn is not None:
+        yield conn
+    else:
+        async with acquire() as acquired:
+            yield acquired
+
+async def _run(method: str, name: str, args: tuple, conn: Optional[asyncpg.Connection]) -> Any:
+    sql = QUERIES[name]
+    async with _connection(conn) as c:
+        started = time.perf_counter()
+        try:
+            with phase("db"):
+                return await getattr(c, method)(sql, *args)
+        except Exception:
+            query_errors.inc(query=name)
+            raise
+        finally:
+            query_seconds.observe(time.perf_counter() - started, query=name)
+
+async def fetch(name: str, *args, conn: Optional[asyncpg.Connection] = None) -> List[asyncpg.Record]:
+    return await _run("fetch", name, args, conn)
+
+async def fetchrow(name: str, *args, conn: Optional[asyncpg.Connection] = None) -> Optional[asyncpg.Record]:
+    return await _run("fetchrow", name, args, conn)
+
+async def fetchval(name: str, *args, conn: Optional[asyncpg.Connection] = None) -> Any:
+    return await _run("fetchval", name, args, conn)
+
+async def execute(name: str, *args, conn: Optional[asyncpg.Connection] = None) -> Any:
+    """Run a statement for its side effects; returns the status (e.g. "DELETE 42")"""
+    return await _run("execute", name, args, conn)
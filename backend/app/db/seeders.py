@@ -1,3 +1,4 @@
+import asyncio
 import asyncpg
 from datetime import datetime, timedelta, timezone
 import numpy as np
@@ -159,85 +160,118 @@ def generate_algae_telemetry(start: datetime, days_history: int, hours_future: i
 
     return data
 
-def generate_carbon_ledger(start: datetime, days_history: int) -> List[Tuple]:
-    """Generate carbon ledger from simulated uptake"""
-    total_hours = days_history * 24
-    times = [start + timedelta(hours=i) for i in range(-days_history * 24, 0)]
-
-    data = []
-    for t in times:
-        hour = t.hour
-        is_day = 6 <= hour < 18
-
-        # CO2 in (supplied to reactor)
-        co2_in_kg = 1.0 if is_day else 0.3
-
-        # CO2 fixed (captured by algae)
-        co2_fixed_kg = 0.8 if is_day else 0.1
-
-        # Net = fixed - respiration
-        co2_net_kg = co2_fixed_kg - (0.2 if not is_day else 0.05)
-
-        data.append((t, co2_in_kg, co2_fixed_kg, co2_net_kg))
-
-    return data
-
-async def seed_all_data(reset: bool = False, scenario: str = "clear"):
-    """Seed all tables with realistic data"""
+def seed_layout(sites: int, reactors_per_site: int) -> List[Tuple[str, List[str]]]:
+    """(site_id, [reactor_id, ...]) for the seeded fleet; the first pair is the default site/reactor"""
+    layout = []
+    n = 0
+    for s in range(sites):
+        reactor_ids = []
+        for _ in range(reactors_per_site):
+            n += 1
+            reactor_ids.append(f"pbr-{n:02d}")
+        layout.append((f"site-{s + 1}", reactor_ids))
+    return layout
+
+async def seed_all_data(reset: bool = False, scenario: str = "clear", days_history: int = 30,
+                        sites: int = 1, reactors_per_site: int = 1):
+    """Seed all tables with realistic data (`days_history` days of history + 72h ahead)
+    for `sites` storage sites with `reactors_per_site` bioreactors each
+
+    Rows are generated in a worker thread so the event loop keeps serving
+    requests; progress is reported when running as an admin task.
+    """
     from .connection import get_pool
     from .init_db import clear_database
+    from .partitions import PARTITIONED_TABLES, ensure_partitions
+    from ..ledger import backfill_ledger
+    from ..tasks import report, span
 
     pool = await get_pool()
+    layout = seed_layout(sites, reactors_per_site)
+    # Generation and inserts up to 80%, then the ledger backfill and view refresh
+    steps = 2 + sum(2 + len(reactor_ids) for _, reactor_ids in layout)
+    done = 0
+
+    def step(message: str):
+        nonlocal done
+        report(0.8 * done / steps, message)
+        print(f"{message}...")
+        done += 1
 
     if reset:
+        report(0.0, "Clearing existing data")
         await clear_database()
 
     now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
 
-    print(f"Seeding forecast_solar (scenario={scenario})...")
-    solar_data = generate_solar_forecast(now, days_history=30, hours_future=72, scenario=scenario)
+    # Seeded history reaches further back than the partitions kept ahead of time
+    for table in PARTITIONED_TABLES:
+        await ensure_partitions(table, now - timedelta(days=days_history), now + timedelta(hours=72))
+
+    step(f"Seeding forecast_solar (scenario={scenario})")
+    solar_data = await asyncio.to_thread(
+        generate_solar_forecast, now, days_history=days_history, hours_future=72, scenario=scenario
+    )
     await pool.executemany(
         "INSERT INTO forecast_solar (time, value_kw, p5, p50, p95) VALUES ($1, $2, $3, $4, $5) ON CONFLICT (time) DO NOTHING",
         solar_data
     )
 
-    print("Seeding forecast_green_windows...")
-    windows_data = generate_green_windows(now - timedelta(days=30), days=30 + 3)
+    step("Seeding forecast_green_windows")
+    windows_data = await asyncio.to_thread(
+        generate_green_windows, now - timedelta(days=days_history), days=days_history + 3
+    )
     await pool.executemany(
         "INSERT INTO forecast_green_windows (start_time, end_time, carbon_gco2_kwh) VALUES ($1, $2, $3)",
         windows_data
     )
 
-    print(f"Seeding salt_state (scenario={scenario})...")
-    salt_data = generate_salt_state(now, days_history=30, hours_future=72, scenario=scenario)
-    await pool.executemany(
-        "INSERT INTO salt_state (time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw) VALUES ($1, $2, $3, $4, $5) ON CONFLICT (time) DO NOTHING",
-        salt_data
-    )
-
-    print("Seeding dispatch_plan...")
-    dispatch_data = generate_dispatch_plan(now, hours=24)
-    await pool.executemany(
-        "INSERT INTO dispatch_plan (time, charge_kw, discharge_kw, feasible) VALUES ($1, $2, $3, $4) ON CONFLICT (time) DO NOTHING",
-        dispatch_data
-    )
-
-    print(f"Seeding algae_telemetry (scenario={scenario})...")
-    algae_data = generate_algae_telemetry(now, days_history=30, hours_future=72, scenario=scenario)
-    await pool.executemany(
-        "INSERT INTO algae_telemetry (time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l) VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (time) DO NOTHING",
-        algae_data
-    )
-
-    print("Seeding carbon_ledger...")
-    carbon_data = generate_carbon_ledger(now, days_history=30)
-    await pool.executemany(
-        "INSERT INTO carbon_ledger (time, co2_in_kg, co2_fixed_kg, co2_net_kg) VALUES ($1, $2, $3, $4) ON CONFLICT (time) DO NOTHING",
-        carbon_data
-    )
+    for site_id, reactor_ids in layout:
+        await pool.execute(
+            "INSERT INTO sites (site_id, name) VALUES ($1, $2) ON CONFLICT DO NOTHING",
+            site_id, f"Site {site_id.split('-')[-1]}"
+        )
+        await pool.executemany(
+            "INSERT INTO reactors (reactor_id, site_id, name) VALUES ($1, $2, $3) "
+            "ON CONFLICT (reactor_id) DO UPDATE SET site_id = EXCLUDED.site_id",
+            [(r, site_id, f"Photobioreactor {int(r.split('-')[-1])}") for r in reactor_ids]
+        )
+
+    for site_id, reactor_ids in layout:
+        step(f"Seeding salt_state for {site_id} (scenario={scenario})")
+        salt_data = await asyncio.to_thread(
+            generate_salt_state, now, days_history=days_history, hours_future=72, scenario=scenario
+        )
+        await pool.executemany(
+            "INSERT INTO salt_state (site_id, time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw) VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (site_id, time) DO NOTHING",
+            [(site_id,) + row for row in salt_data]
+        )
+
+        step(f"Seeding dispatch_plan for {site_id}")
+        dispatch_data = generate_dispatch_plan(now, hours=24)
+        await pool.executemany(
+            "INSERT INTO dispatch_plan (site_id, time, charge_kw, discharge_kw, feasible) VALUES ($1, $2, $3, $4, $5) ON CONFLICT (site_id, time) DO NOTHING",
+            [(site_id,) + row for row in dispatch_data]
+        )
+
+        for reactor_id in reactor_ids:
+            step(f"Seeding algae_telemetry for {site_id}/{reactor_id} (scenario={scenario})")
+            algae_data = await asyncio.to_thread(
+                generate_algae_telemetry, now, days_history=days_history, hours_future=72, scenario=scenario
+            )
+            await pool.executemany(
+                "INSERT INTO algae_telemetry (site_id, reactor_id, time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l) VALUES ($1, $2, $3, $4, $5, $6, $7, $8) ON CONFLICT (site_id, reactor_id, time) DO NOTHING",
+                [(site_id, reactor_id) + row for row in algae_data]
+            )
+
+    print("Seeding carbon_ledger from algae telemetry...")
+    report(0.8, "Seeding carbon_ledger from algae telemetry")
+    with span(0.8, 0.95):
+        await backfill_ledger(now - timedelta(days=days_history), now)
 
     # Refresh materialized views
     print("Refreshing materialized views...")
+    report(0.95, "Refreshing materialized views")
     async with pool.acquire() as conn:
         await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_hourly_rollups")
         await conn.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY mv_daily_ledger")
@@ -0,0 +1,352 @@
+"""Carbon ledger computation from algae telemetry
+
+Hourly `carbon_ledger` rows are derived from the minute-level
+`co2_uptake_kg_h` readings in `algae_telemetry` using trapezoidal
+integration over NumPy arrays. Each reactor's series is integrated on its
+own and the hourly results are summed into one fleet-wide ledger:
+
+- co2_fixed_kg: integral of positive uptake (photosynthetic fixation)
+- co2_net_kg:   co2_fixed_kg minus the integral of negative uptake (respiration)
+- co2_in_kg:    CO2 sparged into the reactor, co2_fixed_kg / SPARGE_EFFICIENCY
+
+Running totals are kept in `carbon_ledger_cumsum` and mirrored in memory by
+`LedgerPrefixIndex`, so any range total is a difference of two prefix sums.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+import numpy as np
+from .db.connection import get_pool
+from .tasks import report
+
+HOUR_S = 3600.0
+
+# Fraction of sparged CO2 that ends up fixed by the culture
+SPARGE_EFFICIENCY = 0.8
+
+# Intervals longer than this are treated as telemetry outages and not integrated
+MAX_GAP_S = 600.0
+
+# Hours of telemetry loaded per backfill chunk (bounds memory at any history length)
+BACKFILL_CHUNK_HOURS = 24 * 7
+
+UPSERT_SQL = """INSERT INTO carbon_ledger (time, co2_in_kg, co2_fixed_kg, co2_net_kg)
+                VALUES ($1, $2, $3, $4)
+                ON CONFLICT (time) DO UPDATE SET
+                    co2_in_kg = EXCLUDED.co2_in_kg,
+                    co2_fixed_kg = EXCLUDED.co2_fixed_kg,
+                    co2_net_kg = EXCLUDED.co2_net_kg"""
+
+# Recompute running totals for every ledger hour >= $1, continuing from the
+# last running total before $1
+CUMSUM_SQL = """WITH base AS (
+                    SELECT cum_co2_in_kg, cum_co2_fixed_kg, cum_co2_net_kg
+                    FROM carbon_ledger_cumsum
+                    WHERE time < $1
+                    ORDER BY time DESC
+                    LIMIT 1
+                )
+                INSERT INTO carbon_ledger_cumsum (time, cum_co2_in_kg, cum_co2_fixed_kg, cum_co2_net_kg)
+                SELECT l.time,
+                       COALESCE((SELECT cum_co2_in_kg FROM base), 0) + SUM(l.co2_in_kg::float8) OVER w,
+                       COALESCE((SELECT cum_co2_fixed_kg FROM base), 0) + SUM(l.co2_fixed_kg::float8) OVER w,
+                       COALESCE((SELECT cum_co2_net_kg FROM base), 0) + SUM(l.co2_net_kg::float8) OVER w
+                FROM carbon_ledger l
+                WHERE l.time >= $1
+                WINDOW w AS (ORDER BY l.time)
+                ON CONFLICT (time) DO UPDATE SET
+                    cum_co2_in_kg = EXCLUDED.cum_co2_in_kg,
+                    cum_co2_fixed_kg = EXCLUDED.cum_co2_fixed_kg,
+                    cum_co2_net_kg = EXCLUDED.cum_co2_net_kg"""
+
+# Seconds between checks of carbon_ledger_cumsum for rows appended by other workers
+PREFIX_SYNC_INTERVAL_S = 30.0
+
+TELEMETRY_SQL = """SELECT reactor_id, EXTRACT(EPOCH FROM time)::float8 AS ts, co2_uptake_kg_h
+                   FROM algae_telemetry
+                   WHERE time >= $1 AND time <= $2
+                   ORDER BY reactor_id, time"""
+
+def integrate_hourly(ts: np.ndarray, uptake_kg_h: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Integrate uptake samples into hourly buckets.
+
+    `ts` are epoch seconds in ascending order and `uptake_kg_h` the matching
+    uptake rates. Each interval between consecutive samples is attributed to
+    the hour containing its left edge. Returns (hour_start_ts, co2_in_kg,
+    co2_fixed_kg, co2_net_kg) arrays, one element per hour with data.
+    """
+    empty = np.empty(0)
+    if len(ts) < 2:
+        return empty, empty, empty, empty
+
+    dt_h = np.diff(ts) / HOUR_S
+    valid = (dt_h > 0) & (dt_h * HOUR_S <= MAX_GAP_S)
+
+    fixing = np.clip(uptake_kg_h, 0.0, None)
+    respiring = np.clip(-uptake_kg_h, 0.0, None)
+    fixed = (fixing[:-1] + fixing[1:]) * 0.5 * dt_h
+    respired = (respiring[:-1] + respiring[1:]) * 0.5 * dt_h
+
+    hours = np.floor(ts[:-1] / HOUR_S)[valid]
+    if len(hours) == 0:
+        return empty, empty, empty, empty
+
+    buckets, inverse = np.unique(hours, return_inverse=True)
+    fixed_h = np.bincount(inverse, weights=fixed[valid], minlength=len(buckets))
+    respired_h = np.bincount(inverse, weights=respired[valid], minlength=len(buckets))
+
+    return buckets * HOUR_S, fixed_h / SPARGE_EFFICIENCY, fixed_h, fixed_h - respired_h
+
+def integrate_fleet(ts: np.ndarray, uptake_kg_h: np.ndarray,
+                    group_starts: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """integrate_hourly() per reactor, summed per hour.
+
+    Samples are grouped by reactor (contiguous, each group ascending in
+    time) and `group_starts` holds the index of each group's first sample.
+    """
+    bounds = list(group_starts) + [len(ts)]
+    parts = [integrate_hourly(ts[a:b], uptake_kg_h[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+    parts = [p for p in parts if len(p[0])]
+    if not parts:
+        empty = np.empty(0)
+        return empty, empty, empty, empty
+    if len(parts) == 1:
+        return parts[0]
+
+    hours = np.concatenate([p[0] for p in parts])
+    buckets, inverse = np.unique(hours, return_inverse=True)
+    totals = [
+        np.bincount(inverse, weights=np.concatenate([p[k] for p in parts]), minlength=len(buckets))
+        for k in (1, 2, 3)
+    ]
+    return buckets, totals[0], totals[1], totals[2]
+
+def _floor_hour(t: datetime) -> datetime:
+    return t.replace(minute=0, second=0, microsecond=0)
+
+async def _compute_range(conn, start: datetime, end: datetime,
+                         until: Optional[datetime] = None) -> List[Tuple]:
+    """Compute ledger rows for whole hours in [start, end) from samples up to `until`"""
+    if until is None:
+        # One extra sample past `end` closes the last interval of the final hour
+        until = end + timedelta(seconds=MAX_GAP_S)
+    rows = await conn.fetch(TELEMETRY_SQL, start, until)
+    if not rows:
+        return []
+
+    ts = np.fromiter((r["ts"] for r in rows), dtype=np.float64, count=len(rows))
+    uptake = np.fromiter((r["co2_uptake_kg_h"] for r in rows), dtype=np.float64, count=len(rows))
+    group_starts = np.array(
+        [0] + [i for i in range(1, len(rows)) if rows[i]["reactor_id"] != rows[i - 1]["reactor_id"]],
+        dtype=np.int64
+    )
+    hours, co2_in, co2_fixed, co2_net = integrate_fleet(ts, uptake, group_starts)
+
+    start_ts, end_ts = start.timestamp(), end.timestamp()
+    keep = (hours >= start_ts) & (hours < end_ts)
+
+    return [
+        (datetime.fromtimestamp(h, tz=timezone.utc), float(i), float(f), float(n))
+        for h, i, f, n in zip(hours[keep], co2_in[keep], co2_fixed[keep], co2_net[keep])
+    ]
+
+async def backfill_ledger(start: Optional[datetime] = None, end: Optional[datetime] = None,
+                          chunk_hours: int = BACKFILL_CHUNK_HOURS) -> int:
+    """Recompute carbon_ledger for [start, end) in bounded-memory chunks.
+
+    Defaults to the full telemetry history up to the current hour.
+    Returns the number of hourly rows written.
+    """
+    pool = await get_pool()
+
+    async with pool.acquire() as conn:
+        if start is None:
+            start = await conn.fetchval("SELECT MIN(time) FROM algae_telemetry")
+            if start is None:
+                return 0
+        if end is None:
+            end = datetime.now(timezone.utc)
+
+        start, end = _floor_hour(start), _floor_hour(end)
+        step = timedelta(hours=chunk_hours)
+        written = 0
+
+        chunk_start = start
+        while chunk_start < end:
+            chunk_end = min(chunk_start + step, end)
+            ledger_rows = await _compute_range(conn, chunk_start, chunk_end)
+            if ledger_rows:
+                await conn.executemany(UPSERT_SQL, ledger_rows)
+                written += len(ledger_rows)
+            chunk_start = chunk_end
+            report((chunk_start - start) / (end - start), f"Backfilled carbon_ledger through {chunk_start.isoformat()}")
+
+        await conn.execute(CUMSUM_SQL, start)
+
+    # History may have been rewritten, so rebuild the in-memory index lazily
+    _prefix_index.reset()
+    print(f"✓ Carbon ledger backfilled ({written} hours)")
+    return written
+
+async def update_latest_ledger() -> int:
+    """Recompute only the hours touched by newly arrived telemetry.
+
+    Starts from the newest ledger hour (which may have been written while
+    still partial) and runs through the hour of the latest telemetry sample
+    that is not in the future.
+    """
+    pool = await get_pool()
+    now = datetime.now(timezone.utc)
+
+    async with pool.acquire() as conn:
+        latest = await conn.fetchval(
+            "SELECT time FROM algae_telemetry WHERE time <= $1 ORDER BY time DESC LIMIT 1",
+            now
+        )
+        if latest is None:
+            return 0
+
+        last_hour = await conn.fetchval("SELECT MAX(time) FROM carbon_ledger")
+        start = last_hour if last_hour is not None else _floor_hour(latest)
+        end = _floor_hour(latest) + timedelta(hours=1)
+
+        # Never integrate samples beyond the latest observed reading
+        ledger_rows = await _compute_range(conn, start, end, until=latest)
+        if ledger_rows:
+            await conn.executemany(UPSERT_SQL, ledger_rows)
+            await conn.execute(CUMSUM_SQL, start)
+            await _prefix_index.sync(conn, force=True)
+
+    return len(ledger_rows)
+
+def _totals(row) -> Tuple[float, float, float]:
+    return (float(row["cum_co2_in_kg"]), float(row["cum_co2_fixed_kg"]), float(row["cum_co2_net_kg"]))
+
+class LedgerPrefixIndex:
+    """In-memory prefix sums over hourly carbon_ledger rows.
+
+    Rows are stored densely by hour offset from the first ledger hour, so
+    `prefix[k]` holds the (in, fixed, net) totals of all hours before
+    offset k and any range total is `prefix[j] - prefix[i]`. Gaps in the
+    ledger carry the previous running total forward.
+    """
+
+    def __init__(self):
+        self._lock = asyncio.Lock()
+        self.reset()
+
+    def reset(self):
+        self.origin: Optional[float] = None  # epoch seconds of prefix[0]
+        self.prefix = np.zeros((1, 3))
+        self.last_hour: Optional[float] = None
+        # (epoch seconds, totals) of the newest row before last_hour; later syncs
+        # only rewrite from last_hour on, so a changed anchor means a full rewrite
+        self.anchor: Optional[Tuple[float, Tuple[float, float, float]]] = None
+        self._synced_at = 0.0
+
+    @property
+    def hours(self) -> int:
+        return len(self.prefix) - 1
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self._synced_at >= PREFIX_SYNC_INTERVAL_S
+
+    async def sync(self, conn, force: bool = False):
+        """Pull rows appended since the last sync (at most every PREFIX_SYNC_INTERVAL_S)"""
+        if not force and not self.stale:
+            return
+
+        async with self._lock:
+            rows = None
+            if self.anchor is not None:
+                # The newest hour may have been rewritten while still partial;
+                # re-read from the anchor row before it to detect full rewrites
+                rows = await conn.fetch(
+                    """SELECT EXTRACT(EPOCH FROM time)::float8 AS ts,
+                              cum_co2_in_kg, cum_co2_fixed_kg, cum_co2_net_kg
+                       FROM carbon_ledger_cumsum WHERE time >= to_timestamp($1) ORDER BY time""",
+                    self.anchor[0]
+                )
+                if not rows or (rows[0]["ts"], _totals(rows[0])) != self.anchor:
+                    # History was truncated or rewritten underneath us (e.g. a
+                    # reseed or backfill on another worker)
+                    rows = None
+
+            if rows is None:
+                rows = await conn.fetch(
+                    """SELECT EXTRACT(EPOCH FROM time)::float8 AS ts,
+                              cum_co2_in_kg, cum_co2_fixed_kg, cum_co2_net_kg
+                       FROM carbon_ledger_cumsum ORDER BY time"""
+                )
+                self.reset()
+
+            if rows:
+                self._apply(rows)
+            self._synced_at = time.monotonic()
+
+    def _apply(self, rows):
+        """Write inclusive running totals into the dense prefix array"""
+        ts = np.fromiter((r["ts"] for r in rows), dtype=np.float64, count=len(rows))
+        cums = np.array([(r["cum_co2_in_kg"], r["cum_co2_fixed_kg"], r["cum_co2_net_kg"]) for r in rows])
+
+        if self.origin is None:
+            self.origin = ts[0]
+        offsets = np.rint((ts - self.origin) / HOUR_S).astype(np.int64)
+        first = int(offsets[0])
+        n = max(self.hours, int(offsets[-1]) + 1)
+
+        prefix = np.empty((n + 1, 3))
+        prefix[:first + 1] = self.prefix[:first + 1]
+
+        # prefix[k + 1] is the inclusive total through hour k; forward-fill gaps
+        filled = np.zeros(n + 1, dtype=bool)
+        filled[:first + 1] = True
+        filled[offsets + 1] = True
+        prefix[offsets + 1] = cums
+        source = np.maximum.accumulate(np.where(filled, np.arange(n + 1), 0))
+        self.prefix = prefix[source]
+        self.last_hour = float(ts[-1])
+        if len(rows) >= 2:
+            self.anchor = (float(ts[-2]), _totals(rows[-2]))
+
+    def _offset(self, t: datetime) -> int:
+        """Prefix position covering every ledger hour starting before `t`"""
+        k = int(np.ceil((t.timestamp() - self.origin) / HOUR_S))
+        return min(max(k, 0), self.hours)
+
+    def total(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[float, float, float]:
+        """(co2_in_kg, co2_fixed_kg, co2_net_kg) over ledger hours in [start, end)"""
+        if self.origin is None:
+            return 0.0, 0.0, 0.0
+        i = self._offset(start) if start else 0
+        j = self._offset(end) if end else self.hours
+        if j <= i:
+            return 0.0, 0.0, 0.0
+        diff = self.prefix[j] - self.prefix[i]
+        return float(diff[0]), float(diff[1]), float(diff[2])
+
+    def cumulative(self, start: Optional[datetime] = None, end: Optional[datetime] = None,
+                   step_hours: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Running net total sampled every `step_hours` over [start, end).
+
+        Returns (epoch seconds, cumulative net kg) where each value is the
+        total of all hours before the corresponding timestamp.
+        """
+        if self.origin is None:
+            return np.empty(0), np.empty(0)
+        i = self._offset(start) if start else 0
+        j = self._offset(end) if end else self.hours
+        positions = np.arange(i, j + 1, step_hours)
+        return self.origin + positions * HOUR_S, self.prefix[positions, 2]
+
+_prefix_index = LedgerPrefixIndex()
+
+async def get_prefix_index() -> LedgerPrefixIndex:
+    """Return the process-wide prefix index, synced with the database"""
+    if _prefix_index.stale:
+        pool = await get_pool()
+        async with pool.acquire() as conn:
+            await _prefix_index.sync(conn)
+    return _prefix_index
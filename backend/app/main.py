@@ -1,34 +1,61 @@
 import os
+import time
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 
 from app.db.connection import get_pool, close_pool
+from app.db import queries
 from app.db.init_db import init_database
+from app.db import migrate
+from app.db.partitions import ensure_current_partitions, unpartitioned
 from app.db.seeders import seed_all_data
-from app.routers import admin, forecast, salt, dispatch, algae, carbon, demo
+from app.routers import admin, forecast, salt, dispatch, algae, carbon, demo, sites, dashboard, live
 from app.background_tasks import start_background_tasks, stop_background_tasks
+from app.timing import ServerTimingMiddleware
+from app.streams import hub
+from app.channels import hub as channel_hub
+from app.tasks import queue as task_queue
+from app import metrics
+
+# Cold-start timing, reported by /healthz
+startup = {"startup_ms": None}
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     print("🚀 Starting CarbonFlux API...")
+    started = time.perf_counter()
     await get_pool()
     await init_database()
+    # Make sure the current partitions exist before anything inserts;
+    # premaking and retention run as the leader's maintain_partitions job
+    await ensure_current_partitions()
 
     # Auto-seed if SEED=1
     if os.getenv("SEED") == "1":
         print("🌱 Auto-seeding database...")
-        await seed_all_data(reset=False)
+        await seed_all_data(
+            reset=False,
+            sites=int(os.getenv("SEED_SITES", "1")),
+            reactors_per_site=int(os.getenv("SEED_REACTORS_PER_SITE", "1"))
+        )
 
     # Start background tasks
     await start_background_tasks()
 
+    startup["startup_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    print(f"✓ Ready in {startup['startup_ms']:.0f} ms")
+
     yield
 
     # Shutdown
     print("👋 Shutting down...")
+    await task_queue.stop()
     await stop_background_tasks()
+    await hub.stop()
+    await channel_hub.stop()
     await close_pool()
 
 app = FastAPI(
@@ -45,7 +72,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
+# Outermost, so timings cover CORS and every router
+app.add_middleware(ServerTimingMiddleware)
 
 # Routers
 app.include_router(admin.router)
@@ -55,6 +85,9 @@ app.include_router(dispatch.router)
 app.include_router(algae.router)
 app.include_router(carbon.router)
 app.include_router(demo.router)
+app.include_router(sites.router)
+app.include_router(dashboard.router)
+app.include_router(live.router)
 
 @app.get("/")
 async def root():
@@ -64,17 +97,24 @@ async def root():
         "status": "operational"
     }
 
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus scrape endpoint"""
+    return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 @app.get("/healthz")
 async def health_check():
     """Health check endpoint"""
     try:
-        pool = await get_pool()
-        async with pool.acquire() as conn:
-            await conn.fetchval("SELECT 1")
+        await queries.fetchval("health.ping")
         return {
             "status": "healthy",
             "db": "ok",
-            "version": "0.1.0"
+            "version": "0.1.0",
+            "schema_version": migrate.last_run["version"],
+            "migration_ms": migrate.last_run["duration_ms"],
+            "unpartitioned_tables": sorted(unpartitioned),
+            "startup_ms": startup["startup_ms"]
         }
     except Exception as e:
         return {
@@ -0,0 +1,165 @@
+"""Lightweight in-process metrics (histograms, counters, gauges)"""
+import bisect
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry: Dict[str, "Metric"] = {}
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+class Histogram(Metric):
+    """Cumulative-bucket histogram, one series per label combination"""
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self.series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        entry = self.series.get(key)
+        if entry is None:
+            entry = self.series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect.bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        """Approximate quantile (bucket upper bound) for one series"""
+        entry = self.series.get(self._key(labels))
+        if not entry or entry[2] == 0:
+            return None
+        target = q * entry[2]
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), entry[0]):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def snapshot(self) -> List[dict]:
+        out = []
+        for key, (counts, total, count) in self.series.items():
+            out.append({
+                "labels": dict(zip(self.labelnames, key)),
+                "count": count,
+                "sum": total,
+                "mean": total / count if count else None,
+                "p50": self.quantile(0.5, **dict(zip(self.labelnames, key))),
+                "p95": self.quantile(0.95, **dict(zip(self.labelnames, key))),
+                "p99": self.quantile(0.99, **dict(zip(self.labelnames, key))),
+            })
+        return out
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, help, labelnames)
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self.series[key] = self.series.get(key, 0.0) + amount
+
+    def snapshot(self) -> List[dict]:
+        return [{"labels": dict(zip(self.labelnames, k)), "value": v} for k, v in self.series.items()]
+
+class Gauge(Metric):
+    """Gauge that is either set explicitly or read from a callback at collection time"""
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 func: Optional[Callable[[], float]] = None):
+        super().__init__(name, help, labelnames)
+        self.func = func
+        self.series: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        self.series[self._key(labels)] = value
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        self.series[key] = self.series.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def collect(self) -> Dict[Tuple[str, ...], float]:
+        if self.func is not None:
+            return {(): float(self.func())}
+        return dict(self.series)
+
+    def snapshot(self) -> List[dict]:
+        return [{"labels": dict(zip(self.labelnames, k)), "value": v} for k, v in self.collect().items()]
+
+def _register(metric: Metric) -> Metric:
+    existing = _registry.get(metric.name)
+    if existing is not None:
+        return existing
+    _registry[metric.name] = metric
+    return metric
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return _register(Histogram(name, help, labelnames, buckets))
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return _register(Counter(name, help, labelnames))
+
+def gauge(name: str, help: str, labelnames: Sequence[str] = (),
+          func: Optional[Callable[[], float]] = None) -> Gauge:
+    return _register(Gauge(name, help, labelnames, func))
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+def render_prometheus() -> str:
+    """All registered metrics in the Prometheus text exposition format"""
+    lines = []
+    for name, m in _registry.items():
+        lines.append(f"# HELP {name} {m.help}")
+        lines.append(f"# TYPE {name} {m.kind}")
+        if isinstance(m, Histogram):
+            for key, (counts, total, count) in m.series.items():
+                running = 0
+                for bound, c in zip(m.buckets + (float("inf"),), counts):
+                    running += c
+                    le = f'le="{_number(bound)}"'
+                    lines.append(f"{name}_bucket{_labels(m.labelnames, key, le)} {running}")
+                lines.append(f"{name}_sum{_labels(m.labelnames, key)} {_number(total)}")
+                lines.append(f"{name}_count{_labels(m.labelnames, key)} {count}")
+        else:
+            series = m.collect() if isinstance(m, Gauge) else m.series
+            for key, value in series.items():
+                lines.append(f"{name}{_labels(m.labelnames, key)} {_number(value)}")
+    return "\n".join(lines) + "\n"
+
+def snapshot(prefix: str = "") -> Dict[str, List[dict]]:
+    """JSON-friendly view of all registered metrics (optionally filtered by name prefix)"""
+    return {name: m.snapshot() for name, m in _registry.items() if name.startswith(prefix)}
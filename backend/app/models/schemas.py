@@ -1,6 +1,6 @@
 from pydantic import BaseModel, Field
 from datetime import datetime
-from typing import List, Optional
+from typing import Dict, List, Optional
 
 # Solar Forecast
 class SolarForecastPoint(BaseModel):
@@ -40,6 +40,9 @@ class SaltStateResponse(BaseModel):
     history_24h: List[SaltStatePoint]
     capacity_mwh: float = 10.0
     soc_percent: float
+    resolution_s: int = 60
+    site_id: Optional[str] = None
+    cursor: Optional[datetime] = None
 
 # Salt Simulation
 class DispatchSchedulePoint(BaseModel):
@@ -70,6 +73,7 @@ class DispatchPlanResponse(BaseModel):
     total_charge_kwh: float
     total_discharge_kwh: float
     duration_hours: int
+    site_id: Optional[str] = None
 
 # Algae Telemetry
 class AlgaeTelemetryPoint(BaseModel):
@@ -84,6 +88,57 @@ class AlgaeTelemetryResponse(BaseModel):
     data: List[AlgaeTelemetryPoint]
     count: int
     time_range: str
+    resolution_s: int = 60
+    site_id: Optional[str] = None
+    reactor_id: Optional[str] = None
+    cursor: Optional[datetime] = None
+
+class ReactorTelemetryPoint(AlgaeTelemetryPoint):
+    site_id: str
+    reactor_id: str
+
+# Alarms
+class AlarmEvent(BaseModel):
+    time: datetime
+    site_id: str
+    reactor_id: str
+    alarm: str
+    state: str  # "raised" or "cleared"
+    severity: str
+    metric: str
+    value: float
+    detail: str = ""
+
+class AlarmsResponse(BaseModel):
+    alarms: List[AlarmEvent]
+    count: int
+    held: Dict[str, List[str]] = {}
+
+# Sites and reactors
+class SiteCreate(BaseModel):
+    site_id: str = Field(pattern=r"^[\w-]{1,64}$")
+    name: str
+    capacity_mwh: float = Field(10.0, gt=0)
+
+class ReactorCreate(BaseModel):
+    reactor_id: str = Field(pattern=r"^[\w-]{1,64}$")
+    name: str
+
+class SiteSummary(BaseModel):
+    site_id: str
+    reactors_reporting: int
+    co2_uptake_kg_h: float
+    avg_ph: Optional[float]
+    avg_biomass_g_l: Optional[float]
+    last_reading: Optional[datetime]
+    soc_mwh: Optional[float]
+
+class FleetSummaryResponse(BaseModel):
+    generated_at: datetime
+    sites: List[SiteSummary]
+    reactors_reporting: int
+    co2_uptake_kg_h: float
+    soc_mwh: float
 
 # Carbon Ledger
 class CarbonLedgerPoint(BaseModel):
@@ -103,3 +158,19 @@ class CarbonLedgerResponse(BaseModel):
     daily: List[CarbonLedgerDailyPoint]
     cumulative_net_kg: float
     total_days: int
+
+class CarbonRangeTotalResponse(BaseModel):
+    start: Optional[datetime]
+    end: Optional[datetime]
+    co2_in_kg: float
+    co2_fixed_kg: float
+    co2_net_kg: float
+
+class CarbonCumulativePoint(BaseModel):
+    time: datetime
+    cumulative_net_kg: float
+
+class CarbonCumulativeResponse(BaseModel):
+    series: List[CarbonCumulativePoint]
+    step_hours: int
+    count: int
@@ -0,0 +1,128 @@
+"""Column-backed time series for history endpoints
+
+History responses used to hold one Pydantic point per row (a 30-day minute
+series is ~43k validated objects). A Series keeps one int64 epoch-µs time
+array and one float64 array per value column, is built straight from asyncpg
+records, and renders its JSON in a handful of C-level format calls.
+
+`records` layout reproduces the Pydantic JSON exactly (list of objects with
+ISO-8601 `...Z` times); `columns` layout emits `{"time": [epoch ms], col: [...]}`
+for chart clients.
+
+Raw-resolution responses carry a `cursor` (time of the newest point). Passing
+it back as `since=` returns only the points appended after it.
+"""
+import json
+from datetime import datetime, timezone
+from typing import Dict, Optional, Sequence
+import numpy as np
+from fastapi.responses import Response
+from pydantic import BaseModel
+
+LAYOUTS = ("records", "columns")
+
+class Series:
+    __slots__ = ("times_us", "columns")
+
+    def __init__(self, times_us: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.times_us = times_us
+        self.columns = columns
+
+    @classmethod
+    def from_records(cls, rows: Sequence, columns: Sequence[str], time_field: str = "time") -> "Series":
+        """Transpose asyncpg records into columns (fields looked up by name)"""
+        if not rows:
+            return cls(np.empty(0, dtype=np.int64), {c: np.empty(0) for c in columns})
+
+        keys = list(rows[0].keys())
+        transposed = list(zip(*rows))
+        times = transposed[keys.index(time_field)]
+        times_us = np.round(np.fromiter((t.timestamp() for t in times), np.float64, len(times)) * 1e6)
+        return cls(
+            times_us.astype(np.int64),
+            {c: np.asarray(transposed[keys.index(c)], dtype=np.float64) for c in columns}
+        )
+
+    @classmethod
+    def from_epoch_seconds(cls, times_s: np.ndarray, columns: Dict[str, np.ndarray]) -> "Series":
+        return cls(np.round(np.asarray(times_s, dtype=np.float64) * 1e6).astype(np.int64), columns)
+
+    def __len__(self) -> int:
+        return len(self.times_us)
+
+    def iso_times(self) -> list:
+        """ISO-8601 UTC strings formatted the way Pydantic serializes datetimes"""
+        stamps = self.times_us.astype("datetime64[us]")
+        whole_seconds = not (self.times_us % 1_000_000).any()
+        strings = np.datetime_as_string(stamps, unit="s" if whole_seconds else "us")
+        return [s + "Z" for s in strings.tolist()]
+
+    def _cells(self, name: str) -> list:
+        values = self.columns[name]
+        cells = values.tolist()
+        if np.isnan(values).any():
+            return [None if v != v else v for v in cells]
+        return cells
+
+    def records_json(self) -> str:
+        """`[{"time": ..., col: ...}, ...]` matching the per-point Pydantic models"""
+        if not len(self):
+            return "[]"
+        names = list(self.columns)
+        cells = [self.iso_times()] + [self._cells(n) for n in names]
+        nullable = [any(v is None for v in col) for col in cells[1:]]
+        if any(nullable):
+            # Rare path: json.dumps per value keeps nulls valid
+            rows = (dict(zip(["time"] + names, row)) for row in zip(*cells))
+            return json.dumps(list(rows), separators=(",", ":"))
+        row_format = '{"time":"%s",' + ",".join(f'"{n}":%r' for n in names) + "}"
+        flat = tuple(v for row in zip(*cells) for v in row)
+        return "[" + ",".join([row_format] * len(self)) % flat + "]"
+
+    def columns_json(self) -> str:
+        """`{"time": [epoch ms], col: [...]}`"""
+        out = {"time": (self.times_us // 1000).tolist()}
+        out.update((n, self._cells(n)) for n in self.columns)
+        return json.dumps(out, separators=(",", ":"))
+
+    def cursor(self, default: Optional[datetime] = None) -> Optional[str]:
+        """Time of the newest point for `since=`, else `default` formatted the same way"""
+        if len(self):
+            return format_time(datetime.fromtimestamp(int(self.times_us[-1]) / 1e6, tz=timezone.utc))
+        return format_time(default) if default is not None else None
+
+    def to_json(self, layout: str = "records") -> str:
+        return self.columns_json() if layout == "columns" else self.records_json()
+
+class SeriesResponse(Response):
+    """JSON response whose Series fields are rendered from columns, skipping
+    per-point model validation. Other values may be plain JSON types or
+    Pydantic models; key order is preserved."""
+    media_type = "application/json"
+
+    def __init__(self, content: Dict[str, object], layout: str = "records", **kwargs):
+        self.layout = layout
+        super().__init__(content, **kwargs)
+
+    def render(self, content: Dict[str, object]) -> bytes:
+        parts = []
+        for key, value in content.items():
+            if isinstance(value, Series):
+                text = value.to_json(self.layout)
+            elif isinstance(value, BaseModel):
+                text = value.model_dump_json()
+            else:
+                text = json.dumps(value, separators=(",", ":"), default=_default)
+            parts.append(f"{json.dumps(key)}:{text}")
+        return ("{" + ",".join(parts) + "}").encode("utf-8")
+
+def format_time(t: datetime) -> str:
+    """UTC ISO-8601 with a `Z` suffix, as Pydantic writes it (no `+` to escape in URLs)"""
+    if t.tzinfo is not None:
+        t = t.astimezone(timezone.utc).replace(tzinfo=None)
+    return t.isoformat() + "Z"
+
+def _default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
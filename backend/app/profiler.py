@@ -0,0 +1,173 @@
+"""On-demand wall-clock stack sampler for a live worker
+
+A background thread snapshots every thread's Python stack with
+`sys._current_frames()` at a fixed interval. The event loop runs on one of
+those threads, so its samples show which callback/coroutine step was
+executing (or `select` while idle). Only one profile runs per process at a
+time, and the sampler backs off whenever taking a sample costs more than
+MAX_DUTY of its interval, so overhead stays bounded under heavy load.
+
+The sampler needs the GIL to take a sample, so work that runs for less than
+the interpreter switch interval (5 ms) between awaits is under-counted in
+favour of the points where the loop releases the GIL. Long CPU-bound steps
+(encoding, model building, numpy) are captured faithfully.
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "60"))
+MAX_DEPTH = 128
+# Fraction of wall time the sampler may spend holding the GIL
+MAX_DUTY = 0.02
+
+# (filename suffix, function) of leaf frames that mean "waiting, not working"
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+Frame = Tuple[str, str, int]  # (function, file, first line)
+
+class ProfilerBusy(Exception):
+    """Raised when a profile is already running in this process"""
+
+_lock = threading.Lock()
+
+def _stack(frame, depth: int = MAX_DEPTH) -> Tuple[Frame, ...]:
+    """Root-first stack of (function, file, line) for one thread"""
+    out: List[Frame] = []
+    while frame is not None and len(out) < depth:
+        code = frame.f_code
+        out.append((getattr(code, "co_qualname", code.co_name), code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    out.reverse()
+    return tuple(out)
+
+def _is_idle(stack: Tuple[Frame, ...]) -> bool:
+    if not stack:
+        return True
+    name, filename, _ = stack[-1]
+    return any(filename.endswith(suffix) and name.endswith(func) for suffix, func in IDLE_LEAVES)
+
+class Profile:
+    """Aggregated samples: (thread name, stack) -> count"""
+
+    def __init__(self, interval_s: float):
+        self.interval_s = interval_s
+        self.samples: Counter = Counter()
+        self.sample_count = 0
+        self.started = 0.0
+        self.duration_s = 0.0
+        self.sampler_s = 0.0
+        self.backed_off = False
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, one `thread;frame;frame count` line per stack"""
+        lines = []
+        for (thread, stack), count in sorted(self.samples.items(), key=lambda kv: -kv[1]):
+            frames = ";".join(f"{name} ({os.path.basename(f)}:{line})" for name, f, line in stack)
+            lines.append(f"{thread};{frames} {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str = "carbonflux") -> dict:
+        """Speedscope file format: one sampled profile per thread, weights in seconds"""
+        frames: List[dict] = []
+        frame_index: Dict[Frame, int] = {}
+        per_thread: Dict[str, Tuple[list, list]] = {}
+        for (thread, stack), count in self.samples.items():
+            indices = []
+            for frame in stack:
+                idx = frame_index.get(frame)
+                if idx is None:
+                    idx = frame_index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indices.append(idx)
+            samples, weights = per_thread.setdefault(thread, ([], []))
+            samples.append(indices)
+            weights.append(count * self.interval_s)
+
+        profiles = [
+            {
+                "type": "sampled",
+                "name": thread,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }
+            for thread, (samples, weights) in per_thread.items()
+        ]
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "carbonflux-profiler",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": profiles,
+        }
+
+    def summary(self) -> dict:
+        return {
+            "duration_s": round(self.duration_s, 3),
+            "interval_s": self.interval_s,
+            "samples": self.sample_count,
+            "stacks": len(self.samples),
+            "backed_off": self.backed_off,
+            "overhead_percent": round(100 * self.sampler_s / self.duration_s, 3) if self.duration_s else 0.0,
+        }
+
+def sample(seconds: float, interval_s: float = 0.005, include_idle: bool = False) -> Profile:
+    """Block the calling thread for `seconds`, sampling every other thread
+
+    Meant to be run off the event loop (asyncio.to_thread). Raises
+    ProfilerBusy if another profile is in progress.
+    """
+    if not _lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+    try:
+        seconds = min(seconds, MAX_SECONDS)
+        profile = Profile(interval_s)
+        own = threading.get_ident()
+        names = {t.ident: t.name for t in threading.enumerate()}
+        profile.started = time.perf_counter()
+        deadline = profile.started + seconds
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = _stack(frame)
+                if not include_idle and _is_idle(stack):
+                    continue
+                if ident not in names:
+                    names = {t.ident: t.name for t in threading.enumerate()}
+                profile.samples[(names.get(ident, str(ident)), stack)] += 1
+            profile.sample_count += 1
+
+            cost = time.perf_counter() - now
+            profile.sampler_s += cost
+            # Stretch the interval if a sample is expensive (many threads / deep stacks)
+            delay = max(interval_s, cost / MAX_DUTY)
+            profile.backed_off |= delay > interval_s
+            time.sleep(max(0.0, min(delay - cost, deadline - time.perf_counter())))
+
+        profile.duration_s = time.perf_counter() - profile.started
+        if profile.backed_off:
+            # Effective weight per sample when the sampler backed off
+            profile.interval_s = profile.duration_s / max(profile.sample_count, 1)
+        return profile
+    finally:
+        _lock.release()
+
+def running() -> bool:
+    return _lock.locked()
@@ -0,0 +1,251 @@
+"""Accelerated replay of stored telemetry through the live fan-out
+
+A `Replay` reads a stored range of `algae_telemetry` and `salt_state` in
+chunks of REPLAY_CHUNK source time (the next chunk is fetched while the
+current one is emitted) and re-emits every timestamp at
+
+    wall start + (row time - range start) / speed
+
+Deadlines are computed from that fixed anchor rather than by summing
+sleeps, so pacing does not drift; when emission falls behind, rows are
+sent immediately and the lag is reported. Targets:
+
+- sse: readings go to SSE subscribers of the reactor via `streams.hub`
+- ws: readings become the newest value of `algae:` / `salt:` topics in
+  `channels.hub` (throttling and deltas apply as for live data)
+- alarms: readings run through a fresh `AlarmEngine`, whose transitions
+  go to SSE subscribers as `event: alarm`
+
+While a replay runs, the reactors and topics it feeds are claimed: live
+polling skips them so clients see only replayed data. Replays run in the
+worker that received the request and reach only that worker's clients.
+"""
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Sequence, Set
+from .alarms import AlarmEngine, sse_event
+from .channels import hub as channel_hub, ALGAE_FIELDS, SALT_FIELDS
+from .db import queries
+from .streams import hub
+from . import metrics
+
+MAX_SPEED = 1000.0
+MAX_RANGE = timedelta(days=31)
+MAX_REPLAYS = 2
+TARGETS = ("sse", "ws", "alarms")
+
+# Source time read per statement; bounds memory at any range length
+REPLAY_CHUNK = timedelta(hours=1)
+
+# Finished replays kept for GET /admin/replay
+HISTORY_SIZE = 20
+
+queries.register(
+    "replay.algae",
+    """SELECT site_id, reactor_id, time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
+       FROM algae_telemetry
+       WHERE time >= $1 AND time < $2
+         AND ($3::text[] IS NULL OR reactor_id = ANY($3::text[]))
+       ORDER BY time"""
+)
+queries.register(
+    "replay.salt",
+    """SELECT site_id, time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw
+       FROM salt_state
+       WHERE time >= $1 AND time < $2
+         AND ($3::text[] IS NULL OR site_id = ANY($3::text[]))
+       ORDER BY time"""
+)
+
+rows_replayed = metrics.counter("replay_rows_total", "Stored rows re-emitted by replays", labelnames=("source",))
+replay_lag = metrics.histogram(
+    "replay_lag_seconds", "How far behind its schedule a replay emitted a timestamp",
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+)
+
+class ReplayBusy(Exception):
+    pass
+
+class Replay:
+    def __init__(self, start: datetime, end: datetime, speed: float, targets: Sequence[str],
+                 reactor_ids: Optional[List[str]] = None, site_ids: Optional[List[str]] = None):
+        self.replay_id = uuid.uuid4().hex[:12]
+        self.start = start
+        self.end = end
+        self.speed = speed
+        self.targets = tuple(targets)
+        self.reactor_ids = reactor_ids
+        self.site_ids = site_ids
+
+        self.state = "running"
+        self.error: Optional[str] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.finished_at: Optional[datetime] = None
+        self.position = start
+        self.rows = 0
+        self.max_lag_s = 0.0
+        self.alarm_events = 0
+
+        self._engine = AlarmEngine() if "alarms" in self.targets else None
+        self._reactors: Set[str] = set()
+        self._topics: Set[str] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "replay_id": self.replay_id,
+            "state": self.state,
+            "start": self.start.isoformat(),
+            "end": self.end.isoformat(),
+            "speed": self.speed,
+            "targets": list(self.targets),
+            "reactor_ids": self.reactor_ids,
+            "site_ids": self.site_ids,
+            "position": self.position.isoformat(),
+            "progress": (self.position - self.start) / (self.end - self.start),
+            "rows": self.rows,
+            "alarm_events": self.alarm_events,
+            "max_lag_s": round(self.max_lag_s, 4),
+            "started_at": self.started_at.isoformat(),
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "error": self.error,
+        }
+
+    async def _read(self, chunk_start: datetime, chunk_end: datetime) -> List:
+        """Rows of both sources in the chunk, merged by time"""
+        algae = await queries.fetch("replay.algae", chunk_start, chunk_end, self.reactor_ids)
+        salt = []
+        if "ws" in self.targets:
+            salt = await queries.fetch("replay.salt", chunk_start, chunk_end, self.site_ids)
+        rows = [("algae", r) for r in algae] + [("salt", r) for r in salt]
+        rows.sort(key=lambda sr: sr[1]["time"])
+        return rows
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        anchor = loop.time()
+        origin = self.start.timestamp()
+        pending: Optional[asyncio.Future] = None
+        try:
+            chunk_start = self.start
+            pending = asyncio.ensure_future(self._read(chunk_start, min(chunk_start + REPLAY_CHUNK, self.end)))
+            while chunk_start < self.end:
+                chunk_end = min(chunk_start + REPLAY_CHUNK, self.end)
+                rows = await pending
+                if chunk_end < self.end:
+                    # Prefetch the next chunk while this one is paced out
+                    pending = asyncio.ensure_future(self._read(chunk_end, min(chunk_end + REPLAY_CHUNK, self.end)))
+
+                i = 0
+                while i < len(rows):
+                    t = rows[i][1]["time"]
+                    j = i
+                    while j < len(rows) and rows[j][1]["time"] == t:
+                        j += 1
+                    deadline = anchor + (t.timestamp() - origin) / self.speed
+                    delay = deadline - loop.time()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    else:
+                        self.max_lag_s = max(self.max_lag_s, -delay)
+                        replay_lag.observe(-delay)
+                    self._emit(rows[i:j])
+                    self.position = t
+                    i = j
+
+                chunk_start = chunk_end
+                self.position = chunk_end
+            self.state = "done"
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"⚠ Replay {self.replay_id} failed: {e}")
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+            self.finished_at = datetime.now(timezone.utc)
+            self._release()
+
+    def _emit(self, group: List):
+        """Send rows sharing one timestamp to every target"""
+        topics = {}
+        for source, row in group:
+            rows_replayed.inc(source=source)
+            self.rows += 1
+            if source == "algae":
+                reactor_id = row["reactor_id"]
+                if "sse" in self.targets or "alarms" in self.targets:
+                    self._claim_reactor(reactor_id)
+                if "sse" in self.targets:
+                    hub.publish(reactor_id, hub.encode(row))
+                if self._engine is not None:
+                    for event in self._engine.observe(row):
+                        self.alarm_events += 1
+                        hub.publish(reactor_id, sse_event(event))
+                if "ws" in self.targets:
+                    topic = f"algae:{reactor_id}"
+                    topics[topic] = (row["time"].timestamp(), tuple(float(row[f]) for f in ALGAE_FIELDS))
+            else:
+                topics[f"salt:{row['site_id']}"] = (
+                    row["time"].timestamp(), tuple(float(row[f]) for f in SALT_FIELDS)
+                )
+        for topic in topics:
+            if topic not in self._topics:
+                self._topics.add(topic)
+                channel_hub.claim(topic)
+        channel_hub.push(topics)
+
+    def _claim_reactor(self, reactor_id: str):
+        if reactor_id not in self._reactors:
+            self._reactors.add(reactor_id)
+            hub.claim(reactor_id)
+
+    def _release(self):
+        for reactor_id in self._reactors:
+            hub.release(reactor_id)
+        for topic in self._topics:
+            channel_hub.release(topic)
+        self._reactors.clear()
+        self._topics.clear()
+
+    async def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+replays: Dict[str, Replay] = {}
+
+def running() -> List[Replay]:
+    return [r for r in replays.values() if r.state == "running"]
+
+def start_replay(start: datetime, end: datetime, speed: float, targets: Sequence[str],
+                 reactor_ids: Optional[List[str]] = None, site_ids: Optional[List[str]] = None) -> Replay:
+    """Validate and launch a replay on this worker's event loop"""
+    if start.tzinfo is None:
+        start = start.replace(tzinfo=timezone.utc)
+    if end.tzinfo is None:
+        end = end.replace(tzinfo=timezone.utc)
+    if end <= start:
+        raise ValueError("end must be after start")
+    if end - start > MAX_RANGE:
+        raise ValueError(f"Range is limited to {MAX_RANGE.days} days")
+    if not 1.0 <= speed <= MAX_SPEED:
+        raise ValueError(f"speed must be between 1 and {MAX_SPEED:.0f}")
+    unknown = [t for t in targets if t not in TARGETS]
+    if not targets or unknown:
+        raise ValueError(f"targets must be a subset of: {', '.join(TARGETS)}")
+    if len(running()) >= MAX_REPLAYS:
+        raise ReplayBusy(f"At most {MAX_REPLAYS} replays run per worker")
+
+    replay = Replay(start, end, speed, targets, reactor_ids, site_ids)
+    replays[replay.replay_id] = replay
+    replay._task = asyncio.create_task(replay.run(), name=f"replay-{replay.replay_id}")
+
+    finished = [r for r in replays.values() if r.state != "running"]
+    for old in sorted(finished, key=lambda r: r.started_at)[:-HISTORY_SIZE]:
+        del replays[old.replay_id]
+    return replay
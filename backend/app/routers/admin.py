@@ -1,47 +1,214 @@
-from fastapi import APIRouter, Query
+import asyncio
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from ..db.seeders import seed_all_data
+from ..ledger import backfill_ledger
 from .. import cache
+from .. import metrics
+from .. import profiler
+from .. import replay
+from .. import tasks
+from ..scheduler import scheduler
+from ..timing import TimedRoute
 
-router = APIRouter(prefix="/admin", tags=["admin"])
+router = APIRouter(prefix="/admin", tags=["admin"], route_class=TimedRoute)
 
-@router.post("/seed")
-async def seed_database(reset: bool = Query(False, description="Clear all data before seeding")):
-    """Seed database with generated time-series data"""
-    await seed_all_data(reset=reset)
-    cache.clear()
-    return {
-        "status": "success",
-        "message": f"Database seeded successfully (reset={reset})",
-        "data_ranges": {
-            "history": "30 days",
-            "forecast": "72 hours"
-        }
-    }
+async def _submit(kind: str, params: dict, func, wait: bool) -> JSONResponse:
+    try:
+        task = await tasks.queue.submit(kind, params, func)
+    except tasks.QueueFull as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    if wait:
+        await task.wait()
+        return JSONResponse(task.to_dict(), status_code=200 if task.state == "done" else 500)
+    return JSONResponse(task.to_dict(), status_code=202)
+
+@router.post("/seed", status_code=202)
+async def seed_database(
+    reset: bool = Query(False, description="Clear all data before seeding"),
+    sites: int = Query(1, ge=1, le=50, description="Storage sites to seed"),
+    reactors_per_site: int = Query(1, ge=1, le=100, description="Bioreactors per site"),
+    wait: bool = Query(False, description="Respond only once the task has finished")
+):
+    """Queue a reseed with generated time-series data; poll GET /admin/tasks/{task_id}"""
+    async def run():
+        await seed_all_data(reset=reset, sites=sites, reactors_per_site=reactors_per_site)
+        cache.clear()
+        return {"data_ranges": {"history": "30 days", "forecast": "72 hours"}}
 
-@router.post("/scenario")
-async def switch_scenario(type: str = Query(..., description="Scenario type: cloudy, heatwave, or maintenance")):
-    """Switch to a different scenario by reseeding with scenario-specific parameters"""
+    params = {"reset": reset, "sites": sites, "reactors_per_site": reactors_per_site}
+    return await _submit("seed", params, run, wait)
+
+@router.post("/scenario", status_code=202)
+async def switch_scenario(
+    type: str = Query(..., description="Scenario type: cloudy, heatwave, or maintenance"),
+    wait: bool = Query(False, description="Respond only once the task has finished")
+):
+    """Queue a switch to a different scenario (reseeds with scenario-specific parameters)"""
     valid_scenarios = ["cloudy", "heatwave", "maintenance", "clear"]
 
     if type not in valid_scenarios:
-        return {
-            "status": "error",
-            "message": f"Invalid scenario. Must be one of: {', '.join(valid_scenarios)}"
-        }
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid scenario. Must be one of: {', '.join(valid_scenarios)}"
+        )
+
+    async def run():
+        # Clear cache before reseeding, and again once the new data is in place
+        cache.clear()
+        await seed_all_data(reset=True, scenario=type)
+        cache.clear()
+        return {"scenario": type, "description": _get_scenario_description(type)}
 
-    # Clear cache before reseeding
-    cache.clear()
+    return await _submit("scenario", {"type": type}, run, wait)
 
-    # Reseed with scenario parameters
-    await seed_all_data(reset=True, scenario=type)
+@router.post("/backfill", status_code=202)
+async def backfill_carbon_ledger(
+    start: Optional[datetime] = Query(None, description="Start of the range (default: oldest telemetry)"),
+    end: Optional[datetime] = Query(None, description="End of the range (default: now)"),
+    wait: bool = Query(False, description="Respond only once the task has finished")
+):
+    """Queue a recompute of carbon_ledger from algae telemetry for [start, end)"""
+    if start is not None and end is not None and end <= start:
+        raise HTTPException(status_code=400, detail="end must be after start")
 
+    async def run():
+        written = await backfill_ledger(start, end)
+        cache.clear()
+        return {"hours_written": written}
+
+    params = {
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None,
+    }
+    return await _submit("backfill", params, run, wait)
+
+@router.get("/tasks")
+async def list_tasks():
+    """Queued, running and recently finished admin tasks of every worker"""
     return {
-        "status": "success",
-        "scenario": type,
-        "message": f"Switched to '{type}' scenario and reseeded all data",
-        "description": _get_scenario_description(type)
+        "max_running": tasks.queue.max_running,
+        "tasks": await tasks.queue.list(),
     }
 
+async def _find_task(task_id: str) -> dict:
+    found = await tasks.queue.get(task_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown task: {task_id}")
+    return found
+
+@router.get("/tasks/{task_id}")
+async def get_task(task_id: str):
+    return await _find_task(task_id)
+
+@router.get("/tasks/{task_id}/events")
+async def stream_task(task_id: str):
+    """SSE feed of the task's state on every progress update, ending when it finishes"""
+    await _find_task(task_id)
+    return StreamingResponse(
+        tasks.queue.events(task_id),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "X-Accel-Buffering": "no"
+        }
+    )
+
+@router.delete("/tasks/{task_id}")
+async def cancel_task(task_id: str):
+    """Cancel a queued or running task at its next await
+
+    A task of another worker is cancelled by its owner within a second.
+    A cancelled reseed leaves the tables partially seeded; submit another.
+    """
+    await _find_task(task_id)
+    return await tasks.queue.cancel(task_id)
+
+@router.get("/jobs")
+async def get_jobs():
+    """Background job status: leadership, last duration and last error per job"""
+    return scheduler.snapshot()
+
+@router.get("/db/stats")
+async def get_db_stats():
+    """Pool acquire latency, connections in use and per-statement latency"""
+    return metrics.snapshot("db_")
+
+@router.post("/profile")
+async def profile_worker(
+    seconds: float = Query(10.0, gt=0, le=profiler.MAX_SECONDS, description="Sampling duration"),
+    format: str = Query("speedscope", description="Output format: speedscope or collapsed"),
+    interval_ms: float = Query(5.0, ge=1, le=1000, description="Sampling interval"),
+    idle: bool = Query(False, description="Keep samples of threads blocked in select/wait")
+):
+    """Sample this worker's threads (event loop included) for `seconds`
+
+    Returns a speedscope JSON profile (open at https://www.speedscope.app) or
+    collapsed stacks for flamegraph.pl. Only one profile runs per worker.
+    """
+    if format not in ("speedscope", "collapsed"):
+        raise HTTPException(status_code=400, detail="format must be one of: speedscope, collapsed")
+    if profiler.running():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+
+    try:
+        result = await asyncio.to_thread(profiler.sample, seconds, interval_ms / 1000.0, idle)
+    except profiler.ProfilerBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    headers = {f"X-Profile-{k.replace('_', '-').title()}": str(v) for k, v in result.summary().items()}
+    if format == "collapsed":
+        return PlainTextResponse(result.collapsed(), headers=headers)
+    return {**result.speedscope(), "summary": result.summary()}
+
+@router.post("/replay")
+async def start_replay(
+    start: datetime = Query(..., description="Start of the stored range"),
+    end: datetime = Query(..., description="End of the stored range (exclusive)"),
+    speed: float = Query(60.0, ge=1, le=replay.MAX_SPEED, description="Source seconds replayed per wall second"),
+    targets: str = Query("sse,ws", description=f"Comma-separated subset of: {', '.join(replay.TARGETS)}"),
+    reactors: Optional[str] = Query(None, description="Comma-separated reactor ids (default: all)"),
+    sites: Optional[str] = Query(None, description="Comma-separated site ids for salt topics (default: all)")
+):
+    """Re-emit stored telemetry through the live SSE/WebSocket fan-out of this worker
+
+    Runs in the background; poll GET /admin/replay/{replay_id} for progress.
+    """
+    def _split(value: Optional[str]) -> Optional[list]:
+        return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
+    try:
+        started = replay.start_replay(start, end, speed, _split(targets) or [], _split(reactors), _split(sites))
+    except replay.ReplayBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return started.to_dict()
+
+@router.get("/replay")
+async def list_replays():
+    """Running and recently finished replays on this worker"""
+    return {"replays": [r.to_dict() for r in replay.replays.values()]}
+
+@router.get("/replay/{replay_id}")
+async def get_replay(replay_id: str):
+    found = replay.replays.get(replay_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown replay: {replay_id}")
+    return found.to_dict()
+
+@router.delete("/replay/{replay_id}")
+async def cancel_replay(replay_id: str):
+    """Stop a replay; live polling resumes for the reactors and topics it fed"""
+    found = replay.replays.get(replay_id)
+    if found is None:
+        raise HTTPException(status_code=404, detail=f"Unknown replay: {replay_id}")
+    await found.cancel()
+    return found.to_dict()
+
 def _get_scenario_description(scenario: str) -> str:
     """Get human-readable scenario description"""
     descriptions = {
@@ -1,85 +1,136 @@
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Query, HTTPException
+from typing import List, Optional
 from fastapi.responses import StreamingResponse
 from datetime import datetime, timedelta, timezone
-import asyncio
-import json
 from pydantic import BaseModel
-from ..db.connection import get_pool
-from ..models.schemas import AlgaeTelemetryResponse, AlgaeTelemetryPoint
-
-router = APIRouter(prefix="/algae", tags=["algae"])
-
-# Control action state (in-memory for demo)
-control_state = {
-    "degas_active": False,
-    "aerate_active": False,
-    "night_mode": False
+from ..db import queries
+from ..db.downsample import read_history, read_since, RAW_RESOLUTION_S
+from ..models.schemas import AlgaeTelemetryResponse, AlarmEvent, AlarmsResponse
+from ..models.series import Series, SeriesResponse, LAYOUTS
+from ..sites import directory, DEFAULT_REACTOR_ID
+from ..streams import hub
+from ..alarms import engine as alarm_engine
+from .. import metrics
+from ..timing import TimedRoute, phase
+
+router = APIRouter(prefix="/algae", tags=["algae"], route_class=TimedRoute)
+
+sse_subscribers = metrics.gauge("sse_subscribers", "Open telemetry SSE streams")
+metrics.gauge("sse_polled_reactors", "Reactors polled per tick by the telemetry hub",
+              func=lambda: len(hub.reactor_ids()))
+
+# Upper bound on reactors multiplexed over one SSE connection
+MAX_STREAM_REACTORS = 200
+
+# action -> (message, duration seconds)
+CONTROL_ACTIONS = {
+    "degas": ("Degassing initiated - DO will decrease temporarily", 30),
+    "aerate": ("Aeration burst initiated - DO will increase temporarily", 30),
+    "night_mode": ("Night mode activated - CO2 uptake reduced", 60),
 }
 
+TELEMETRY_COLUMNS = ("ph", "do_mg_l", "temp_c", "co2_uptake_kg_h", "biomass_g_l")
+
 class ControlRequest(BaseModel):
     action: str  # "degas", "aerate", "night_mode"
+    reactor_id: str = DEFAULT_REACTOR_ID
+
+async def _resolve_reactor(reactor_id: str) -> dict:
+    reactor = await directory.reactor(reactor_id)
+    if reactor is None:
+        raise HTTPException(status_code=404, detail=f"Unknown reactor: {reactor_id}")
+    return reactor
 
 @router.get("/telemetry", response_model=AlgaeTelemetryResponse)
 async def get_algae_telemetry(
-    hours: int = Query(24, description="Hours of historical data to retrieve")
+    hours: int = Query(24, description="Hours of historical data to retrieve"),
+    resolution: Optional[int] = Query(None, ge=60, description="Coarsest acceptable spacing in seconds"),
+    max_points: Optional[int] = Query(None, ge=1, description="Pick a resolution yielding at most this many points"),
+    layout: str = Query("records", description="records (list of points) or columns ({time: [epoch ms], ph: [...], ...})"),
+    reactor_id: str = Query(DEFAULT_REACTOR_ID, description="Reactor to read"),
+    since: Optional[datetime] = Query(None, description="Cursor from a previous response; only newer points are returned")
 ):
-    """Get historical algae telemetry data"""
-    pool = await get_pool()
+    """Get historical algae telemetry data (from downsampled tiers when coarser data suffices)"""
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUTS)}")
+    if since is not None and (resolution is not None or max_points is not None):
+        raise HTTPException(status_code=400, detail="since returns raw points; drop resolution and max_points")
+    return await build_algae_telemetry(reactor_id, hours, resolution, max_points, layout, since)
+
+async def build_algae_telemetry(reactor_id: str = DEFAULT_REACTOR_ID, hours: int = 24,
+                                resolution: Optional[int] = None, max_points: Optional[int] = None,
+                                layout: str = "records", since: Optional[datetime] = None) -> SeriesResponse:
+    """History of one reactor, rendered as a SeriesResponse.
+
+    With `since`, only the raw points newer than that cursor (clamped to the
+    window).
+    """
+    reactor = await _resolve_reactor(reactor_id)
     now = datetime.now(timezone.utc)
     start_time = now - timedelta(hours=hours)
-
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
-               FROM algae_telemetry
-               WHERE time >= $1 AND time <= $2
-               ORDER BY time""",
-            start_time, now
+    key = (reactor["site_id"], reactor_id)
+
+    if since is not None:
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        since = max(since, start_time)
+        rows = await read_since("algae_telemetry", key, since, now)
+        resolution_s = RAW_RESOLUTION_S
+    else:
+        rows, resolution_s = await read_history(
+            "algae_telemetry", key, start_time, now, resolution, max_points
         )
 
-    data = [AlgaeTelemetryPoint(**dict(row)) for row in rows]
-
-    return AlgaeTelemetryResponse(
-        data=data,
-        count=len(data),
-        time_range=f"Last {hours} hours"
-    )
-
-async def telemetry_stream():
-    """SSE generator for live algae telemetry"""
-    pool = await get_pool()
-
-    while True:
-        try:
-            now = datetime.now(timezone.utc)
-            async with pool.acquire() as conn:
-                # Get most recent telemetry
-                row = await conn.fetchrow(
-                    """SELECT time, ph, do_mg_l, temp_c, co2_uptake_kg_h, biomass_g_l
-                       FROM algae_telemetry
-                       WHERE time <= $1
-                       ORDER BY time DESC
-                       LIMIT 1""",
-                    now
-                )
-
-            if row:
-                point = AlgaeTelemetryPoint(**dict(row))
-                # SSE format: data: {...}\n\n
-                yield f"data: {point.model_dump_json()}\n\n"
-
-            # Stream every 2 seconds
-            await asyncio.sleep(2)
-
-        except Exception as e:
-            yield f"data: {{\"error\": \"{str(e)}\"}}\n\n"
-            await asyncio.sleep(5)
+    with phase("model"):
+        data = Series.from_records(rows, TELEMETRY_COLUMNS)
+
+    with phase("serialize"):
+        return SeriesResponse({
+            "data": data,
+            "count": len(data),
+            "time_range": f"Last {hours} hours",
+            "resolution_s": resolution_s,
+            "site_id": reactor["site_id"],
+            "reactor_id": reactor_id,
+            # Binned tails are still filling, so only raw reads can be resumed
+            "cursor": data.cursor(since) if resolution_s == RAW_RESOLUTION_S else None
+        }, layout=layout)
+
+async def telemetry_stream(reactor_ids: List[str]):
+    """SSE generator for live algae telemetry of the given reactors"""
+    sse_subscribers.inc()
+    try:
+        async for event in hub.events(reactor_ids):
+            yield event
+    finally:
+        sse_subscribers.dec()
 
 @router.get("/telemetry/stream")
-async def stream_algae_telemetry():
-    """SSE stream of live algae bioreactor telemetry"""
+async def stream_algae_telemetry(
+    reactors: Optional[str] = Query(None, description="Comma-separated reactor ids"),
+    site_id: Optional[str] = Query(None, description="Stream every reactor of this site")
+):
+    """SSE stream of live algae bioreactor telemetry.
+
+    Multiplexes any number of reactors over one connection; each event
+    carries its site_id and reactor_id. Defaults to the default reactor.
+    """
+    reactor_ids: List[str] = []
+    if site_id is not None:
+        if await directory.site(site_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+        reactor_ids.extend(await directory.reactors_of(site_id))
+    if reactors:
+        for reactor_id in reactors.split(","):
+            await _resolve_reactor(reactor_id.strip())
+            reactor_ids.append(reactor_id.strip())
+    if site_id is None and not reactors:
+        reactor_ids = [DEFAULT_REACTOR_ID]
+    if len(set(reactor_ids)) > MAX_STREAM_REACTORS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_STREAM_REACTORS} reactors per stream")
+
     return StreamingResponse(
-        telemetry_stream(),
+        telemetry_stream(reactor_ids),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache",
@@ -90,44 +141,69 @@ async def stream_algae_telemetry():
 
 @router.post("/control")
 async def control_reactor(request: ControlRequest):
-    """Control reactor operations - triggers temporary parameter changes"""
-    action = request.action.lower()
+    """Control reactor operations - triggers temporary parameter changes.
 
-    # Reset all states first
-    for key in control_state:
-        control_state[key] = False
+    The alarms an action is expected to trip are held for its duration.
+    """
+    action = request.action.lower()
+    await _resolve_reactor(request.reactor_id)
 
-    # Activate requested action
-    if action == "degas":
-        control_state["degas_active"] = True
-        # In a real system, this would trigger a temporary DO reduction
-        # For demo, we'll modify the SSE stream behavior
-        return {
-            "success": True,
-            "action": "degas",
-            "message": "Degassing initiated - DO will decrease temporarily",
-            "duration_seconds": 30
-        }
-    elif action == "aerate":
-        control_state["aerate_active"] = True
-        return {
-            "success": True,
-            "action": "aerate",
-            "message": "Aeration burst initiated - DO will increase temporarily",
-            "duration_seconds": 30
-        }
-    elif action == "night_mode":
-        control_state["night_mode"] = True
-        return {
-            "success": True,
-            "action": "night_mode",
-            "message": "Night mode activated - CO2 uptake reduced",
-            "duration_seconds": 60
-        }
-    else:
+    if action not in CONTROL_ACTIONS:
         return {
             "success": False,
             "action": action,
             "message": f"Unknown action: {action}",
-            "valid_actions": ["degas", "aerate", "night_mode"]
+            "valid_actions": list(CONTROL_ACTIONS)
         }
+
+    message, duration_s = CONTROL_ACTIONS[action]
+    await alarm_engine.hold(request.reactor_id, action, duration_s)
+    return {
+        "success": True,
+        "action": action,
+        "message": message,
+        "duration_seconds": duration_s,
+        "held_alarms": alarm_engine.held(request.reactor_id)
+    }
+
+async def _alarm_scope(reactor_id: Optional[str], site_id: Optional[str]) -> List[str]:
+    if site_id is not None:
+        if await directory.site(site_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+        return await directory.reactors_of(site_id)
+    reactor_id = reactor_id or DEFAULT_REACTOR_ID
+    await _resolve_reactor(reactor_id)
+    return [reactor_id]
+
+@router.get("/alarms", response_model=AlarmsResponse)
+async def get_active_alarms(
+    reactor_id: Optional[str] = Query(None, description="Reactor to report (default reactor if neither is given)"),
+    site_id: Optional[str] = Query(None, description="Report every reactor of this site")
+):
+    """Alarms currently raised by the streaming alarm engine (served from memory)"""
+    reactor_ids = await _alarm_scope(reactor_id, site_id)
+    with phase("model"):
+        alarms = alarm_engine.active(reactor_ids)
+        held = {rid: alarm_engine.held(rid) for rid in reactor_ids if alarm_engine.held(rid)}
+    return {"alarms": alarms, "count": len(alarms), "held": held}
+
+@router.get("/alarms/history", response_model=AlarmsResponse)
+async def get_alarm_history(
+    reactor_id: Optional[str] = Query(None, description="Reactor to report (default reactor if neither is given)"),
+    site_id: Optional[str] = Query(None, description="Report every reactor of this site"),
+    hours: int = Query(24, ge=1, le=24 * 90, description="Hours of history"),
+    limit: int = Query(500, ge=1, le=5000, description="Newest events to return")
+):
+    """Raise/clear transitions recorded in alarm_events, newest first"""
+    since = datetime.now(timezone.utc) - timedelta(hours=hours)
+    if site_id is not None:
+        if await directory.site(site_id) is None:
+            raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+        rows = await queries.fetch("alarms.site_history", site_id, since, limit)
+    else:
+        reactor_id = reactor_id or DEFAULT_REACTOR_ID
+        await _resolve_reactor(reactor_id)
+        rows = await queries.fetch("alarms.history", reactor_id, since, limit)
+    with phase("model"):
+        alarms = [AlarmEvent(**dict(row)) for row in rows]
+    return {"alarms": alarms, "count": len(alarms)}
@@ -1,70 +1,243 @@
-from fastapi import APIRouter, Query
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import StreamingResponse
 from datetime import datetime, timezone
+from typing import Optional
 import csv
 import io
 import json
+import zlib
 from ..db.connection import get_pool
-from ..models.schemas import CarbonLedgerResponse, CarbonLedgerDailyPoint
+from ..db import queries
+from ..ledger import get_prefix_index
+from ..models.schemas import (
+    CarbonLedgerResponse, CarbonLedgerDailyPoint,
+    CarbonRangeTotalResponse, CarbonCumulativeResponse
+)
+from ..models.series import Series, SeriesResponse
+from ..timing import TimedRoute, phase
 
-router = APIRouter(prefix="/carbon", tags=["carbon"])
+router = APIRouter(prefix="/carbon", tags=["carbon"], route_class=TimedRoute)
+
+# Rows pulled from the server-side cursor per round trip / per emitted chunk
+EXPORT_PREFETCH = 2000
+EXPORT_COLUMNS = ["time", "co2_in_kg", "co2_fixed_kg", "co2_net_kg", "records"]
+
+# Export queries per granularity. All of them take ($1 from, $2 to) and stream
+# rows in time order; "batch" rolls hourly rows into fixed-length windows
+# ($3 batch length) aligned to the Unix epoch.
+EXPORT_QUERIES = {
+    "hourly": """SELECT time, co2_in_kg, co2_fixed_kg, co2_net_kg, 1 AS records
+                 FROM carbon_ledger
+                 WHERE time >= $1 AND time < $2
+                 ORDER BY time""",
+    "daily": """SELECT date_trunc('day', time) AS time,
+                       SUM(co2_in_kg) AS co2_in_kg,
+                       SUM(co2_fixed_kg) AS co2_fixed_kg,
+                       SUM(co2_net_kg) AS co2_net_kg,
+                       COUNT(*) AS records
+                FROM carbon_ledger
+                WHERE time >= $1 AND time < $2
+                GROUP BY 1
+                ORDER BY 1""",
+    "batch": """SELECT date_bin($3::interval, time, TIMESTAMPTZ 'epoch') AS time,
+                       SUM(co2_in_kg) AS co2_in_kg,
+                       SUM(co2_fixed_kg) AS co2_fixed_kg,
+                       SUM(co2_net_kg) AS co2_net_kg,
+                       COUNT(*) AS records
+                FROM carbon_ledger
+                WHERE time >= $1 AND time < $2
+                GROUP BY 1
+                ORDER BY 1""",
+}
 
 @router.get("/ledger")
 async def get_carbon_ledger(
-    export: str = Query(None, description="Export format: csv or json")
+    export: str = Query(None, description="Export format: csv or json"),
+    start: Optional[datetime] = Query(None, alias="from", description="Export range start (inclusive)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Export range end (exclusive)"),
+    granularity: str = Query("daily", description="Export granularity: hourly, daily or batch"),
+    batch_days: int = Query(7, ge=1, le=366, description="Batch length in days for granularity=batch"),
+    gzip: bool = Query(False, description="Gzip-compress the export stream")
 ):
-    """Get carbon ledger daily rollups with optional CSV/JSON export"""
-    pool = await get_pool()
+    """Get carbon ledger daily rollups with optional streaming CSV/JSON export"""
+    if export is not None:
+        if export not in ("csv", "json"):
+            raise HTTPException(status_code=400, detail="export must be one of: csv, json")
+        if granularity not in EXPORT_QUERIES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"granularity must be one of: {', '.join(EXPORT_QUERIES)}"
+            )
+        return _export_response(export, start, end, granularity, batch_days, gzip)
 
-    async with pool.acquire() as conn:
-        # Get daily rollups from materialized view
-        rows = await conn.fetch(
-            """SELECT day, total_co2_in_kg, total_co2_fixed_kg, total_co2_net_kg, records
-               FROM mv_daily_ledger
-               ORDER BY day DESC"""
-        )
-
-    daily = [CarbonLedgerDailyPoint(**dict(row)) for row in rows]
-    cumulative_net = sum(d.total_co2_net_kg for d in daily)
-
-    # Handle exports
-    if export == "csv":
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(["day", "total_co2_in_kg", "total_co2_fixed_kg", "total_co2_net_kg", "records"])
-
-        for d in daily:
-            writer.writerow([
-                d.day.isoformat(),
-                d.total_co2_in_kg,
-                d.total_co2_fixed_kg,
-                d.total_co2_net_kg,
-                d.records
-            ])
+    return await build_carbon_ledger()
 
-        return StreamingResponse(
-            iter([output.getvalue()]),
-            media_type="text/csv",
-            headers={"Content-Disposition": "attachment; filename=carbon_ledger.csv"}
-        )
-
-    elif export == "json":
-        data = {
-            "daily": [d.model_dump(mode='json') for d in daily],
-            "cumulative_net_kg": cumulative_net,
-            "total_days": len(daily),
-            "exported_at": datetime.now(timezone.utc).isoformat()
-        }
+async def build_carbon_ledger() -> CarbonLedgerResponse:
+    """Daily rollups plus the all-time net total"""
+    # Get daily rollups from materialized view
+    rows = await queries.fetch("carbon.daily")
 
-        return StreamingResponse(
-            iter([json.dumps(data, indent=2)]),
-            media_type="application/json",
-            headers={"Content-Disposition": "attachment; filename=carbon_ledger.json"}
-        )
+    with phase("model"):
+        daily = [CarbonLedgerDailyPoint(**dict(row)) for row in rows]
+    index = await get_prefix_index()
+    _, _, cumulative_net = index.total()
 
-    # Default: return API response
     return CarbonLedgerResponse(
         daily=daily,
         cumulative_net_kg=cumulative_net,
         total_days=len(daily)
     )
+
+@router.get("/ledger/total", response_model=CarbonRangeTotalResponse)
+async def get_carbon_range_total(
+    start: Optional[datetime] = Query(None, alias="from", description="Range start (inclusive)"),
+    end: Optional[datetime] = Query(None, alias="to", description="Range end (exclusive)")
+):
+    """Net/fixed/in CO2 totals between two timestamps from the prefix-sum index"""
+    start = _as_utc(start) if start else None
+    end = _as_utc(end) if end else None
+    index = await get_prefix_index()
+    co2_in, co2_fixed, co2_net = index.total(start, end)
+
+    return CarbonRangeTotalResponse(
+        start=start,
+        end=end,
+        co2_in_kg=co2_in,
+        co2_fixed_kg=co2_fixed,
+        co2_net_kg=co2_net
+    )
+
+@router.get("/ledger/cumulative", response_model=CarbonCumulativeResponse)
+async def get_carbon_cumulative(
+    start: Optional[datetime] = Query(None, alias="from", description="Series start"),
+    end: Optional[datetime] = Query(None, alias="to", description="Series end"),
+    step_hours: int = Query(24, ge=1, le=24 * 366, description="Sampling step in hours")
+):
+    """Cumulative net CO2 series sampled from the prefix-sum index"""
+    index = await get_prefix_index()
+    times, values = index.cumulative(
+        _as_utc(start) if start else None,
+        _as_utc(end) if end else None,
+        step_hours
+    )
+
+    series = Series.from_epoch_seconds(times, {"cumulative_net_kg": values})
+
+    return SeriesResponse({
+        "series": series,
+        "step_hours": step_hours,
+        "count": len(series)
+    })
+
+def _export_response(fmt: str, start: Optional[datetime], end: Optional[datetime],
+                     granularity: str, batch_days: int, compress: bool) -> StreamingResponse:
+    """Build a StreamingResponse that pulls ledger rows from a server-side cursor"""
+    start = _as_utc(start) if start else datetime(1970, 1, 1, tzinfo=timezone.utc)
+    end = _as_utc(end) if end else datetime.now(timezone.utc)
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'to' must be after 'from'")
+
+    params = [start, end]
+    if granularity == "batch":
+        params.append(f"{batch_days} days")
+
+    rows = _ledger_rows(EXPORT_QUERIES[granularity], params)
+    if fmt == "csv":
+        body = _csv_chunks(rows)
+        media_type = "text/csv"
+    else:
+        meta = {
+            "granularity": granularity,
+            "from": start.isoformat(),
+            "to": end.isoformat(),
+        }
+        if granularity == "batch":
+            meta["batch_days"] = batch_days
+        body = _json_chunks(rows, meta)
+        media_type = "application/json"
+
+    filename = f"carbon_ledger_{granularity}.{fmt}"
+    headers = {"Content-Disposition": f"attachment; filename={filename}"}
+    if compress:
+        body = _gzip_chunks(body)
+        headers["Content-Disposition"] = f"attachment; filename={filename}.gz"
+        media_type = "application/gzip"
+
+    return StreamingResponse(body, media_type=media_type, headers=headers)
+
+def _as_utc(value: datetime) -> datetime:
+    """Treat naive query timestamps as UTC"""
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+async def _ledger_rows(query: str, params: list):
+    """Yield batches of ledger rows from a server-side cursor"""
+    pool = await get_pool()
+
+    async with pool.acquire() as conn:
+        # asyncpg cursors only live inside a transaction
+        async with conn.transaction(readonly=True):
+            cursor = await conn.cursor(query, *params)
+            while True:
+                batch = await cursor.fetch(EXPORT_PREFETCH)
+                if not batch:
+                    break
+                yield batch
+
+async def _csv_chunks(row_batches):
+    """Encode row batches as CSV, one chunk per batch"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(EXPORT_COLUMNS)
+    yield output.getvalue()
+
+    async for batch in row_batches:
+        output.seek(0)
+        output.truncate()
+        for row in batch:
+            writer.writerow([
+                row["time"].isoformat(),
+                row["co2_in_kg"],
+                row["co2_fixed_kg"],
+                row["co2_net_kg"],
+                row["records"]
+            ])
+        yield output.getvalue()
+
+async def _json_chunks(row_batches, meta: dict):
+    """Encode row batches as a single JSON document, emitted incrementally"""
+    head = json.dumps(meta)[:-1]
+    yield head + ', "rows": ['
+
+    first = True
+    total_net = 0.0
+    count = 0
+    async for batch in row_batches:
+        parts = []
+        for row in batch:
+            total_net += row["co2_net_kg"]
+            count += 1
+            parts.append(json.dumps({
+                "time": row["time"].isoformat(),
+                "co2_in_kg": row["co2_in_kg"],
+                "co2_fixed_kg": row["co2_fixed_kg"],
+                "co2_net_kg": row["co2_net_kg"],
+                "records": row["records"]
+            }))
+        chunk = ", ".join(parts)
+        yield chunk if first else ", " + chunk
+        first = False
+
+    yield "], " + json.dumps({
+        "cumulative_net_kg": total_net,
+        "total_rows": count,
+        "exported_at": datetime.now(timezone.utc).isoformat()
+    })[1:]
+
+async def _gzip_chunks(chunks):
+    """Gzip-compress a text chunk stream without buffering it"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk.encode("utf-8"))
+        if data:
+            yield data
+    yield compressor.flush()
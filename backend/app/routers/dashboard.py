@@ -0,0 +1,111 @@
+"""Composite dashboard snapshot
+
+One request that returns several Overview sections at once. Sections run
+concurrently (each on its own pool connection), cached forecasts are reused
+together with their already-encoded JSON, and history sections are rendered
+from columns. A failing section is reported under `errors` instead of
+failing the whole snapshot.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict
+from fastapi import APIRouter, Query, HTTPException
+from fastapi.responses import Response
+from pydantic import BaseModel
+from .. import cache
+from ..sites import DEFAULT_SITE_ID, DEFAULT_REACTOR_ID
+from ..timing import TimedRoute, phase
+from .forecast import build_solar_forecast, build_green_windows, SOLAR_CACHE_KEY, GREEN_WINDOWS_CACHE_KEY
+from .salt import build_salt_state
+from .dispatch import build_dispatch_plan
+from .algae import build_algae_telemetry
+from .carbon import build_carbon_ledger
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"], route_class=TimedRoute)
+
+DEFAULT_SECTIONS = "solar,salt,dispatch,carbon"
+
+def _cached_json(key: str, model: BaseModel) -> str:
+    """JSON of a cached model, encoded once per cached value"""
+    # The model's own lookup was already counted; don't count this one too
+    cached = cache.peek(f"{key}:json")
+    if cached is not None and cached[0] is model:
+        return cached[1]
+    text = model.model_dump_json()
+    cache.set(f"{key}:json", (model, text))
+    return text
+
+async def _solar(params: dict) -> str:
+    result, _ = await build_solar_forecast()
+    return _cached_json(SOLAR_CACHE_KEY, result)
+
+async def _green_windows(params: dict) -> str:
+    result, _ = await build_green_windows()
+    return _cached_json(GREEN_WINDOWS_CACHE_KEY, result)
+
+async def _salt(params: dict) -> str:
+    response = await build_salt_state(params["site_id"], params["hours"])
+    return response.body.decode("utf-8")
+
+async def _dispatch(params: dict) -> str:
+    return (await build_dispatch_plan(params["site_id"])).model_dump_json()
+
+async def _algae(params: dict) -> str:
+    response = await build_algae_telemetry(params["reactor_id"], params["hours"])
+    return response.body.decode("utf-8")
+
+async def _carbon(params: dict) -> str:
+    return (await build_carbon_ledger()).model_dump_json()
+
+SECTIONS: Dict[str, Callable[[dict], Awaitable[str]]] = {
+    "solar": _solar,
+    "green_windows": _green_windows,
+    "salt": _salt,
+    "dispatch": _dispatch,
+    "algae": _algae,
+    "carbon": _carbon,
+}
+
+async def _run_section(name: str, params: dict) -> str:
+    with phase(f"section_{name}"):
+        return await SECTIONS[name](params)
+
+def _error(exc: BaseException) -> dict:
+    if isinstance(exc, HTTPException):
+        return {"status": exc.status_code, "detail": exc.detail}
+    return {"status": 500, "detail": str(exc)}
+
+@router.get("/snapshot")
+async def get_snapshot(
+    sections: str = Query(DEFAULT_SECTIONS, description=f"Comma-separated subset of: {', '.join(SECTIONS)}"),
+    site_id: str = Query(DEFAULT_SITE_ID, description="Site for salt and dispatch"),
+    reactor_id: str = Query(DEFAULT_REACTOR_ID, description="Reactor for algae"),
+    hours: int = Query(24, ge=1, le=168, description="History window for salt and algae")
+):
+    """Several dashboard sections in one response, fetched concurrently"""
+    names = list(dict.fromkeys(s.strip() for s in sections.split(",") if s.strip()))
+    unknown = [n for n in names if n not in SECTIONS]
+    if not names or unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"sections must be a comma-separated subset of: {', '.join(SECTIONS)}"
+        )
+
+    params = {"site_id": site_id, "reactor_id": reactor_id, "hours": hours}
+    results = await asyncio.gather(*(_run_section(n, params) for n in names), return_exceptions=True)
+
+    # Section bodies are already JSON; splice them instead of re-encoding
+    parts = [
+        f'"generated_at":{json.dumps(datetime.now(timezone.utc).isoformat())}',
+        f'"sections":{json.dumps(names)}',
+    ]
+    errors: Dict[str, dict] = {}
+    for name, result in zip(names, results):
+        if isinstance(result, BaseException):
+            errors[name] = _error(result)
+            parts.append(f'"{name}":null')
+        else:
+            parts.append(f'"{name}":{result}')
+    parts.append(f'"errors":{json.dumps(errors)}')
+    return Response("{" + ",".join(parts) + "}", media_type="application/json")
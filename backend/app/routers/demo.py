@@ -1,104 +1,186 @@
 from fastapi import APIRouter, Query
-from datetime import datetime, timedelta
-import random
-import math
+from fastapi.responses import StreamingResponse
+from datetime import datetime
+from typing import Dict, Iterator, Optional
+import json
+import struct
+import numpy as np
+from ..timing import TimedRoute
+
+router = APIRouter(prefix="/demo", tags=["demo"], route_class=TimedRoute)
+
+# Points generated and emitted per chunk; bounds server memory for any request size
+CHUNK_POINTS = 20000
+# Start of every seeded dataset, so a seed reproduces the timestamps too
+SEEDED_BASE_TIME = datetime(2024, 1, 1)
+
+# Value columns per data type (time is always the first column)
+COLUMNS = {
+    "solar": ["value_kw", "p5", "p50", "p95"],
+    "temp": ["temp_c"],
+    "ph": ["ph"],
+}
+
+MEDIA_TYPES = {
+    "json": "application/json",
+    "columnar": "application/x-ndjson",
+    "binary": "application/octet-stream",
+}
+
+def _chunk_bounds(points: int) -> Iterator[slice]:
+    for start in range(0, points, CHUNK_POINTS):
+        yield slice(start, min(start + CHUNK_POINTS, points))
+
+def _offsets_s(idx: np.ndarray, points: int, hours: int) -> np.ndarray:
+    """Seconds from the base time for point indices (evenly spread over `hours`)"""
+    return idx / (points - 1) * hours * 3600.0
+
+def _hour_of_day(base_time: datetime, offsets_s: np.ndarray) -> np.ndarray:
+    return (base_time.hour + offsets_s / 3600.0) % 24.0
+
+def generate_solar_data(rng: np.random.Generator, base_time: datetime, idx: np.ndarray,
+                        points: int, hours: int = 72) -> Dict[str, np.ndarray]:
+    """Generate synthetic solar forecast columns for point indices `idx`"""
+    hour_of_day = _hour_of_day(base_time, _offsets_s(idx, points, hours))
+
+    # Solar pattern: peak at noon, zero at night
+    solar_angle = (hour_of_day - 12) * 15  # degrees from solar noon
+    base_power = np.clip(np.cos(np.radians(solar_angle)), 0, None)
+
+    # Add some cloud variation and noise
+    cloud_factor = 0.7 + 0.3 * np.sin(idx * 0.01)
+    noise = rng.normal(0, 0.1, len(idx))
+    value = np.clip(base_power * cloud_factor + noise, 0, None)
+
+    # Scale to realistic kW values (0-1000 kW system)
+    value_kw = value * 800
 
-router = APIRouter(prefix="/demo", tags=["demo"])
-
-def generate_solar_data(points: int, hours: int = 72) -> list:
-    """Generate synthetic solar forecast data"""
-    data = []
-    base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
-
-    for i in range(points):
-        # Time progression over the specified hours
-        time_offset = (i / (points - 1)) * hours * 3600  # seconds
-        time = base_time + timedelta(seconds=time_offset)
-
-        # Solar pattern: peak at noon, zero at night
-        hour_of_day = time.hour + time.minute / 60
-        solar_angle = (hour_of_day - 12) * 15  # degrees from solar noon
-        base_power = max(0, math.cos(math.radians(solar_angle)))
-
-        # Add some cloud variation and noise
-        cloud_factor = 0.7 + 0.3 * math.sin(i * 0.01)  # Cloud patterns
-        noise = random.gauss(0, 0.1)  # Random noise
-        value = max(0, base_power * cloud_factor + noise)
-
-        # Scale to realistic kW values (0-1000 kW system)
-        value_kw = value * 800
-
-        data.append({
-            "time": time.isoformat(),
-            "value_kw": round(value_kw, 2),
-            "p5": round(value_kw * (0.8 + random.random() * 0.2), 2),
-            "p50": round(value_kw, 2),
-            "p95": round(value_kw * (1.0 + random.random() * 0.3), 2)
-        })
-
-    return data
-
-def generate_temp_data(points: int, hours: int = 24) -> list:
-    """Generate synthetic temperature time-series data"""
-    data = []
-    base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
-
-    for i in range(points):
-        time_offset = (i / (points - 1)) * hours * 3600
-        time = base_time + timedelta(seconds=time_offset)
-
-        hour_of_day = time.hour + time.minute / 60
-
-        # Temperature pattern: cooler at night, warmer during day
-        base_temp = 20 + 8 * math.sin(math.radians((hour_of_day - 6) * 15))  # Peak at 3 PM
-
-        # Add daily variation and noise
-        daily_variation = 2 * math.sin(i * 0.05)
-        noise = random.gauss(0, 0.5)
-        temp_c = base_temp + daily_variation + noise
-
-        data.append({
-            "time": time.isoformat(),
-            "temp_c": round(temp_c, 2)
-        })
-
-    return data
-
-def generate_ph_data(points: int, hours: int = 24) -> list:
-    """Generate synthetic pH time-series data"""
-    data = []
-    base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
-
-    for i in range(points):
-        time_offset = (i / (points - 1)) * hours * 3600
-        time = base_time + timedelta(seconds=time_offset)
-
-        # pH typically stable around 7.2 with small variations
-        base_ph = 7.2
-        variation = 0.1 * math.sin(i * 0.02)  # Slow pH drift
-        noise = random.gauss(0, 0.05)
-        ph = base_ph + variation + noise
-
-        # Occasional pH events (simulating adjustments)
-        if random.random() < 0.001:  # 0.1% chance of pH adjustment event
-            ph += random.choice([-0.3, 0.3])
-
-        data.append({
-            "time": time.isoformat(),
-            "ph": round(ph, 2)
-        })
-
-    return data
+    return {
+        "value_kw": np.round(value_kw, 2),
+        "p5": np.round(value_kw * (0.8 + rng.random(len(idx)) * 0.2), 2),
+        "p50": np.round(value_kw, 2),
+        "p95": np.round(value_kw * (1.0 + rng.random(len(idx)) * 0.3), 2),
+    }
+
+def generate_temp_data(rng: np.random.Generator, base_time: datetime, idx: np.ndarray,
+                       points: int, hours: int = 24) -> Dict[str, np.ndarray]:
+    """Generate synthetic temperature columns for point indices `idx`"""
+    hour_of_day = _hour_of_day(base_time, _offsets_s(idx, points, hours))
+
+    # Temperature pattern: cooler at night, warmer during day
+    base_temp = 20 + 8 * np.sin(np.radians((hour_of_day - 6) * 15))  # Peak at 3 PM
+
+    # Add daily variation and noise
+    daily_variation = 2 * np.sin(idx * 0.05)
+    noise = rng.normal(0, 0.5, len(idx))
+
+    return {"temp_c": np.round(base_temp + daily_variation + noise, 2)}
+
+def generate_ph_data(rng: np.random.Generator, base_time: datetime, idx: np.ndarray,
+                     points: int, hours: int = 24) -> Dict[str, np.ndarray]:
+    """Generate synthetic pH columns for point indices `idx`"""
+    # pH typically stable around 7.2 with small variations
+    variation = 0.1 * np.sin(idx * 0.02)  # Slow pH drift
+    noise = rng.normal(0, 0.05, len(idx))
+    ph = 7.2 + variation + noise
+
+    # Occasional pH events (simulating adjustments), 0.1% chance per point
+    events = rng.random(len(idx)) < 0.001
+    ph += np.where(events, rng.choice([-0.3, 0.3], len(idx)), 0.0)
+
+    return {"ph": np.round(ph, 2)}
+
+GENERATORS = {
+    "solar": generate_solar_data,
+    "temp": generate_temp_data,
+    "ph": generate_ph_data,
+}
+
+def generate_chunks(type: str, points: int, hours: int, seed: Optional[int]):
+    """Yield (epoch-ms times, {column: values}) chunk by chunk.
+
+    A given seed reproduces the same dataset, timestamps included, regardless
+    of output format; unseeded datasets start at the current hour.
+    """
+    rng = np.random.default_rng(seed)
+    if seed is not None:
+        base_time = SEEDED_BASE_TIME
+    else:
+        base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
+    base_ms = np.datetime64(base_time, "ms")
+    generator = GENERATORS[type]
+
+    for bounds in _chunk_bounds(points):
+        idx = np.arange(bounds.start, bounds.stop, dtype=np.float64)
+        offsets_ms = np.round(_offsets_s(idx, points, hours) * 1000).astype(np.int64)
+        times = base_ms + offsets_ms.astype("timedelta64[ms]")
+        yield times, generator(rng, base_time, idx, points, hours)
+
+def _float_list(values: np.ndarray) -> str:
+    """JSON array text for a rounded float column (one C-level format call)"""
+    return "[" + ",".join(["%.2f"] * len(values)) % tuple(values.tolist()) + "]"
+
+def _json_body(type: str, points: int, hours: int, seed: Optional[int]):
+    """Row-oriented JSON, same shape as the original /demo/big response"""
+    columns = COLUMNS[type]
+    row_format = '{"time": "%s", ' + ", ".join(f'"{c}": %.2f' for c in columns) + "}"
+    yield json.dumps({"type": type, "points": points, "hours": hours})[:-1] + ', "data": ['
+
+    first = True
+    for times, values in generate_chunks(type, points, hours, seed):
+        # Interleave columns row-major and format the whole chunk in one call
+        cells = [np.datetime_as_string(times, unit="ms").tolist()]
+        cells.extend(values[c].tolist() for c in columns)
+        flat = tuple(v for row in zip(*cells) for v in row)
+        chunk = ", ".join([row_format] * len(times)) % flat
+        yield chunk if first else ", " + chunk
+        first = False
+
+    yield "], " + json.dumps({"description": f"Synthetic {type} data for chart stress testing"})[1:]
+
+def _columnar_body(type: str, points: int, hours: int, seed: Optional[int]):
+    """NDJSON: a header line, then one line of column arrays per chunk"""
+    columns = COLUMNS[type]
+    yield json.dumps({"type": type, "points": points, "hours": hours,
+                      "columns": ["time"] + columns, "time_unit": "epoch_ms"}) + "\n"
+
+    for times, values in generate_chunks(type, points, hours, seed):
+        fields = [f'"time":{json.dumps(times.astype(np.int64).tolist(), separators=(",", ":"))}']
+        fields.extend(f'"{c}":{_float_list(values[c])}' for c in columns)
+        yield "{" + ",".join(fields) + "}\n"
+
+def _binary_body(type: str, points: int, hours: int, seed: Optional[int]):
+    """Binary frames: a JSON header line, then per chunk a little-endian
+    uint32 point count, int64 epoch-ms times and one float32 array per column.
+    """
+    columns = COLUMNS[type]
+    header = {"type": type, "points": points, "hours": hours, "columns": ["time"] + columns,
+              "dtypes": {"time": "<i8", **{c: "<f4" for c in columns}}, "time_unit": "epoch_ms"}
+    yield (json.dumps(header) + "\n").encode("utf-8")
+
+    for times, values in generate_chunks(type, points, hours, seed):
+        parts = [struct.pack("<I", len(times)), times.astype("<i8").tobytes()]
+        parts.extend(values[c].astype("<f4").tobytes() for c in columns)
+        yield b"".join(parts)
+
+BODIES = {
+    "json": _json_body,
+    "columnar": _columnar_body,
+    "binary": _binary_body,
+}
 
 @router.get("/big")
 async def get_big_dataset(
     points: int = Query(100000, description="Number of data points to generate (50k-200k recommended)"),
     type: str = Query("solar", description="Data type: solar, temp, ph"),
-    hours: int = Query(72, description="Time span in hours")
+    hours: int = Query(72, description="Time span in hours"),
+    format: str = Query("json", description="Output format: json (rows), columnar (NDJSON chunks) or binary"),
+    seed: Optional[int] = Query(None, description="RNG seed for reproducible datasets")
 ):
     """
     Generate large synthetic datasets for chart stress testing.
-    Returns 50k-200k data points for performance testing.
+    Returns 50k-200k data points for performance testing, generated with
+    NumPy and streamed in chunks so server memory stays flat.
     """
     if points < 1000 or points > 500000:
         return {
@@ -106,26 +188,20 @@ async def get_big_dataset(
             "points_requested": points
         }
 
-    if type not in ["solar", "temp", "ph"]:
+    if type not in GENERATORS:
         return {
             "error": "Type must be one of: solar, temp, ph",
             "type_requested": type
         }
 
-    # Generate the requested data type
-    if type == "solar":
-        data = generate_solar_data(points, hours)
-    elif type == "temp":
-        data = generate_temp_data(points, hours)
-    elif type == "ph":
-        data = generate_ph_data(points, hours)
-    else:
-        return {"error": "Invalid data type"}
+    if format not in BODIES:
+        return {
+            "error": "Format must be one of: json, columnar, binary",
+            "format_requested": format
+        }
 
-    return {
-        "type": type,
-        "points": len(data),
-        "hours": hours,
-        "data": data,
-        "description": f"Synthetic {type} data for chart stress testing"
-    }
\ No newline at end of file
+    return StreamingResponse(
+        BODIES[format](type, points, hours, seed),
+        media_type=MEDIA_TYPES[format],
+        headers={"X-Points": str(points)}
+    )
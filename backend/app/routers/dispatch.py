@@ -1,25 +1,28 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, HTTPException
 from datetime import datetime, timedelta, timezone
-from ..db.connection import get_pool
+from ..db import queries
 from ..models.schemas import DispatchPlanResponse, DispatchPlanPoint
+from ..sites import directory, DEFAULT_SITE_ID
+from ..timing import TimedRoute, phase
 
-router = APIRouter(prefix="/dispatch", tags=["dispatch"])
+router = APIRouter(prefix="/dispatch", tags=["dispatch"], route_class=TimedRoute)
 
 @router.post("/plan", response_model=DispatchPlanResponse)
-async def generate_dispatch_plan():
+async def generate_dispatch_plan(site_id: str = Query(DEFAULT_SITE_ID, description="Storage site to plan")):
     """Generate minute-level dispatch plan for next 24 hours"""
-    pool = await get_pool()
+    return await build_dispatch_plan(site_id)
+
+async def build_dispatch_plan(site_id: str = DEFAULT_SITE_ID) -> DispatchPlanResponse:
+    if await directory.site(site_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
     now = datetime.now(timezone.utc).replace(second=0, microsecond=0)
     end_time = now + timedelta(hours=24)
 
-    async with pool.acquire() as conn:
-        # Get existing dispatch plan
-        rows = await conn.fetch(
-            "SELECT time, charge_kw, discharge_kw, feasible FROM dispatch_plan WHERE time >= $1 AND time < $2 ORDER BY time",
-            now, end_time
-        )
+    # Get existing dispatch plan
+    rows = await queries.fetch("dispatch.plan", site_id, now, end_time)
 
-    plan = [DispatchPlanPoint(**dict(row)) for row in rows]
+    with phase("model"):
+        plan = [DispatchPlanPoint(**dict(row)) for row in rows]
 
     # Calculate totals
     total_charge_kwh = sum(p.charge_kw / 60.0 for p in plan)  # Convert kW to kWh
@@ -29,5 +32,6 @@ async def generate_dispatch_plan():
         plan=plan,
         total_charge_kwh=total_charge_kwh,
         total_discharge_kwh=total_discharge_kwh,
-        duration_hours=24
+        duration_hours=24,
+        site_id=site_id
     )
@@ -1,23 +1,23 @@
 from fastapi import APIRouter, Response
 from datetime import datetime, timedelta, timezone
-from typing import List
-from ..db.connection import get_pool
+from typing import List, Tuple
+from ..db.connection import acquire
+from ..db import queries
 from ..models.schemas import SolarForecastResponse, SolarForecastPoint, GreenWindowsResponse, GreenWindow
 from .. import cache
+from ..timing import TimedRoute, phase
 
-router = APIRouter(prefix="/forecast", tags=["forecast"])
+router = APIRouter(prefix="/forecast", tags=["forecast"], route_class=TimedRoute)
 
-@router.get("/solar", response_model=SolarForecastResponse)
-async def get_solar_forecast(response: Response):
-    """Get solar forecast with 5-15min nowcast and 24-72h horizon"""
-    # Check cache
-    cache_key = "forecast_solar"
-    cached = cache.get(cache_key)
+SOLAR_CACHE_KEY = "forecast_solar"
+GREEN_WINDOWS_CACHE_KEY = "forecast_green_windows"
+
+async def build_solar_forecast() -> Tuple[SolarForecastResponse, bool]:
+    """Solar forecast (cached) and whether it came from the cache"""
+    cached = cache.get(SOLAR_CACHE_KEY)
     if cached:
-        response.headers["X-Cache"] = "HIT"
-        return cached
+        return cached, True
 
-    pool = await get_pool()
     now = datetime.now(timezone.utc)
 
     # Nowcast: next 15 minutes
@@ -25,21 +25,16 @@ async def get_solar_forecast(response: Response):
     # Forecast: next 72 hours
     forecast_end = now + timedelta(hours=72)
 
-    async with pool.acquire() as conn:
+    async with acquire() as conn:
         # Nowcast
-        nowcast_rows = await conn.fetch(
-            "SELECT time, value_kw, p5, p50, p95 FROM forecast_solar WHERE time >= $1 AND time <= $2 ORDER BY time",
-            now, nowcast_end
-        )
+        nowcast_rows = await queries.fetch("forecast.solar_range", now, nowcast_end, conn=conn)
 
         # Full forecast
-        forecast_rows = await conn.fetch(
-            "SELECT time, value_kw, p5, p50, p95 FROM forecast_solar WHERE time >= $1 AND time <= $2 ORDER BY time",
-            now, forecast_end
-        )
+        forecast_rows = await queries.fetch("forecast.solar_range", now, forecast_end, conn=conn)
 
-    nowcast = [SolarForecastPoint(**dict(row)) for row in nowcast_rows]
-    forecast = [SolarForecastPoint(**dict(row)) for row in forecast_rows]
+    with phase("model"):
+        nowcast = [SolarForecastPoint(**dict(row)) for row in nowcast_rows]
+        forecast = [SolarForecastPoint(**dict(row)) for row in forecast_rows]
 
     result = SolarForecastResponse(
         nowcast=nowcast,
@@ -48,36 +43,22 @@ async def get_solar_forecast(response: Response):
     )
 
     # Cache the result
-    cache.set(cache_key, result)
-    response.headers["X-Cache"] = "MISS"
+    cache.set(SOLAR_CACHE_KEY, result)
+    return result, False
 
-    return result
-
-@router.get("/green-windows", response_model=GreenWindowsResponse)
-async def get_green_windows(response: Response):
-    """Get low-carbon energy windows for next 72 hours"""
-    # Check cache
-    cache_key = "forecast_green_windows"
-    cached = cache.get(cache_key)
+async def build_green_windows() -> Tuple[GreenWindowsResponse, bool]:
+    """Green windows for the next 72 hours (cached) and whether it came from the cache"""
+    cached = cache.get(GREEN_WINDOWS_CACHE_KEY)
     if cached:
-        response.headers["X-Cache"] = "HIT"
-        return cached
+        return cached, True
 
-    pool = await get_pool()
     now = datetime.now(timezone.utc)
     end_time = now + timedelta(hours=72)
 
-    async with pool.acquire() as conn:
-        rows = await conn.fetch(
-            """SELECT id, start_time, end_time, carbon_gco2_kwh,
-               EXTRACT(EPOCH FROM (end_time - start_time)) / 3600.0 as duration_hours
-               FROM forecast_green_windows
-               WHERE start_time >= $1 AND end_time <= $2
-               ORDER BY carbon_gco2_kwh ASC""",
-            now, end_time
-        )
+    rows = await queries.fetch("forecast.green_windows", now, end_time)
 
-    windows = [GreenWindow(**dict(row)) for row in rows]
+    with phase("model"):
+        windows = [GreenWindow(**dict(row)) for row in rows]
 
     result = GreenWindowsResponse(
         windows=windows,
@@ -85,7 +66,19 @@ async def get_green_windows(response: Response):
     )
 
     # Cache the result
-    cache.set(cache_key, result)
-    response.headers["X-Cache"] = "MISS"
+    cache.set(GREEN_WINDOWS_CACHE_KEY, result)
+    return result, False
 
+@router.get("/solar", response_model=SolarForecastResponse)
+async def get_solar_forecast(response: Response):
+    """Get solar forecast with 5-15min nowcast and 24-72h horizon"""
+    result, hit = await build_solar_forecast()
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
+    return result
+
+@router.get("/green-windows", response_model=GreenWindowsResponse)
+async def get_green_windows(response: Response):
+    """Get low-carbon energy windows for next 72 hours"""
+    result, hit = await build_green_windows()
+    response.headers["X-Cache"] = "HIT" if hit else "MISS"
     return result
@@ -0,0 +1,81 @@
+import asyncio
+import json
+import time
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from ..channels import hub, resolve, Client, TOPIC_KINDS, DEFAULT_MAX_HZ, MAX_HZ
+from ..timing import TimedRoute
+
+router = APIRouter(prefix="/live", tags=["live"], route_class=TimedRoute)
+
+FORMATS = ("json", "binary")
+
+async def _send_loop(websocket: WebSocket, client: Client):
+    """Single writer per socket: control replies first, then due topic frames"""
+    while True:
+        client.wake.clear()
+        frames, wait_s = client.collect(hub.latest, time.monotonic())
+        for frame in frames:
+            if isinstance(frame, bytes):
+                await websocket.send_bytes(frame)
+            else:
+                await websocket.send_text(frame)
+        try:
+            await asyncio.wait_for(client.wake.wait(), timeout=wait_s)
+        except asyncio.TimeoutError:
+            pass
+
+async def _handle(client: Client, message: dict):
+    op = message.get("op")
+    topic = str(message.get("topic", ""))
+    if op == "subscribe":
+        try:
+            max_hz = float(message.get("max_hz", DEFAULT_MAX_HZ))
+            if not 0 < max_hz <= MAX_HZ:
+                raise ValueError(f"max_hz must be in (0, {MAX_HZ}]")
+            kind, key = await resolve(topic)
+            sub = client.subscribe(topic, kind, key, max_hz)
+        except (TypeError, ValueError) as e:
+            client.reply({"op": "error", "topic": topic, "detail": str(e)})
+            return
+        client.reply({
+            "op": "subscribed", "topic": topic, "id": sub.topic_id,
+            "fields": list(TOPIC_KINDS[kind].fields), "max_hz": max_hz
+        })
+    elif op == "unsubscribe":
+        client.unsubscribe(topic)
+        client.reply({"op": "unsubscribed", "topic": topic})
+    else:
+        client.reply({"op": "error", "detail": "op must be subscribe or unsubscribe"})
+
+@router.websocket("/ws")
+async def live_socket(websocket: WebSocket, format: str = Query("json", description="json or binary frames")):
+    """One socket for every live topic (algae:<reactor>, salt:<site>, dispatch:<site>, ledger, alarms:<reactor>).
+
+    Client messages: {"op": "subscribe", "topic": ..., "max_hz": ...} and
+    {"op": "unsubscribe", "topic": ...}. Updates are throttled per topic to
+    max_hz and carry only changed fields.
+    """
+    if format not in FORMATS:
+        await websocket.close(code=1008, reason=f"format must be one of: {', '.join(FORMATS)}")
+        return
+    await websocket.accept()
+
+    client = hub.connect(binary=format == "binary")
+    sender = asyncio.create_task(_send_loop(websocket, client))
+    try:
+        while True:
+            text = await websocket.receive_text()
+            try:
+                message = json.loads(text)
+            except ValueError:
+                message = None
+            if not isinstance(message, dict):
+                client.reply({"op": "error", "detail": "messages must be JSON objects"})
+                continue
+            await _handle(client, message)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        hub.disconnect(client)
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
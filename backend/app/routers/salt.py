@@ -1,94 +1,109 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Query, HTTPException, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
 from datetime import datetime, timedelta, timezone
-from ..db.connection import get_pool
+from typing import Optional
+from ..db.connection import acquire
+from ..db import queries
+from ..db.downsample import read_history, read_since, RAW_RESOLUTION_S
 from ..models.schemas import (
     SaltStateResponse, SaltStatePoint,
     SaltSimulateRequest, SaltSimulateResponse
 )
+from ..models.series import Series, SeriesResponse, LAYOUTS
+from ..sites import directory, DEFAULT_SITE_ID
+from .. import simulation
+from ..timing import TimedRoute, phase
 
-router = APIRouter(prefix="/salt", tags=["salt"])
+router = APIRouter(prefix="/salt", tags=["salt"], route_class=TimedRoute)
 
-@router.get("/state", response_model=SaltStateResponse)
-async def get_salt_state():
-    """Get current salt storage state and last 24h history"""
-    pool = await get_pool()
-    now = datetime.now(timezone.utc)
-    history_start = now - timedelta(hours=24)
-
-    async with pool.acquire() as conn:
-        # Current state (most recent)
-        current_row = await conn.fetchrow(
-            "SELECT time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw FROM salt_state WHERE time <= $1 ORDER BY time DESC LIMIT 1",
-            now
-        )
-
-        # Last 24h history
-        history_rows = await conn.fetch(
-            "SELECT time, soc_mwh, temp_hot_c, temp_cold_c, heat_loss_kw FROM salt_state WHERE time >= $1 AND time <= $2 ORDER BY time",
-            history_start, now
-        )
+STATE_COLUMNS = ("soc_mwh", "temp_hot_c", "temp_cold_c", "heat_loss_kw")
 
-    current = SaltStatePoint(**dict(current_row))
-    history = [SaltStatePoint(**dict(row)) for row in history_rows]
-
-    return SaltStateResponse(
-        current=current,
-        history_24h=history,
-        capacity_mwh=10.0,
-        soc_percent=(current.soc_mwh / 10.0) * 100
-    )
+@router.get("/state", response_model=SaltStateResponse)
+async def get_salt_state(
+    hours: int = Query(24, ge=1, description="Hours of history to include"),
+    resolution: Optional[int] = Query(None, ge=60, description="Coarsest acceptable spacing in seconds"),
+    max_points: Optional[int] = Query(None, ge=1, description="Pick a resolution yielding at most this many points"),
+    layout: str = Query("records", description="records (list of points) or columns ({time: [epoch ms], soc_mwh: [...], ...})"),
+    site_id: str = Query(DEFAULT_SITE_ID, description="Storage site to read"),
+    since: Optional[datetime] = Query(None, description="Cursor from a previous response; only newer points are returned")
+):
+    """Get current salt storage state and recent history (24h by default)"""
+    if layout not in LAYOUTS:
+        raise HTTPException(status_code=400, detail=f"layout must be one of: {', '.join(LAYOUTS)}")
+    if since is not None and (resolution is not None or max_points is not None):
+        raise HTTPException(status_code=400, detail="since returns raw points; drop resolution and max_points")
+    return await build_salt_state(site_id, hours, resolution, max_points, layout, since)
 
-@router.post("/simulate", response_model=SaltSimulateResponse)
-async def simulate_salt_storage(request: SaltSimulateRequest):
-    """Simulate salt storage with given charge/discharge schedule"""
-    soc = request.initial_soc_mwh
-    capacity = 10.0  # MWh
-    results = []
-    total_heat_loss = 0.0
-    total_charge = 0.0
-    total_discharge = 0.0
+async def build_salt_state(site_id: str = DEFAULT_SITE_ID, hours: int = 24,
+                           resolution: Optional[int] = None, max_points: Optional[int] = None,
+                           layout: str = "records", since: Optional[datetime] = None) -> SeriesResponse:
+    """Current state plus history of one site, rendered as a SeriesResponse.
 
-    for point in request.schedule:
-        # Convert kW to MWh per minute
-        charge_mwh = (point.charge_kw / 1000.0) / 60.0
-        discharge_mwh = (point.discharge_kw / 1000.0) / 60.0
+    With `since`, history holds only the raw points newer than that cursor
+    (clamped to the window).
+    """
+    site = await directory.site(site_id)
+    if site is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+    capacity = site["capacity_mwh"]
+    now = datetime.now(timezone.utc)
+    history_start = now - timedelta(hours=hours)
 
-        # Update SOC
-        soc += charge_mwh - discharge_mwh
-        total_charge += charge_mwh
-        total_discharge += discharge_mwh
+    async with acquire() as conn:
+        # Current state (most recent)
+        current_row = await queries.fetchrow("salt.latest", site_id, now, conn=conn)
+        if current_row is None:
+            # Registered via POST /sites but not reporting yet
+            raise HTTPException(status_code=404, detail=f"No salt_state readings for site: {site_id}")
 
-        # Check bounds
-        if soc < 0 or soc > capacity:
-            return SaltSimulateResponse(
-                feasible=False,
-                schedule=[],
-                final_soc_mwh=soc,
-                total_heat_loss_kwh=0,
-                round_trip_efficiency=0
+        if since is not None:
+            if since.tzinfo is None:
+                since = since.replace(tzinfo=timezone.utc)
+            since = max(since, history_start)
+            history_rows = await read_since("salt_state", (site_id,), since, now, conn=conn)
+            resolution_s = RAW_RESOLUTION_S
+        else:
+            # History, routed to the cheapest adequate tier
+            history_rows, resolution_s = await read_history(
+                "salt_state", (site_id,), history_start, now, resolution, max_points, conn=conn
             )
 
-        # Calculate temps and heat loss
-        temp_hot = 565 + (soc / capacity) * 20
-        temp_cold = 290 + (soc / capacity) * 5
-        heat_loss_kw = 10 + (soc / capacity) * 5
-        total_heat_loss += heat_loss_kw / 60.0  # kWh
+    with phase("model"):
+        current = SaltStatePoint(**dict(current_row))
+        history = Series.from_records(history_rows, STATE_COLUMNS)
 
-        results.append(SaltStatePoint(
-            time=point.time,
-            soc_mwh=soc,
-            temp_hot_c=temp_hot,
-            temp_cold_c=temp_cold,
-            heat_loss_kw=heat_loss_kw
-        ))
+    with phase("serialize"):
+        return SeriesResponse({
+            "current": current,
+            "history_24h": history,
+            "capacity_mwh": capacity,
+            "soc_percent": (current.soc_mwh / capacity) * 100,
+            "resolution_s": resolution_s,
+            "site_id": site_id,
+            # Binned tails are still filling, so only raw reads can be resumed
+            "cursor": history.cursor(since) if resolution_s == RAW_RESOLUTION_S else None
+        }, layout=layout)
 
-    # Round-trip efficiency
-    efficiency = (total_discharge / total_charge * 100) if total_charge > 0 else 0
+@router.post(
+    "/simulate",
+    response_model=SaltSimulateResponse,
+    # The body is read raw so repeated schedules skip validation; document it by hand
+    openapi_extra={"requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": SaltSimulateRequest.model_json_schema()}}
+    }}
+)
+async def simulate_salt_storage(request: Request):
+    """Simulate salt storage with given charge/discharge schedule
 
-    return SaltSimulateResponse(
-        feasible=True,
-        schedule=results,
-        final_soc_mwh=soc,
-        total_heat_loss_kwh=total_heat_loss,
-        round_trip_efficiency=efficiency
-    )
+    Results are cached by schedule content (X-Cache: HIT); a schedule that
+    shares a prefix with a cached one resumes from it (X-Cache: PREFIX).
+    """
+    body = await request.body()
+    with phase("simulate"):
+        try:
+            content, status = simulation.simulate(body)
+        except ValidationError as e:
+            raise RequestValidationError(e.errors())
+    return Response(content, media_type="application/json", headers={"X-Cache": status})
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, HTTPException
+from ..db import queries
+from ..db.partitions import SITE_SHARDS
+from ..models.schemas import SiteCreate, ReactorCreate, FleetSummaryResponse
+from ..sites import directory, fleet_summary
+from ..timing import TimedRoute
+
+router = APIRouter(prefix="/sites", tags=["sites"], route_class=TimedRoute)
+
+@router.get("")
+async def list_sites():
+    """Registered sites with their reactor counts"""
+    await directory.refresh(force=True)
+    return {
+        "sites": list(directory.sites.values()),
+        "count": len(directory.sites),
+        "shards": SITE_SHARDS
+    }
+
+@router.post("")
+async def register_site(site: SiteCreate):
+    """Create or rename a site"""
+    await queries.execute("sites.add", site.site_id, site.name, site.capacity_mwh)
+    directory.invalidate()
+    return {"status": "success", "site_id": site.site_id}
+
+@router.get("/fleet", response_model=FleetSummaryResponse)
+async def get_fleet_summary():
+    """Latest readings aggregated per site (sites queried concurrently) and fleet totals"""
+    return await fleet_summary()
+
+@router.get("/{site_id}/reactors")
+async def list_reactors(site_id: str):
+    """Reactors registered at a site"""
+    if await directory.site(site_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+    reactor_ids = await directory.reactors_of(site_id)
+    return {
+        "site_id": site_id,
+        "reactors": [directory.reactors[r] for r in sorted(reactor_ids)],
+        "count": len(reactor_ids)
+    }
+
+@router.post("/{site_id}/reactors")
+async def register_reactor(site_id: str, reactor: ReactorCreate):
+    """Register (or move) a reactor at a site"""
+    if await directory.site(site_id) is None:
+        raise HTTPException(status_code=404, detail=f"Unknown site: {site_id}")
+    await queries.execute("reactors.add", reactor.reactor_id, site_id, reactor.name)
+    directory.invalidate()
+    return {"status": "success", "site_id": site_id, "reactor_id": reactor.reactor_id}
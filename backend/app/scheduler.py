@@ -0,0 +1,176 @@
+"""Periodic job scheduler with Postgres advisory-lock leader election
+
+Every API worker runs a Scheduler, but only the worker holding the
+scheduler's session-level advisory lock runs `leader_only` jobs. The lock
+lives on a dedicated connection outside the pool: if the leader process
+dies its connection closes, the lock is released and another worker takes
+over on its next election attempt.
+"""
+import asyncio
+import hashlib
+import random
+import time
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional
+import asyncpg
+from .db.connection import get_dsn
+from . import metrics
+
+job_seconds = metrics.histogram(
+    "job_duration_seconds", "Background job run duration", labelnames=("job",),
+    buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+)
+job_runs = metrics.counter("job_runs_total", "Background job runs by outcome", labelnames=("job", "status"))
+job_skipped = metrics.counter("job_skipped_total", "Runs skipped because this worker is not leader", labelnames=("job",))
+
+def advisory_key(name: str) -> int:
+    """Stable signed 64-bit advisory lock key for a name"""
+    digest = hashlib.blake2b(name.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big", signed=True)
+
+class Job:
+    """A named periodic coroutine and its run metrics"""
+
+    def __init__(self, name: str, func: Callable[[], Awaitable[None]], interval_s: float,
+                 jitter_s: float = 0.0, leader_only: bool = True):
+        self.name = name
+        self.func = func
+        self.interval_s = interval_s
+        self.jitter_s = jitter_s
+        self.leader_only = leader_only
+
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_run_at: Optional[datetime] = None
+        self.last_duration_s: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.last_error: Optional[str] = None
+        self.last_error_at: Optional[datetime] = None
+
+    def next_delay(self) -> float:
+        return self.interval_s + random.uniform(0, self.jitter_s)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "interval_s": self.interval_s,
+            "leader_only": self.leader_only,
+            "running": self.running,
+            "runs": self.runs,
+            "failures": self.failures,
+            "skipped": self.skipped,
+            "last_run_at": self.last_run_at.isoformat() if self.last_run_at else None,
+            "last_duration_s": self.last_duration_s,
+            "last_status": self.last_status,
+            "last_error": self.last_error,
+            "last_error_at": self.last_error_at.isoformat() if self.last_error_at else None,
+        }
+
+class Scheduler:
+    """Runs registered jobs on their own loops so a slow job never overlaps itself"""
+
+    def __init__(self, lock_name: str = "carbonflux.scheduler"):
+        self.lock_key = advisory_key(lock_name)
+        self.jobs: Dict[str, Job] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._conn: Optional[asyncpg.Connection] = None
+        self._is_leader = False
+        self._elect_lock = asyncio.Lock()
+
+    @property
+    def is_leader(self) -> bool:
+        return self._is_leader and self._conn is not None and not self._conn.is_closed()
+
+    def add(self, name: str, func: Callable[[], Awaitable[None]], interval_s: float,
+            jitter_s: float = 0.0, leader_only: bool = True) -> Job:
+        """Register a periodic job (before start())"""
+        if name in self.jobs:
+            raise ValueError(f"Job already registered: {name}")
+        job = Job(name, func, interval_s, jitter_s, leader_only)
+        self.jobs[name] = job
+        return job
+
+    async def start(self):
+        # Elect now rather than after the first job interval, so leader-only
+        # work (e.g. persisting alarms) is not skipped for a whole interval
+        await self.elect()
+        for job in self.jobs.values():
+            self._tasks.append(asyncio.create_task(self._run_loop(job), name=f"job:{job.name}"))
+        print(f"✓ Scheduler started ({len(self.jobs)} jobs)")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        if self._conn is not None and not self._conn.is_closed():
+            # Closing the session releases the advisory lock for the next leader
+            await self._conn.close()
+        self._conn = None
+        self._is_leader = False
+
+    async def elect(self) -> bool:
+        """Try to become (or confirm we still are) the scheduler leader"""
+        async with self._elect_lock:
+            if self.is_leader:
+                return True
+
+            try:
+                if self._conn is None or self._conn.is_closed():
+                    self._is_leader = False
+                    self._conn = await asyncpg.connect(get_dsn())
+                self._is_leader = await self._conn.fetchval(
+                    "SELECT pg_try_advisory_lock($1)", self.lock_key
+                )
+            except (OSError, asyncpg.PostgresError) as e:
+                print(f"Scheduler election failed: {e}")
+                self._is_leader = False
+
+            if self._is_leader:
+                print("✓ Scheduler leadership acquired")
+            return self._is_leader
+
+    async def _run_loop(self, job: Job):
+        while True:
+            await asyncio.sleep(job.next_delay())
+
+            if job.leader_only and not await self.elect():
+                job.skipped += 1
+                job_skipped.inc(job=job.name)
+                continue
+
+            await self.run_once(job)
+
+    async def run_once(self, job: Job):
+        """Run a job inline and record its metrics"""
+        job.running = True
+        job.last_run_at = datetime.now(timezone.utc)
+        started = time.perf_counter()
+        try:
+            await job.func()
+            job.last_status = "ok"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_status = "error"
+            job.last_error = f"{type(e).__name__}: {e}"
+            job.last_error_at = job.last_run_at
+            print(f"Error in job {job.name}: {e}")
+        finally:
+            job.running = False
+            job.runs += 1
+            job.last_duration_s = time.perf_counter() - started
+            job_seconds.observe(job.last_duration_s, job=job.name)
+            job_runs.inc(job=job.name, status=job.last_status or "cancelled")
+
+    def snapshot(self) -> dict:
+        return {
+            "leader": self.is_leader,
+            "jobs": [job.to_dict() for job in self.jobs.values()],
+        }
+
+scheduler = Scheduler()
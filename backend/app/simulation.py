@@ -0,0 +1,242 @@
+"""Molten-salt storage simulation with a content-addressed result cache
+
+Results are keyed by a hash of the canonical request (point times as epoch
+seconds plus UTC offset, charge/discharge as float64, initial SOC) and of
+the model parameters, and stored as the encoded `SaltSimulateResponse`
+bytes. A repeated request body is recognised from its raw bytes before it
+is parsed at all.
+
+The schedule is simulated in chunks of CHECKPOINT_POINTS. After each full
+chunk the running state (SOC and totals) and the encoded points of that
+chunk are cached under a hash chained over every chunk so far, so a
+schedule sharing a prefix with an earlier one resumes from the deepest
+cached checkpoint and reuses its encoded points.
+
+Results, raw-body aliases and checkpoints share one LRU bounded by
+SIM_CACHE_MAX_BYTES.
+"""
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Any, List, Optional, Tuple
+import numpy as np
+from pydantic import TypeAdapter
+from .models.schemas import SaltSimulateRequest, SaltSimulateResponse, SaltStatePoint
+from . import metrics
+
+CAPACITY_MWH = 10.0
+TEMP_HOT_BASE_C = 565.0
+TEMP_HOT_SPAN_C = 20.0
+TEMP_COLD_BASE_C = 290.0
+TEMP_COLD_SPAN_C = 5.0
+HEAT_LOSS_BASE_KW = 10.0
+HEAT_LOSS_SPAN_KW = 5.0
+
+# Part of every key, so changing a parameter never serves stale results
+MODEL_DIGEST = hashlib.blake2b(json.dumps({
+    "capacity_mwh": CAPACITY_MWH,
+    "temp_hot": (TEMP_HOT_BASE_C, TEMP_HOT_SPAN_C),
+    "temp_cold": (TEMP_COLD_BASE_C, TEMP_COLD_SPAN_C),
+    "heat_loss": (HEAT_LOSS_BASE_KW, HEAT_LOSS_SPAN_KW),
+}, sort_keys=True).encode("utf-8"), digest_size=16).digest()
+
+CHECKPOINT_POINTS = 60
+SIM_CACHE_MAX_BYTES = int(os.getenv("SIM_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Charged per entry on top of its payload (key, bookkeeping)
+ENTRY_OVERHEAD_BYTES = 128
+
+# epoch seconds, UTC offset seconds (NaN for naive times), charge kW, discharge kW
+POINT_DTYPE = np.dtype([("t", "<f8"), ("offset", "<f8"), ("charge", "<f8"), ("discharge", "<f8")])
+
+_points_adapter = TypeAdapter(List[SaltStatePoint])
+
+lookups = metrics.counter("sim_cache_lookups_total", "Simulation cache lookups by result",
+                          labelnames=("result",))
+points_simulated = metrics.counter("sim_points_simulated_total", "Schedule points simulated (not served from cache)")
+
+class ByteLRU:
+    """LRU of bytes-accounted entries, evicting oldest first past max_bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: "OrderedDict[bytes, Tuple[Any, int]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: bytes) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def put(self, key: bytes, value: Any, nbytes: int):
+        nbytes += ENTRY_OVERHEAD_BYTES
+        if nbytes > self.max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[1]
+        self._entries[key] = (value, nbytes)
+        self.nbytes += nbytes
+        while self.nbytes > self.max_bytes:
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self.nbytes -= evicted
+
+    def clear(self):
+        self._entries.clear()
+        self.nbytes = 0
+
+class State:
+    """Running simulation state at a chunk boundary"""
+    __slots__ = ("soc", "total_charge", "total_discharge", "total_heat_loss")
+
+    def __init__(self, soc: float, total_charge: float = 0.0, total_discharge: float = 0.0,
+                 total_heat_loss: float = 0.0):
+        self.soc = soc
+        self.total_charge = total_charge
+        self.total_discharge = total_discharge
+        self.total_heat_loss = total_heat_loss
+
+    def copy(self) -> "State":
+        return State(self.soc, self.total_charge, self.total_discharge, self.total_heat_loss)
+
+cache = ByteLRU(SIM_CACHE_MAX_BYTES)
+
+metrics.gauge("sim_cache_bytes", "Bytes held by the simulation cache", func=lambda: cache.nbytes)
+metrics.gauge("sim_cache_entries", "Results, aliases and checkpoints in the simulation cache",
+              func=lambda: len(cache))
+
+def _digest(*parts: bytes) -> bytes:
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        h.update(part)
+    return h.digest()
+
+def _canonical(request: SaltSimulateRequest) -> np.ndarray:
+    points = np.empty(len(request.schedule), dtype=POINT_DTYPE)
+    for i, p in enumerate(request.schedule):
+        offset = p.time.utcoffset()
+        points[i] = (p.time.timestamp(), offset.total_seconds() if offset is not None else np.nan,
+                     p.charge_kw, p.discharge_kw)
+    # -0.0 and 0.0 simulate identically; key them identically
+    points["charge"] += 0.0
+    points["discharge"] += 0.0
+    return points
+
+def _run_chunk(state: State, charge_kw: np.ndarray, discharge_kw: np.ndarray):
+    """Advance `state` over one chunk; returns (soc per point, index of the first infeasible point or None)
+
+    Accumulates sequentially like the per-point loop, so a resumed run
+    produces the same floats as one started from the beginning.
+    """
+    charge = (charge_kw / 1000.0) / 60.0
+    discharge = (discharge_kw / 1000.0) / 60.0
+    soc = np.cumsum(np.concatenate(([state.soc], charge - discharge)))[1:]
+
+    bad = (soc < 0) | (soc > CAPACITY_MWH)
+    if bad.any():
+        return soc, int(np.argmax(bad))
+
+    heat_loss_kw = HEAT_LOSS_BASE_KW + (soc / CAPACITY_MWH) * HEAT_LOSS_SPAN_KW
+    state.soc = float(soc[-1])
+    state.total_charge = float(np.cumsum(np.concatenate(([state.total_charge], charge)))[-1])
+    state.total_discharge = float(np.cumsum(np.concatenate(([state.total_discharge], discharge)))[-1])
+    state.total_heat_loss = float(np.cumsum(np.concatenate(([state.total_heat_loss], heat_loss_kw / 60.0)))[-1])
+    return soc, None
+
+def _encode_points(request: SaltSimulateRequest, start: int, soc: np.ndarray) -> bytes:
+    """Encoded SaltStatePoints of schedule[start:start + len(soc)], without brackets"""
+    ratio = soc / CAPACITY_MWH
+    rows = zip(
+        soc.tolist(),
+        (TEMP_HOT_BASE_C + ratio * TEMP_HOT_SPAN_C).tolist(),
+        (TEMP_COLD_BASE_C + ratio * TEMP_COLD_SPAN_C).tolist(),
+        (HEAT_LOSS_BASE_KW + ratio * HEAT_LOSS_SPAN_KW).tolist(),
+    )
+    points = [
+        SaltStatePoint.model_construct(time=p.time, soc_mwh=s, temp_hot_c=hot, temp_cold_c=cold, heat_loss_kw=loss)
+        for p, (s, hot, cold, loss) in zip(request.schedule[start:start + len(soc)], rows)
+    ]
+    return _points_adapter.dump_json(points)[1:-1]
+
+def _infeasible(soc: float) -> bytes:
+    return SaltSimulateResponse(
+        feasible=False, schedule=[], final_soc_mwh=soc, total_heat_loss_kwh=0, round_trip_efficiency=0
+    ).model_dump_json().encode("utf-8")
+
+def _simulate(request: SaltSimulateRequest, points: np.ndarray, initial_soc: float) -> Tuple[bytes, bool]:
+    """Encoded response and whether a cached prefix was resumed"""
+    n = len(points)
+    chain = _digest(MODEL_DIGEST, np.float64(initial_soc).tobytes())
+    state = State(initial_soc)
+    fragments: List[bytes] = []
+    done = 0
+
+    # Deepest contiguous run of cached checkpoints
+    while done + CHECKPOINT_POINTS <= n:
+        link = _digest(chain, points[done:done + CHECKPOINT_POINTS].tobytes())
+        checkpoint = cache.get(b"c" + link)
+        if checkpoint is None:
+            break
+        cached_state, fragment = checkpoint
+        state = cached_state.copy()
+        fragments.append(fragment)
+        chain = link
+        done += CHECKPOINT_POINTS
+    resumed = done > 0
+
+    while done < n:
+        end = min(done + CHECKPOINT_POINTS, n)
+        chunk = points[done:end]
+        points_simulated.inc(end - done)
+        soc, infeasible_at = _run_chunk(state, chunk["charge"], chunk["discharge"])
+        if infeasible_at is not None:
+            return _infeasible(float(soc[infeasible_at])), resumed
+        fragment = _encode_points(request, done, soc)
+        fragments.append(fragment)
+        if end - done == CHECKPOINT_POINTS:
+            chain = _digest(chain, chunk.tobytes())
+            cache.put(b"c" + chain, (state.copy(), fragment), len(fragment))
+        done = end
+
+    efficiency = (state.total_discharge / state.total_charge * 100) if state.total_charge > 0 else 0
+    summary = SaltSimulateResponse.model_construct(
+        feasible=True, schedule=[], final_soc_mwh=state.soc,
+        total_heat_loss_kwh=state.total_heat_loss, round_trip_efficiency=float(efficiency)
+    ).model_dump_json().encode("utf-8")
+    # Splice the already-encoded points into the empty schedule
+    body = b"[" + b",".join(f for f in fragments if f) + b"]"
+    return summary.replace(b'"schedule":[]', b'"schedule":' + body, 1), resumed
+
+def simulate(body: bytes) -> Tuple[bytes, str]:
+    """Encoded SaltSimulateResponse for a raw request body, and HIT / PREFIX / MISS
+
+    Raises pydantic.ValidationError for an invalid body.
+    """
+    alias = b"a" + _digest(body)
+    key = cache.get(alias)
+    if key is not None:
+        result = cache.get(key)
+        if result is not None:
+            lookups.inc(result="hit")
+            return result, "HIT"
+
+    request = SaltSimulateRequest.model_validate_json(body)
+    initial_soc = request.initial_soc_mwh if request.initial_soc_mwh is not None else 5.0
+    points = _canonical(request)
+    key = b"r" + _digest(MODEL_DIGEST, np.float64(initial_soc).tobytes(), points.tobytes())
+
+    result = cache.get(key)
+    if result is not None:
+        status = "HIT"
+    else:
+        result, resumed = _simulate(request, points, initial_soc)
+        status = "PREFIX" if resumed else "MISS"
+        cache.put(key, result, len(result))
+    cache.put(alias, key, len(key))
+    lookups.inc(result=status.lower())
+    return result, status
@@ -0,0 +1,97 @@
+"""Site and reactor directory plus fleet-wide aggregates
+
+The `sites` / `reactors` tables are small and change rarely, so each worker
+keeps them in memory and reloads at most every DIRECTORY_TTL_S seconds (or
+immediately when an unknown id is looked up). Routers default to
+DEFAULT_SITE_ID / DEFAULT_REACTOR_ID so single-plant clients keep working.
+"""
+import asyncio
+import os
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from .db.connection import acquire, POOL_MAX_SIZE
+from .db import queries
+
+DEFAULT_SITE_ID = os.getenv("DEFAULT_SITE_ID", "site-1")
+DEFAULT_REACTOR_ID = os.getenv("DEFAULT_REACTOR_ID", "pbr-01")
+
+DIRECTORY_TTL_S = 30.0
+
+# Per-site aggregate queries in flight at once (each holds a pool connection)
+FLEET_CONCURRENCY = max(1, POOL_MAX_SIZE // 2)
+
+class SiteDirectory:
+    def __init__(self):
+        self.sites: Dict[str, dict] = {}
+        self.reactors: Dict[str, dict] = {}
+        self.loaded_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def refresh(self, force: bool = False):
+        async with self._lock:
+            if not force and time.monotonic() - self.loaded_at < DIRECTORY_TTL_S:
+                return
+            async with acquire() as conn:
+                site_rows = await queries.fetch("sites.list", conn=conn)
+                reactor_rows = await queries.fetch("reactors.list", conn=conn)
+            self.sites = {r["site_id"]: dict(r) for r in site_rows}
+            self.reactors = {r["reactor_id"]: dict(r) for r in reactor_rows}
+            self.loaded_at = time.monotonic()
+
+    async def site(self, site_id: str) -> Optional[dict]:
+        await self.refresh()
+        if site_id not in self.sites:
+            await self.refresh(force=True)
+        return self.sites.get(site_id)
+
+    async def reactor(self, reactor_id: str) -> Optional[dict]:
+        await self.refresh()
+        if reactor_id not in self.reactors:
+            await self.refresh(force=True)
+        return self.reactors.get(reactor_id)
+
+    async def reactors_of(self, site_id: str) -> List[str]:
+        await self.refresh()
+        return [rid for rid, r in self.reactors.items() if r["site_id"] == site_id]
+
+    def invalidate(self):
+        self.loaded_at = 0.0
+
+directory = SiteDirectory()
+
+async def site_summary(site_id: str, now: datetime) -> dict:
+    """Latest reading of every reactor at a site, aggregated, plus storage state"""
+    async with acquire() as conn:
+        reactor_rows = await queries.fetch("algae.site_latest", site_id, now, conn=conn)
+        salt = await queries.fetchrow("salt.latest", site_id, now, conn=conn)
+
+    n = len(reactor_rows)
+    return {
+        "site_id": site_id,
+        "reactors_reporting": n,
+        "co2_uptake_kg_h": sum(r["co2_uptake_kg_h"] for r in reactor_rows),
+        "avg_ph": sum(r["ph"] for r in reactor_rows) / n if n else None,
+        "avg_biomass_g_l": sum(r["biomass_g_l"] for r in reactor_rows) / n if n else None,
+        "last_reading": max((r["time"] for r in reactor_rows), default=None),
+        "soc_mwh": salt["soc_mwh"] if salt else None,
+    }
+
+async def fleet_summary(now: Optional[datetime] = None) -> dict:
+    """Per-site summaries computed concurrently, plus fleet totals"""
+    now = now or datetime.now(timezone.utc)
+    await directory.refresh()
+    semaphore = asyncio.Semaphore(FLEET_CONCURRENCY)
+
+    async def bounded(site_id: str) -> dict:
+        async with semaphore:
+            return await site_summary(site_id, now)
+
+    sites = await asyncio.gather(*(bounded(site_id) for site_id in directory.sites))
+    return {
+        "generated_at": now,
+        "sites": sites,
+        "reactors_reporting": sum(s["reactors_reporting"] for s in sites),
+        "co2_uptake_kg_h": sum(s["co2_uptake_kg_h"] for s in sites),
+        "soc_mwh": sum(s["soc_mwh"] or 0.0 for s in sites),
+    }
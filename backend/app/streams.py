@@ -0,0 +1,130 @@
+"""Shared live-telemetry poller for SSE subscribers
+
+Instead of every SSE connection polling the database for its reactors, one
+`TelemetryHub` per worker polls the latest reading of the union of all
+subscribed reactors in a single statement per tick, serializes each
+reading once, and fans the encoded events out to subscriber queues. Cost
+per tick is one query over R reactors plus one queue put per
+(subscriber, reactor) pair, instead of a query per pair.
+
+Reactors `claim`ed by a replay (see replay.py) are left out of polling
+while the replay publishes their readings through the same fan-out.
+"""
+import asyncio
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Optional, Set
+from .db import queries
+from .models.schemas import ReactorTelemetryPoint
+
+POLL_INTERVAL_S = 2.0
+ERROR_BACKOFF_S = 5.0
+
+# Events buffered per subscriber; a slow client loses its oldest events
+SUBSCRIBER_QUEUE_SIZE = 256
+
+class Subscription:
+    __slots__ = ("reactor_ids", "queue")
+
+    def __init__(self, reactor_ids: Iterable[str]):
+        self.reactor_ids: Set[str] = set(reactor_ids)
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, event: str):
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+class TelemetryHub:
+    def __init__(self, interval_s: float = POLL_INTERVAL_S):
+        self.interval_s = interval_s
+        self._subscriptions: Set[Subscription] = set()
+        self._task: Optional[asyncio.Task] = None
+        # reactor -> replays currently feeding it
+        self.claimed: Dict[str, int] = {}
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscriptions)
+
+    def reactor_ids(self) -> Set[str]:
+        ids: Set[str] = set()
+        for sub in self._subscriptions:
+            ids |= sub.reactor_ids
+        return ids
+
+    def subscribe(self, reactor_ids: Iterable[str]) -> Subscription:
+        sub = Subscription(reactor_ids)
+        self._subscriptions.add(sub)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="telemetry-hub")
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscriptions.discard(sub)
+
+    def claim(self, reactor_id: str):
+        self.claimed[reactor_id] = self.claimed.get(reactor_id, 0) + 1
+
+    def release(self, reactor_id: str):
+        if self.claimed.get(reactor_id, 0) > 1:
+            self.claimed[reactor_id] -= 1
+        else:
+            self.claimed.pop(reactor_id, None)
+
+    @staticmethod
+    def encode(row) -> str:
+        """SSE event for one telemetry row (site_id, reactor_id and reading columns)"""
+        return f"data: {ReactorTelemetryPoint(**dict(row)).model_dump_json()}\n\n"
+
+    def publish(self, reactor_id: str, event: str):
+        """Push an already-encoded event to every subscriber of a reactor"""
+        for sub in list(self._subscriptions):
+            if reactor_id in sub.reactor_ids:
+                sub.offer(event)
+
+    async def events(self, reactor_ids: Iterable[str]):
+        """SSE-encoded events for the given reactors until the client goes away"""
+        sub = self.subscribe(reactor_ids)
+        try:
+            while True:
+                yield await sub.queue.get()
+        finally:
+            self.unsubscribe(sub)
+
+    async def _run(self):
+        # Exits once the last subscriber leaves; subscribe() restarts it
+        while self._subscriptions:
+            try:
+                await self.poll_once()
+                await asyncio.sleep(self.interval_s)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                error = f"data: {json.dumps({'error': str(e)})}\n\n"
+                for sub in list(self._subscriptions):
+                    sub.offer(error)
+                await asyncio.sleep(ERROR_BACKOFF_S)
+
+    async def poll_once(self, now: Optional[datetime] = None):
+        reactor_ids = self.reactor_ids() - self.claimed.keys()
+        if not reactor_ids:
+            return
+        now = now or datetime.now(timezone.utc)
+        rows = await queries.fetch("algae.latest_many", list(reactor_ids), now)
+
+        # Encode once per reactor, then fan out
+        encoded: Dict[str, str] = {row["reactor_id"]: self.encode(row) for row in rows}
+        for sub in list(self._subscriptions):
+            for reactor_id in sub.reactor_ids:
+                event = encoded.get(reactor_id)
+                if event is not None:
+                    sub.offer(event)
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+hub = TelemetryHub()
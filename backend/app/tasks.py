@@ -0,0 +1,394 @@
+"""Queue for long-running admin work (seeding, scenario switches, backfills)
+
+`POST /admin/...` submits an `AdminTask` and returns its id at once; the work
+runs on the accepting worker's event loop behind a semaphore of
+MAX_RUNNING_TASKS, so at most that many heavy operations share the pool
+with interactive traffic (each holds one connection at a time) and the
+rest wait queued. Exclusive tasks (everything that rewrites the dataset)
+additionally take a Postgres advisory lock, so they never overlap across
+workers either.
+
+Task state is mirrored to `admin_tasks`: the owning worker writes its row
+every SYNC_INTERVAL_S (doubling as a heartbeat), so any worker can report
+status, stream progress and request cancellation. A row whose owner stopped
+heartbeating for STALE_AFTER_S is reported as failed.
+
+Work reports progress through `report()` and nested `span()`s; both are
+no-ops outside a task, so the same functions run unchanged at startup:
+
+    with span(0.5, 0.9):
+        await backfill_ledger(start, end)   # its 0..1 lands in 50..90%
+
+Cancelling a task cancels its coroutine at the next await.
+"""
+import asyncio
+import json
+import os
+import socket
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timedelta, timezone
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+from .db.connection import acquire
+from .db import queries
+from .scheduler import advisory_key
+from . import metrics
+
+MAX_RUNNING_TASKS = int(os.getenv("ADMIN_MAX_RUNNING_TASKS", "1"))
+MAX_QUEUED_TASKS = 16
+
+# Finished tasks kept in memory and in admin_tasks
+HISTORY_SIZE = 50
+
+# Owner writes its row this often; readers of other workers poll as often
+SYNC_INTERVAL_S = 0.5
+STALE_AFTER_S = 30.0
+
+# SSE comment sent when a task has not changed for this long
+KEEPALIVE_S = 15.0
+
+EXCLUSIVE_LOCK_KEY = advisory_key("carbonflux.admin_tasks")
+
+TERMINAL_STATES = ("done", "failed", "cancelled")
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+queries.register(
+    "tasks.upsert",
+    """INSERT INTO admin_tasks (task_id, kind, params, state, progress, message, result, error,
+                                worker, submitted_at, started_at, finished_at, updated_at)
+       VALUES ($1, $2, $3::jsonb, $4, $5, $6, $7::jsonb, $8, $9, $10, $11, $12, now())
+       ON CONFLICT (task_id) DO UPDATE SET
+           state = EXCLUDED.state, progress = EXCLUDED.progress, message = EXCLUDED.message,
+           result = EXCLUDED.result, error = EXCLUDED.error, started_at = EXCLUDED.started_at,
+           finished_at = EXCLUDED.finished_at, updated_at = now()
+       RETURNING cancel_requested"""
+)
+queries.register(
+    "tasks.get",
+    """SELECT task_id, kind, params, state, progress, message, result, error, worker,
+              cancel_requested, submitted_at, started_at, finished_at, updated_at, now() AS db_now
+       FROM admin_tasks WHERE task_id = $1"""
+)
+queries.register(
+    "tasks.list",
+    """SELECT task_id, kind, params, state, progress, message, result, error, worker,
+              cancel_requested, submitted_at, started_at, finished_at, updated_at, now() AS db_now
+       FROM admin_tasks ORDER BY submitted_at DESC LIMIT $1"""
+)
+queries.register(
+    "tasks.request_cancel",
+    """UPDATE admin_tasks SET cancel_requested = TRUE
+       WHERE task_id = $1 AND state IN ('queued', 'running')"""
+)
+queries.register(
+    "tasks.prune",
+    """DELETE FROM admin_tasks WHERE task_id IN (
+           SELECT task_id FROM admin_tasks WHERE finished_at IS NOT NULL
+           ORDER BY submitted_at DESC OFFSET $1
+       )"""
+)
+
+task_runs = metrics.counter("admin_tasks_total", "Finished admin tasks by outcome", labelnames=("kind", "state"))
+task_seconds = metrics.histogram(
+    "admin_task_duration_seconds", "Admin task run time, excluding time queued", labelnames=("kind",),
+    buckets=(0.1, 0.5, 1.0, 5.0, 10.0, 30.0, 60.0, 300.0, 900.0)
+)
+task_wait = metrics.histogram(
+    "admin_task_queue_seconds", "Time admin tasks waited for a free slot",
+    buckets=(0.01, 0.1, 1.0, 5.0, 30.0, 60.0, 300.0)
+)
+
+class QueueFull(Exception):
+    pass
+
+class AdminTask:
+    def __init__(self, kind: str, params: dict, func: Callable[[], Awaitable[Optional[dict]]],
+                 exclusive: bool = True):
+        self.task_id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.params = params
+        self.func = func
+        self.exclusive = exclusive
+
+        self.state = "queued"
+        self.progress = 0.0
+        self.message: Optional[str] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.submitted_at = datetime.now(timezone.utc)
+        self.started_at: Optional[datetime] = None
+        self.finished_at: Optional[datetime] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self._sync: Optional[asyncio.Task] = None
+        # Replaced on every change; listeners wait on the one they saw
+        self._changed = asyncio.Event()
+
+    def to_dict(self) -> dict:
+        return {
+            "task_id": self.task_id,
+            "kind": self.kind,
+            "params": self.params,
+            "state": self.state,
+            "progress": round(self.progress, 4),
+            "message": self.message,
+            "result": self.result,
+            "error": self.error,
+            "worker": WORKER_ID,
+            "submitted_at": self.submitted_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+    @property
+    def finished(self) -> bool:
+        return self.state in TERMINAL_STATES
+
+    def _notify(self):
+        changed, self._changed = self._changed, asyncio.Event()
+        changed.set()
+
+    async def _flush(self) -> bool:
+        """Write the row; returns whether another worker asked to cancel"""
+        return await queries.fetchval(
+            "tasks.upsert", self.task_id, self.kind, json.dumps(self.params), self.state,
+            self.progress, self.message, json.dumps(self.result) if self.result is not None else None,
+            self.error, WORKER_ID, self.submitted_at, self.started_at, self.finished_at
+        )
+
+    async def _sync_loop(self):
+        while not self.finished:
+            await asyncio.sleep(SYNC_INTERVAL_S)
+            try:
+                if await self._flush() and self._task is not None:
+                    self._task.cancel()
+            except Exception as e:
+                print(f"⚠ Admin task {self.task_id} sync failed: {e}")
+
+    async def run(self, slots: asyncio.Semaphore):
+        loop = asyncio.get_running_loop()
+        queued = loop.time()
+        try:
+            async with slots:
+                if self.exclusive:
+                    async with acquire() as conn:
+                        self.message = "Waiting for exclusive admin lock"
+                        self._notify()
+                        # Polled rather than blocking, which would run into the command timeout
+                        while not await conn.fetchval("SELECT pg_try_advisory_lock($1)", EXCLUSIVE_LOCK_KEY):
+                            await asyncio.sleep(SYNC_INTERVAL_S)
+                        try:
+                            await self._execute(loop, queued)
+                        finally:
+                            await conn.execute("SELECT pg_advisory_unlock($1)", EXCLUSIVE_LOCK_KEY)
+                else:
+                    await self._execute(loop, queued)
+            self.state = "done"
+            self.progress = 1.0
+        except asyncio.CancelledError:
+            self.state = "cancelled"
+            raise
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            print(f"⚠ Admin task {self.kind} {self.task_id} failed: {e}")
+        finally:
+            self.finished_at = datetime.now(timezone.utc)
+            task_runs.inc(kind=self.kind, state=self.state)
+            self._notify()
+            # An in-flight heartbeat must not land after the final state
+            if self._sync is not None:
+                self._sync.cancel()
+                await asyncio.gather(self._sync, return_exceptions=True)
+            try:
+                await self._flush()
+            except Exception as e:
+                print(f"⚠ Admin task {self.task_id} sync failed: {e}")
+
+    async def _execute(self, loop: asyncio.AbstractEventLoop, queued: float):
+        task_wait.observe(loop.time() - queued)
+        self.state = "running"
+        self.message = None
+        self.started_at = datetime.now(timezone.utc)
+        self._notify()
+        started = loop.time()
+        token = _current.set((self, 0.0, 1.0))
+        try:
+            self.result = await self.func()
+        finally:
+            _current.reset(token)
+            task_seconds.observe(loop.time() - started, kind=self.kind)
+
+    async def cancel(self):
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    async def wait(self):
+        """Until the task has finished, whatever its outcome"""
+        if self._task is not None:
+            await asyncio.wait({self._task})
+
+    async def events(self) -> AsyncIterator[str]:
+        """SSE frames with the task state on every change, until it finishes"""
+        while True:
+            changed = self._changed
+            yield _sse(self.to_dict())
+            if self.finished:
+                return
+            while not changed.is_set():
+                try:
+                    await asyncio.wait_for(changed.wait(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+
+# (task, start, end) of the progress span the running code reports into
+_current: ContextVar[Optional[Tuple[AdminTask, float, float]]] = ContextVar("admin_task", default=None)
+
+def report(fraction: Optional[float] = None, message: Optional[str] = None):
+    """Progress of the current span (0..1) and/or a status line; no-op outside a task"""
+    current = _current.get()
+    if current is None:
+        return
+    task, lo, hi = current
+    if fraction is not None:
+        task.progress = max(task.progress, lo + (hi - lo) * min(max(fraction, 0.0), 1.0))
+    if message is not None:
+        task.message = message
+    task._notify()
+
+@contextmanager
+def span(start: float, end: float):
+    """Map the progress reported inside the block onto [start, end] of the current span"""
+    current = _current.get()
+    if current is None:
+        yield
+        return
+    task, lo, hi = current
+    token = _current.set((task, lo + (hi - lo) * start, lo + (hi - lo) * end))
+    try:
+        yield
+    finally:
+        _current.reset(token)
+    report(end)
+
+def _sse(task: dict) -> str:
+    return f"data: {json.dumps(task)}\n\n"
+
+def _row_dict(row) -> dict:
+    """A task row as served by the API; owners that stopped heartbeating count as failed"""
+    state, error = row["state"], row["error"]
+    if state not in TERMINAL_STATES and row["db_now"] - row["updated_at"] > timedelta(seconds=STALE_AFTER_S):
+        state, error = "failed", f"Worker {row['worker']} stopped reporting"
+
+    def _iso(value: Optional[datetime]) -> Optional[str]:
+        return value.isoformat() if value else None
+
+    return {
+        "task_id": row["task_id"],
+        "kind": row["kind"],
+        "params": json.loads(row["params"]),
+        "state": state,
+        "progress": round(row["progress"], 4),
+        "message": row["message"],
+        "result": json.loads(row["result"]) if row["result"] is not None else None,
+        "error": error,
+        "worker": row["worker"],
+        "submitted_at": _iso(row["submitted_at"]),
+        "started_at": _iso(row["started_at"]),
+        "finished_at": _iso(row["finished_at"]),
+    }
+
+class TaskQueue:
+    def __init__(self, max_running: int = MAX_RUNNING_TASKS, max_queued: int = MAX_QUEUED_TASKS):
+        self.max_running = max_running
+        self.max_queued = max_queued
+        # Tasks owned by this worker
+        self.tasks: Dict[str, AdminTask] = {}
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    def pending(self) -> List[AdminTask]:
+        return [t for t in self.tasks.values() if not t.finished]
+
+    async def submit(self, kind: str, params: dict, func: Callable[[], Awaitable[Optional[dict]]],
+                     exclusive: bool = True) -> AdminTask:
+        """Queue `func` as a task; it starts when one of max_running slots
+        (and, if exclusive, the cluster-wide admin lock) frees up"""
+        if len(self.pending()) >= self.max_running + self.max_queued:
+            raise QueueFull(f"At most {self.max_running + self.max_queued} admin tasks may be pending per worker")
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_running)
+
+        task = AdminTask(kind, params, func, exclusive)
+        # Visible to every worker before the id is handed out
+        await task._flush()
+        await queries.execute("tasks.prune", HISTORY_SIZE)
+        self.tasks[task.task_id] = task
+        task._task = asyncio.create_task(task.run(self._slots), name=f"admin-{kind}-{task.task_id}")
+        task._sync = asyncio.create_task(task._sync_loop(), name=f"admin-sync-{task.task_id}")
+
+        finished = [t for t in self.tasks.values() if t.finished]
+        for old in sorted(finished, key=lambda t: t.submitted_at)[:-HISTORY_SIZE]:
+            del self.tasks[old.task_id]
+        return task
+
+    async def get(self, task_id: str) -> Optional[dict]:
+        """State of a task owned by any worker"""
+        local = self.tasks.get(task_id)
+        if local is not None:
+            return local.to_dict()
+        row = await queries.fetchrow("tasks.get", task_id)
+        return _row_dict(row) if row is not None else None
+
+    async def list(self) -> List[dict]:
+        """Recent tasks of every worker, newest first"""
+        rows = await queries.fetch("tasks.list", HISTORY_SIZE)
+        return [self.tasks[r["task_id"]].to_dict() if r["task_id"] in self.tasks else _row_dict(r)
+                for r in rows]
+
+    async def cancel(self, task_id: str) -> Optional[dict]:
+        """Cancel a local task now, or flag another worker's task for its next sync"""
+        local = self.tasks.get(task_id)
+        if local is not None:
+            await local.cancel()
+            return local.to_dict()
+        await queries.execute("tasks.request_cancel", task_id)
+        return await self.get(task_id)
+
+    async def events(self, task_id: str) -> AsyncIterator[str]:
+        """SSE frames for a task; another worker's task is followed through its row"""
+        local = self.tasks.get(task_id)
+        if local is not None:
+            async for frame in local.events():
+                yield frame
+            return
+
+        last = None
+        idle = 0.0
+        while True:
+            task = await self.get(task_id)
+            if task is None:
+                return
+            if task != last:
+                yield _sse(task)
+                last, idle = task, 0.0
+            elif idle >= KEEPALIVE_S:
+                yield ": keepalive\n\n"
+                idle = 0.0
+            if task["state"] in TERMINAL_STATES:
+                return
+            await asyncio.sleep(SYNC_INTERVAL_S)
+            idle += SYNC_INTERVAL_S
+
+    async def stop(self):
+        """Cancel every pending task (on shutdown)"""
+        await asyncio.gather(*(t.cancel() for t in self.pending()))
+
+queue = TaskQueue()
+
+metrics.gauge("admin_tasks_running", "Admin tasks running on this worker",
+              func=lambda: sum(1 for t in queue.tasks.values() if t.state == "running"))
+metrics.gauge("admin_tasks_queued", "Admin tasks waiting for a slot on this worker",
+              func=lambda: sum(1 for t in queue.tasks.values() if t.state == "queued"))
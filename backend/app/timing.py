@@ -0,0 +1,118 @@
+"""Per-request phase timing: Server-Timing header and route-labeled histograms
+
+`ServerTimingMiddleware` starts a timer per HTTP request. Code on the
+request path adds to named phases with `with phase("db"): ...` (pool
+acquire and statement execution are hooked in app/db). Routers built with
+`route_class=TimedRoute` also get a `serialize` phase covering response
+model validation and JSON encoding after the endpoint returns. Phases are
+sent back as a `Server-Timing` header and aggregated into metrics.
+"""
+import inspect
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Dict, Optional
+from fastapi.routing import APIRoute
+from . import metrics
+
+request_seconds = metrics.histogram(
+    "http_request_duration_seconds", "Request duration until the last body chunk",
+    labelnames=("method", "route", "status")
+)
+phase_seconds = metrics.histogram(
+    "http_request_phase_seconds", "Time spent per request phase",
+    labelnames=("route", "phase")
+)
+
+class RequestTimings:
+    __slots__ = ("started", "phases", "endpoint_done")
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.endpoint_done: Optional[float] = None
+
+    def add(self, name: str, seconds: float):
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def header(self, now: float) -> str:
+        parts = [f"{name};dur={seconds * 1000:.2f}" for name, seconds in self.phases.items()]
+        parts.append(f"total;dur={(now - self.started) * 1000:.2f}")
+        return ", ".join(parts)
+
+_current: ContextVar[Optional[RequestTimings]] = ContextVar("request_timings", default=None)
+
+@contextmanager
+def phase(name: str):
+    """Add the enclosed block's duration to phase `name` of the current request"""
+    timings = _current.get()
+    if timings is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - started)
+
+def _route_label(scope) -> str:
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+class ServerTimingMiddleware:
+    """Pure ASGI middleware so streaming responses are not buffered"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                now = time.perf_counter()
+                status["code"] = message["status"]
+                if timings.endpoint_done is not None:
+                    timings.add("serialize", now - timings.endpoint_done)
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", timings.header(now).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current.reset(token)
+            route = _route_label(scope)
+            request_seconds.observe(time.perf_counter() - timings.started,
+                                    method=scope["method"], route=route, status=status["code"])
+            for name, seconds in timings.phases.items():
+                phase_seconds.observe(seconds, route=route, phase=name)
+
+class TimedRoute(APIRoute):
+    """APIRoute that marks when the endpoint returns, so serialization can be timed"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        endpoint = self.dependant.call
+        if not inspect.iscoroutinefunction(endpoint):
+            # Only coroutine endpoints are wrapped; sync ones run in a threadpool
+            return
+
+        @wraps(endpoint)
+        async def timed_endpoint(*a, **kw):
+            try:
+                return await endpoint(*a, **kw)
+            finally:
+                timings = _current.get()
+                if timings is not None:
+                    timings.endpoint_done = time.perf_counter()
+
+        self.dependant.call = timed_endpoint
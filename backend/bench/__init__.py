@@ -0,0 +1 @@
+# HTTP load-test and benchmark suite
@@ -0,0 +1,222 @@
+"""Benchmark runner: seed, drive endpoints, record and compare results
+
+Usage (from backend/, with the API running):
+
+    pip install -r requirements-bench.txt
+    python -m bench --seed-days 30 --concurrency 20 --duration 10 \\
+        --sse-subscribers 200 --output bench_results.json --baseline bench/baseline.json
+
+Each endpoint is driven by `concurrency` closed-loop clients for `duration`
+seconds. Results (throughput, p50/p95/p99 latency, payload size, errors)
+are written as JSON; with --baseline, any endpoint whose p95 rises or whose
+throughput falls by more than --tolerance is reported as a regression and
+the process exits non-zero.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+import httpx
+from .scenarios import ENDPOINTS, SSE_PATH
+
+def percentile(sorted_values: List[float], q: float) -> Optional[float]:
+    if not sorted_values:
+        return None
+    k = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+def summarize(latencies: List[float], sizes: List[int], errors: int, elapsed: float) -> dict:
+    latencies = sorted(latencies)
+    ms = lambda v: round(v * 1000, 3) if v is not None else None
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "p50_ms": ms(percentile(latencies, 0.50)),
+        "p95_ms": ms(percentile(latencies, 0.95)),
+        "p99_ms": ms(percentile(latencies, 0.99)),
+        "max_ms": ms(latencies[-1] if latencies else None),
+        "avg_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+    }
+
+async def drive_endpoint(client: httpx.AsyncClient, name: str, concurrency: int, duration: float) -> dict:
+    """Closed-loop load: `concurrency` clients issue requests back to back"""
+    method, path, body_factory = ENDPOINTS[name]
+    body = body_factory() if body_factory else None
+    latencies: List[float] = []
+    sizes: List[int] = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        nonlocal errors
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, path, json=body)
+                size = len(response.content)
+                if response.status_code >= 400:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - started)
+            sizes.append(size)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, sizes, errors, time.perf_counter() - started)
+
+async def drive_sse(base_url: str, subscribers: int, duration: float, reactors: str = "") -> dict:
+    """Hold `subscribers` SSE connections open, measuring time to first event and event rate"""
+    first_event: List[float] = []
+    events = 0
+    sizes: List[int] = []
+    errors = 0
+    limits = httpx.Limits(max_connections=subscribers + 10)
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=None, limits=limits) as client:
+        async def subscriber():
+            nonlocal events, errors
+            started = time.perf_counter()
+            deadline = started + duration
+            got_first = False
+            try:
+                params = {"reactors": reactors} if reactors else None
+                async with client.stream("GET", SSE_PATH, params=params) as response:
+                    async for line in response.aiter_lines():
+                        if line.startswith("data:"):
+                            if not got_first:
+                                got_first = True
+                                first_event.append(time.perf_counter() - started)
+                            events += 1
+                            sizes.append(len(line))
+                        if time.perf_counter() >= deadline:
+                            break
+            except httpx.HTTPError:
+                errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(subscriber() for _ in range(subscribers)))
+        elapsed = time.perf_counter() - started
+
+    # Latency percentiles here are time-to-first-event
+    result = summarize(first_event, sizes, errors, elapsed)
+    result.update({
+        "subscribers": subscribers,
+        "events": events,
+        "events_per_s": round(events / elapsed, 2) if elapsed > 0 else 0.0,
+    })
+    return result
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], tolerance: float) -> List[str]:
+    """Regressions of results vs. baseline, as human-readable lines"""
+    regressions = []
+    for name, current in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        if base.get("p95_ms") and current.get("p95_ms") and current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(f"{name}: p95 {base['p95_ms']} ms -> {current['p95_ms']} ms")
+        if base.get("throughput_rps") and current["throughput_rps"] < base["throughput_rps"] * (1 - tolerance):
+            regressions.append(f"{name}: throughput {base['throughput_rps']} -> {current['throughput_rps']} rps")
+        if current.get("errors", 0) > base.get("errors", 0):
+            regressions.append(f"{name}: errors {base.get('errors', 0)} -> {current['errors']}")
+    return regressions
+
+async def seed(days: int, sites: int = 1, reactors_per_site: int = 1):
+    """Seed the database behind PG_DSN with `days` of history"""
+    from app.db.connection import close_pool
+    from app.db.init_db import init_database
+    from app.db.seeders import seed_all_data
+
+    started = time.perf_counter()
+    await init_database()
+    await seed_all_data(reset=True, days_history=days, sites=sites, reactors_per_site=reactors_per_site)
+    await close_pool()
+    print(f"✓ Seeded {days} days of history for {sites * reactors_per_site} reactor(s) "
+          f"in {time.perf_counter() - started:.1f} s")
+
+async def run(args) -> dict:
+    names = args.endpoints.split(",") if args.endpoints else list(ENDPOINTS)
+    unknown = [n for n in names if n not in ENDPOINTS]
+    if unknown:
+        raise SystemExit(f"Unknown endpoints: {', '.join(unknown)}")
+
+    results: Dict[str, dict] = {}
+    limits = httpx.Limits(max_connections=args.concurrency + 10)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        for name in names:
+            # Warm caches and connections before measuring
+            for _ in range(args.warmup):
+                method, path, body_factory = ENDPOINTS[name]
+                await client.request(method, path, json=body_factory() if body_factory else None)
+            results[name] = await drive_endpoint(client, name, args.concurrency, args.duration)
+            r = results[name]
+            print(f"{name:28s} {r['throughput_rps']:>9.1f} rps  p50 {r['p50_ms']} ms  "
+                  f"p95 {r['p95_ms']} ms  p99 {r['p99_ms']} ms  {r['avg_bytes']} B  errors {r['errors']}")
+
+    if args.sse_subscribers:
+        results["sse_stream"] = await drive_sse(args.base_url, args.sse_subscribers, args.sse_duration,
+                                                args.sse_reactors)
+        r = results["sse_stream"]
+        print(f"{'sse_stream':28s} {r['subscribers']} subscribers  {r['events_per_s']} events/s  "
+              f"first event p95 {r['p95_ms']} ms  errors {r['errors']}")
+
+    return {
+        "meta": {
+            "run_at": datetime.now(timezone.utc).isoformat(),
+            "base_url": args.base_url,
+            "seed_days": args.seed_days,
+            "seed_reactors": args.seed_sites * args.seed_reactors_per_site,
+            "concurrency": args.concurrency,
+            "duration_s": args.duration,
+            "python": platform.python_version(),
+        },
+        "results": results,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m bench", description="CarbonFlux API benchmark suite")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--seed-days", type=int, default=None,
+                        help="Reseed the database (PG_DSN) with this many days of history first")
+    parser.add_argument("--seed-sites", type=int, default=1)
+    parser.add_argument("--seed-reactors-per-site", type=int, default=1)
+    parser.add_argument("--sse-reactors", default="",
+                        help="Comma-separated reactor ids each SSE subscriber multiplexes")
+    parser.add_argument("--endpoints", default="", help="Comma-separated subset of: " + ", ".join(ENDPOINTS))
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per endpoint")
+    parser.add_argument("--warmup", type=int, default=3, help="Unmeasured requests per endpoint")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--sse-subscribers", type=int, default=0)
+    parser.add_argument("--sse-duration", type=float, default=15.0)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--baseline", default=None, help="Results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative regression")
+    args = parser.parse_args(argv)
+
+    if args.seed_days:
+        asyncio.run(seed(args.seed_days, args.seed_sites, args.seed_reactors_per_site))
+
+    report = asyncio.run(run(args))
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✓ Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["results"]
+        regressions = compare(report["results"], baseline, args.tolerance)
+        if regressions:
+            print("✗ Regressions vs. baseline:")
+            for line in regressions:
+                print(f"  - {line}")
+            sys.exit(1)
+        print("✓ No regressions vs. baseline")
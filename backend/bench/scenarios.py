@@ -0,0 +1,36 @@
+"""Endpoint scenarios driven by the benchmark runner"""
+from datetime import datetime, timedelta, timezone
+
+def _simulate_payload(points: int = 1440) -> dict:
+    start = datetime.now(timezone.utc).replace(second=0, microsecond=0)
+    schedule = []
+    for i in range(points):
+        hour = (start + timedelta(minutes=i)).hour
+        schedule.append({
+            "time": (start + timedelta(minutes=i)).isoformat(),
+            "charge_kw": 600.0 if 10 <= hour < 16 else 0.0,
+            "discharge_kw": 480.0 if 17 <= hour < 24 else 0.0,
+        })
+    return {"schedule": schedule, "initial_soc_mwh": 5.0}
+
+# name -> (method, path, json body factory or None)
+ENDPOINTS = {
+    "healthz": ("GET", "/healthz", None),
+    "forecast_solar": ("GET", "/forecast/solar", None),
+    "forecast_green_windows": ("GET", "/forecast/green-windows", None),
+    "salt_state": ("GET", "/salt/state", None),
+    "salt_state_7d": ("GET", "/salt/state?hours=168&max_points=1000", None),
+    "salt_simulate": ("POST", "/salt/simulate", _simulate_payload),
+    "dispatch_plan": ("POST", "/dispatch/plan", None),
+    "algae_telemetry": ("GET", "/algae/telemetry?hours=24", None),
+    "algae_telemetry_30d": ("GET", "/algae/telemetry?hours=720&max_points=2000", None),
+    "carbon_ledger": ("GET", "/carbon/ledger", None),
+    "carbon_ledger_total": ("GET", "/carbon/ledger/total", None),
+    "carbon_ledger_export": ("GET", "/carbon/ledger?export=csv&granularity=hourly", None),
+    "sites_fleet": ("GET", "/sites/fleet", None),
+    "dashboard_snapshot": ("GET", "/dashboard/snapshot?sections=solar,green_windows,salt,dispatch,algae,carbon", None),
+    "demo_big_json": ("GET", "/demo/big?points=100000&seed=1", None),
+    "demo_big_binary": ("GET", "/demo/big?points=100000&seed=1&format=binary", None),
+}
+
+SSE_PATH = "/algae/telemetry/stream"
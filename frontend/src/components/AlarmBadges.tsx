@@ -2,13 +2,14 @@ interface AlarmBadgesProps {
   ph: number
   doMgL: number
   tempC: number
+  active?: string[] // Alarms raised by the server engine; local limits are used until it reports
 }
 
-export default function AlarmBadges({ ph, doMgL, tempC }: AlarmBadgesProps) {
+export default function AlarmBadges({ ph, doMgL, tempC, active }: AlarmBadgesProps) {
   // Alarm conditions
-  const o2Inhibition = doMgL > 10
-  const phOutOfRange = ph < 6.8 || ph > 7.6
-  const overtemp = tempC > 28
+  const o2Inhibition = active ? active.includes('o2_inhibition') : doMgL > 10
+  const phOutOfRange = active ? active.includes('ph_low') || active.includes('ph_high') : ph < 6.8 || ph > 7.6
+  const overtemp = active ? active.includes('overtemp') : tempC > 28
 
   const hasAnyAlarm = o2Inhibition || phOutOfRange || overtemp
 
@@ -1,6 +1,6 @@
 import { useState } from 'react'
 import { useMutation, useQueryClient } from '@tanstack/react-query'
-import { endpoints } from '../lib/api'
+import { endpoints, waitForTask } from '../lib/api'
 import { useAppStore } from '../store/appStore'
 
 const scenarios = [
@@ -13,12 +13,20 @@ const scenarios = [
 export default function ScenarioSwitcher() {
   const { currentScenario, setScenario } = useAppStore()
   const [isOpen, setIsOpen] = useState(false)
+  const [progress, setProgress] = useState(0)
   const queryClient = useQueryClient()
 
   const switchMutation = useMutation({
-    mutationFn: (type: string) => endpoints.switchScenario(type),
+    // The reseed runs as an admin task; wait for it before refetching
+    mutationFn: async (type: string) => {
+      setProgress(0)
+      const task = await endpoints.switchScenario(type)
+      return waitForTask(task, (current) => setProgress(current.progress))
+    },
     onSuccess: (_, type) => {
       setScenario(type)
+      // Delta-synced history starts over from a full window
+      queryClient.removeQueries({ queryKey: ['saltState'] })
       // Invalidate all queries to force refetch
       queryClient.invalidateQueries()
       setIsOpen(false)
@@ -66,7 +74,7 @@ export default function ScenarioSwitcher() {
 
       {switchMutation.isPending && (
         <div className="absolute inset-0 glass-panel flex items-center justify-center">
-          <div className="text-sm text-slate-300">Switching scenario...</div>
+          <div className="text-sm text-slate-300">Switching scenario... {Math.round(progress * 100)}%</div>
         </div>
       )}
     </div>
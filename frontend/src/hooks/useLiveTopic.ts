@@ -0,0 +1,9 @@
+import { useEffect, useState } from 'react'
+import { liveChannel } from '../lib/live'
+
+// Newest merged state of a live topic (undefined until its first frame)
+export function useLiveTopic(topic: string, maxHz = 1) {
+  const [state, setState] = useState<Record<string, number | string> | undefined>(undefined)
+  useEffect(() => liveChannel.subscribe(topic, setState, maxHz), [topic, maxHz])
+  return state
+}
@@ -87,15 +87,57 @@ export const downloadFile = async (path: string, defaultFilename: string) => {
   window.URL.revokeObjectURL(url)
 }
 
+// Merge a `since=` delta into the previous window, dropping points that slid out of it
+export const appendDelta = (previous: any, delta: any, field: string, hours = 24) => {
+  const cutoff = Date.now() - hours * 3600_000
+  const points = [...previous[field], ...delta[field]].filter((p: any) => Date.parse(p.time) >= cutoff)
+  return { ...delta, [field]: points }
+}
+
+// Follow an admin task's SSE feed until it finishes; rejects unless it completed.
+// Any worker can serve the feed; if it drops, fall back to polling the task.
+export const waitForTask = (task: { task_id: string; state: string }, onProgress?: (task: any) => void) =>
+  new Promise<any>((resolve, reject) => {
+    const settle = (current: any) => {
+      onProgress?.(current)
+      if (!['done', 'failed', 'cancelled'].includes(current.state)) return false
+      if (current.state === 'done') resolve(current)
+      else reject(new Error(current.error || `Task ${current.state}`))
+      return true
+    }
+    if (settle(task)) return
+
+    const poll = async () => {
+      try {
+        if (!settle(await api.get(`/admin/tasks/${task.task_id}`))) setTimeout(poll, 1000)
+      } catch (error) {
+        reject(error)
+      }
+    }
+    const source = new EventSource(`${API_BASE}/admin/tasks/${task.task_id}/events`)
+    source.onmessage = (event) => {
+      if (settle(JSON.parse(event.data))) source.close()
+    }
+    source.onerror = () => {
+      source.close()
+      poll()
+    }
+  })
+
 // API endpoints
 export const endpoints = {
   healthCheck: () => api.get('/healthz', 'health'),
   solarForecast: () => api.get('/forecast/solar', 'solar-forecast'),
   greenWindows: () => api.get('/forecast/green-windows', 'green-windows'),
   saltState: () => api.get('/salt/state', 'salt-state'),
+  saltStateSince: (cursor: string) => api.get(`/salt/state?since=${encodeURIComponent(cursor)}`),
   dispatchPlan: () => api.post('/dispatch/plan', undefined, 'dispatch-plan'),
   algaeTelemetry: (hours = 24) => api.get(`/algae/telemetry?hours=${hours}`, 'algae-telemetry'),
+  algaeTelemetrySince: (cursor: string, hours = 24) =>
+    api.get(`/algae/telemetry?hours=${hours}&since=${encodeURIComponent(cursor)}`),
   carbonLedger: () => api.get('/carbon/ledger', 'carbon-ledger'),
+  dashboardSnapshot: (sections = 'solar,salt,dispatch,carbon') =>
+    api.get(`/dashboard/snapshot?sections=${sections}`, 'dashboard-snapshot'),
   switchScenario: (type: string) => api.post(`/admin/scenario?type=${type}`, { type }, 'scenario-switch'),
   demoBigData: (points = 100000, type = 'solar', hours = 72) =>
     api.get(`/demo/big?points=${points}&type=${type}&hours=${hours}`, 'demo-big-data'),
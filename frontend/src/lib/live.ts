@@ -0,0 +1,130 @@
+// One WebSocket for every live topic (algae:<reactor>, salt:<site>, dispatch:<site>, ledger).
+// The server throttles each topic to its max_hz and sends only changed fields;
+// this client keeps the merged state per topic and hands it to listeners.
+
+const API_BASE = import.meta.env.VITE_API_BASE || 'http://localhost:8000'
+
+type Listener = (state: Record<string, number | string>) => void
+
+interface Topic {
+  maxHz: number
+  id?: number
+  fields: string[]
+  state: Record<string, number | string>
+  listeners: Set<Listener>
+}
+
+const socketUrl = (binary: boolean) => {
+  const base = new URL(API_BASE, window.location.href)
+  base.protocol = base.protocol === 'https:' ? 'wss:' : 'ws:'
+  base.pathname = `${base.pathname.replace(/\/$/, '')}/live/ws`
+  base.search = binary ? '?format=binary' : ''
+  return base.toString()
+}
+
+export class LiveChannel {
+  private socket: WebSocket | null = null
+  private topics = new Map<string, Topic>()
+  private byId = new Map<number, string>()
+  private retry = 0
+
+  constructor(private binary = false) {}
+
+  subscribe(topic: string, listener: Listener, maxHz = 1) {
+    let entry = this.topics.get(topic)
+    if (!entry) {
+      entry = { maxHz, fields: [], state: {}, listeners: new Set() }
+      this.topics.set(topic, entry)
+      this.send({ op: 'subscribe', topic, max_hz: maxHz })
+    }
+    entry.listeners.add(listener)
+    this.connect()
+
+    return () => {
+      entry!.listeners.delete(listener)
+      if (entry!.listeners.size === 0) {
+        this.topics.delete(topic)
+        this.send({ op: 'unsubscribe', topic })
+      }
+    }
+  }
+
+  close() {
+    this.topics.clear()
+    this.socket?.close()
+    this.socket = null
+  }
+
+  private connect() {
+    if (this.socket) return
+    const socket = new WebSocket(socketUrl(this.binary))
+    socket.binaryType = 'arraybuffer'
+    this.socket = socket
+
+    socket.onopen = () => {
+      this.retry = 0
+      // Resubscribe everything; the first frame of each topic is full again
+      this.topics.forEach((entry, topic) => {
+        entry.state = {}
+        socket.send(JSON.stringify({ op: 'subscribe', topic, max_hz: entry.maxHz }))
+      })
+    }
+    socket.onmessage = (event) => {
+      if (typeof event.data === 'string') this.onText(JSON.parse(event.data))
+      else this.onBinary(new DataView(event.data))
+    }
+    socket.onclose = () => {
+      this.socket = null
+      if (this.topics.size === 0) return
+      const delay = Math.min(1000 * Math.pow(2, this.retry++), 30000)
+      setTimeout(() => this.connect(), delay)
+    }
+  }
+
+  private send(message: unknown) {
+    if (this.socket?.readyState === WebSocket.OPEN) this.socket.send(JSON.stringify(message))
+  }
+
+  private onText(message: any) {
+    if (message.op === 'subscribed') {
+      const entry = this.topics.get(message.topic)
+      if (entry) {
+        entry.id = message.id
+        entry.fields = message.fields
+        this.byId.set(message.id, message.topic)
+      }
+    } else if (message.op === 'error') {
+      console.error('Live channel error:', message.detail)
+    } else if (message.topic) {
+      this.apply(message.topic, message.time, message.data)
+    }
+  }
+
+  // u16 topic id | u32 seq | f64 epoch seconds | u32 field mask | f64 per set bit
+  private onBinary(view: DataView) {
+    const topic = this.byId.get(view.getUint16(0, true))
+    const entry = topic ? this.topics.get(topic) : undefined
+    if (!topic || !entry) return
+    const time = new Date(view.getFloat64(6, true) * 1000).toISOString()
+    const mask = view.getUint32(14, true)
+    const data: Record<string, number> = {}
+    let offset = 18
+    entry.fields.forEach((field, i) => {
+      if (mask & (1 << i)) {
+        data[field] = view.getFloat64(offset, true)
+        offset += 8
+      }
+    })
+    this.apply(topic, time, data)
+  }
+
+  private apply(topic: string, time: string, data: Record<string, number>) {
+    const entry = this.topics.get(topic)
+    if (!entry) return
+    entry.state = { ...entry.state, ...data, time }
+    entry.listeners.forEach((listener) => listener(entry.state))
+  }
+}
+
+// Shared by every page so a dashboard holds a single socket
+export const liveChannel = new LiveChannel()
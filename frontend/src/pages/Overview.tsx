@@ -1,6 +1,7 @@
 import { useQuery } from '@tanstack/react-query'
 import { useState } from 'react'
 import { endpoints } from '../lib/api'
+import { useLiveTopic } from '../hooks/useLiveTopic'
 import FlowDiagram from '../components/FlowDiagram'
 import SOCGauge from '../components/SOCGauge'
 import CarbonTicker from '../components/CarbonTicker'
@@ -13,30 +14,21 @@ export default function Overview() {
   } | null>(null)
   const [isRunningStressTest, setIsRunningStressTest] = useState(false)
 
-  // Fetch data with auto-refresh every 5 seconds
-  const { data: saltData } = useQuery({
-    queryKey: ['saltState'],
-    queryFn: endpoints.saltState,
-    refetchInterval: 5000,
+  // Fetch all Overview sections in one request; the live tiles below update
+  // over the shared socket, so the snapshot only refreshes forecasts and rollups
+  const { data: snapshot } = useQuery({
+    queryKey: ['dashboardSnapshot'],
+    queryFn: () => endpoints.dashboardSnapshot(),
+    refetchInterval: 60000,
   })
+  const liveSalt = useLiveTopic('salt:site-1')
+  const liveDispatch = useLiveTopic('dispatch:site-1')
+  const liveLedger = useLiveTopic('ledger')
 
-  const { data: dispatchData } = useQuery({
-    queryKey: ['dispatchPlan'],
-    queryFn: endpoints.dispatchPlan,
-    refetchInterval: 5000,
-  })
-
-  const { data: carbonData } = useQuery({
-    queryKey: ['carbonLedger'],
-    queryFn: endpoints.carbonLedger,
-    refetchInterval: 5000,
-  })
-
-  const { data: solarData } = useQuery({
-    queryKey: ['solarForecast'],
-    queryFn: endpoints.solarForecast,
-    refetchInterval: 5000,
-  })
+  const saltData = snapshot?.salt
+  const dispatchData = snapshot?.dispatch
+  const carbonData = snapshot?.carbon
+  const solarData = snapshot?.solar
 
   const runStressTest = async () => {
     setIsRunningStressTest(true)
@@ -67,18 +59,19 @@ export default function Overview() {
   // Calculate current solar output (latest nowcast point)
   const currentSolar = solarData?.nowcast?.[solarData.nowcast.length - 1]?.value_kw || 0
 
-  // Calculate current charge/discharge from dispatch plan
-  const currentDispatch = dispatchData?.plan?.[0] || { charge_kw: 0, discharge_kw: 0 }
+  // Current charge/discharge: live dispatch entry, else the plan's first entry
+  const currentDispatch = (liveDispatch as any) || dispatchData?.plan?.[0] || { charge_kw: 0, discharge_kw: 0 }
 
   // Calculate load (discharge to algae)
   const currentLoad = currentDispatch.discharge_kw
 
   // Get SOC data
-  const soc = saltData?.soc_percent || 0
-  const socMwh = saltData?.current?.soc_mwh || 0
+  const capacity = saltData?.capacity_mwh || 10
+  const socMwh = (liveSalt?.soc_mwh as number | undefined) ?? saltData?.current?.soc_mwh ?? 0
+  const soc = (socMwh / capacity) * 100
 
   // Get carbon data
-  const cumulativeCO2 = carbonData?.cumulative_net_kg || 0
+  const cumulativeCO2 = (liveLedger?.co2_net_kg as number | undefined) ?? carbonData?.cumulative_net_kg ?? 0
   const dailyNet = carbonData?.daily?.[0]?.total_co2_net_kg || 0
 
   return (
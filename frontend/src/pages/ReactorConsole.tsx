@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 import { useSSE } from '../hooks/useSSE'
 import { apiFetch } from '../lib/api'
+import { liveChannel } from '../lib/live'
 import PHChart from '../components/PHChart'
 import DOChart from '../components/DOChart'
 import TempChart from '../components/TempChart'
@@ -50,6 +51,16 @@ export default function ReactorConsole() {
     }
   )
 
+  // Server-side alarm state (hysteresis, rate and anomaly checks) over the shared live socket
+  const [activeAlarms, setActiveAlarms] = useState<string[] | undefined>(undefined)
+  useEffect(
+    () =>
+      liveChannel.subscribe('alarms:pbr-01', (state) => {
+        setActiveAlarms(Object.keys(state).filter((name) => name !== 'time' && state[name] === 1))
+      }),
+    []
+  )
+
   // Use display data from current or history
   const displayData = currentData || (telemetryHistory.length > 0 ? telemetryHistory[telemetryHistory.length - 1] : null)
 
@@ -114,6 +125,7 @@ export default function ReactorConsole() {
           ph={displayData.ph}
           doMgL={displayData.do_mg_l}
           tempC={displayData.temp_c}
+          active={activeAlarms}
         />
       )}
 
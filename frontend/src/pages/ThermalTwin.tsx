@@ -1,25 +1,34 @@
-import { useQuery } from '@tanstack/react-query'
-import { endpoints } from '../lib/api'
+import { useQuery, useQueryClient } from '@tanstack/react-query'
+import { appendDelta, endpoints } from '../lib/api'
+import { useLiveTopic } from '../hooks/useLiveTopic'
 import ThermalChart from '../components/ThermalChart'
 import HeatLossDonut from '../components/HeatLossDonut'
 import EfficiencyTile from '../components/EfficiencyTile'
 
 export default function ThermalTwin() {
-  // Fetch salt state with auto-refresh
+  const queryClient = useQueryClient()
+
+  // Current readings arrive over the shared socket; the chart history is
+  // extended with delta reads (only new points) at a slower pace
+  const liveSalt = useLiveTopic('salt:site-1')
   const { data: saltData } = useQuery({
     queryKey: ['saltState'],
-    queryFn: endpoints.saltState,
-    refetchInterval: 5000,
+    queryFn: async () => {
+      const previous = queryClient.getQueryData<any>(['saltState'])
+      if (!previous?.cursor) return endpoints.saltState()
+      return appendDelta(previous, await endpoints.saltStateSince(previous.cursor), 'history_24h')
+    },
+    refetchInterval: 30000,
   })
 
-  // Fetch dispatch plan for event overlays
+  // Fetch dispatch plan for event overlays (replanned at most once a minute)
   const { data: dispatchData } = useQuery({
     queryKey: ['dispatchPlan'],
     queryFn: endpoints.dispatchPlan,
-    refetchInterval: 5000,
+    refetchInterval: 60000,
   })
 
-  const currentTemp = saltData?.current || {
+  const currentTemp = (liveSalt as any) || saltData?.current || {
     temp_hot_c: 0,
     temp_cold_c: 0,
     heat_loss_kw: 0,